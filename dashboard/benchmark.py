@@ -0,0 +1,186 @@
+"""Benchmarks for loading, filtering, aggregation and figure building
+
+    python benchmark.py --scale 1 --scale 10 --out bench.json
+    python benchmark.py --scale 1 --scale 10 --baseline bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import data_loader
+import figures
+import synthetic
+from engine import make_filters
+from tables import Dataset, FilterResults
+
+DEFAULT_SCALES = [1, 10, 100, 1000]
+
+# Dashboard sections, each as (tables, figure builder or None) pairs; the
+# builder takes the tables in order
+SECTIONS = {
+    'kpis': [(['kpis'], None)],
+    'seasonal': [(['seasonal_avg'], figures.seasonal_bar), (['best_worst_season'], None),
+                 (['monthly_trend'], figures.seasonal_trend)],
+    'weather': [(['weather_avg'], figures.weather_bar), (['temperature_fits'], None),
+                (['filtered_df', 'temperature_trend_ols'], figures.temperature_scatter),
+                (['temperature_trend_lowess'], None), (['temperature_trend_binned'], None),
+                (['weather_corr'], figures.weather_correlation)],
+    'user_behavior': [(['user_ratio'], figures.user_ratio_bar), (['cluster_counts'], figures.cluster_pie),
+                      (['seasonal_users'], figures.seasonal_users_bar)],
+    'peak_hours': [(['hour_profile'], figures.peak_hours)],
+    'advanced': [(['cluster_stats'], None), (['hour_cluster_stats'], None), (['weather_impact'], None)],
+    'interactive': [(['temp_analysis'], figures.temperature_bins_bar),
+                    (['season_weather'], figures.season_weather_heatmap),
+                    (['monthly_users'], figures.monthly_users_lines)]
+}
+
+
+def filter_cases(dataset):
+    """Representative sidebar selections: everything, a season pair and a narrow date window"""
+    everything = make_filters(dataset)
+    window_end = min(everything.end, everything.start + datetime.timedelta(days=365))
+    return {
+        'all': everything,
+        'fall_winter': make_filters(dataset, seasons=['Fall', 'Winter']),
+        'one_year_clear': make_filters(dataset, end=window_end, weathers=['Clear/Partly Cloudy'])
+    }
+
+
+def summarize(timings):
+    return {'min': min(timings), 'median': statistics.median(timings), 'runs': len(timings)}
+
+
+def measure(func, repeat):
+    """Run `func` `repeat` times; returns its last result and timing statistics in seconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, summarize(timings)
+
+
+def measure_table(dataset, state, table, repeat):
+    """Time one table on fresh results whose shared filtered frame and selection are already built"""
+    timings = []
+    for _ in range(repeat):
+        results = FilterResults(dataset, state)
+        for shared in ('filtered_df', 'selection'):
+            if shared != table:
+                getattr(results, shared)
+        started = time.perf_counter()
+        value = getattr(results, table)
+        timings.append(time.perf_counter() - started)
+    return value, summarize(timings)
+
+
+def benchmark_scale(data_dir, repeat=5):
+    """Time every step against the dataset in `data_dir`"""
+    steps = {}
+    shutil.rmtree(os.path.join(data_dir, data_loader.CACHE_DIR_NAME), ignore_errors=True)
+    # A cold load is only cold once, so it runs a single time
+    (day_df, hour_cube), steps['load.cold'] = measure(lambda: data_loader.load_data(data_dir), 1)
+    _, steps['load.warm'] = measure(lambda: data_loader.load_data(data_dir), repeat)
+    dataset, steps['index.build'] = measure(lambda: Dataset.build(day_df, hour_cube), repeat)
+
+    for case, state in filter_cases(dataset).items():
+        _, steps[f'{case}.filter'] = measure(lambda: dataset.filter_index.apply(
+            dataset.day_df, state.start, state.end, state.seasons, state.weathers), repeat)
+        _, steps[f'{case}.selection'] = measure(lambda: dataset.day_stats.select(
+            state.start, state.end, state.seasons, state.weathers), repeat)
+
+        for section, parts in SECTIONS.items():
+            for tables, builder in parts:
+                values = []
+                for table in tables:
+                    value, steps[f'{case}.{section}.{table}'] = measure_table(dataset, state, table, repeat)
+                    values.append(value)
+                if builder is not None and all(value is not None for value in values):
+                    _, steps[f'{case}.{section}.{builder.__name__}'] = measure(lambda: builder(*values), repeat)
+    return {'days': len(day_df), 'hours': int(hour_cube.counts.sum()), 'steps': steps}
+
+
+def prepare_scale(work_dir, sample_dir, scale, seed):
+    """Generate the synthetic dataset for `scale` unless the work directory already has it"""
+    data_dir = os.path.join(work_dir, f'scale-{scale:g}-seed-{seed}')
+    if not all(os.path.exists(os.path.join(data_dir, f)) for f in data_loader.SOURCE_FILES.values()):
+        synthetic.write_dataset(data_dir, sample_dir, scale, seed)
+    return data_dir
+
+
+def run(scales, sample_dir, work_dir, repeat=5, seed=0):
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'seed': seed,
+        'scales': {}
+    }
+    for scale in scales:
+        key = f'{scale:g}x'
+        if scale > synthetic.max_scale():
+            report['scales'][key] = {'skipped': f"exceeds the largest supported scale ({synthetic.max_scale()}x)"}
+            continue
+        data_dir = prepare_scale(work_dir, sample_dir, scale, seed)
+        report['scales'][key] = benchmark_scale(data_dir, repeat)
+        print(f"{key}: {report['scales'][key]['days']} days benchmarked", file=sys.stderr)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Steps whose median grew more than `tolerance` (a fraction) over the baseline"""
+    regressions = []
+    for scale, result in report['scales'].items():
+        previous = baseline.get('scales', {}).get(scale, {}).get('steps', {})
+        for step, timing in result.get('steps', {}).items():
+            if step not in previous:
+                continue
+            before, after = previous[step]['median'], timing['median']
+            # Sub-millisecond steps are too noisy to call
+            if after > before * (1 + tolerance) and after - before > 1e-3:
+                regressions.append({'scale': scale, 'step': step, 'baseline': before, 'current': after,
+                                    'ratio': after / before if before else None})
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic data.")
+    parser.add_argument('--scale', type=float, action='append', dest='scales',
+                        help="Multiple of the sample size; repeat for several (default: 1, 10, 100, 1000)")
+    parser.add_argument('--sample-dir', default='dataset', help="Directory holding the sample day.csv and hour.csv")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'bike-benchmark'),
+                        help="Where generated datasets are kept between runs")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per step")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before a step counts as a regression")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run(args.scales or DEFAULT_SCALES, args.sample_dir, args.work_dir, args.repeat, args.seed)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+
+    document = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(document)
+    else:
+        print(document)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
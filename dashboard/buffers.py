@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class AppendBuffer:
+    """Append-only rows with spare capacity, shared by snapshots that each view a prefix of them"""
+
+    def __init__(self, rows, capacity=0):
+        rows = np.asarray(rows)
+        self._data = np.empty((max(capacity, len(rows), 1),) + rows.shape[1:], dtype=rows.dtype)
+        self._data[:len(rows)] = rows
+        self.length = len(rows)
+
+    def holds(self, rows):
+        """Whether `rows` is the longest prefix handed out, so appending to it needs no copy"""
+        return len(rows) == self.length and np.may_share_memory(rows, self._data)
+
+    def push(self, new_rows):
+        """Append `new_rows`; returns a view of every row so far"""
+        end = self.length + len(new_rows)
+        if end > len(self._data):
+            data = np.empty((max(end, 2 * len(self._data)),) + self._data.shape[1:], dtype=self._data.dtype)
+            data[:self.length] = self._data[:self.length]
+            self._data = data
+        self._data[self.length:end] = new_rows
+        self.length = end
+        return self._data[:end]
+
+
+def append(buffer, rows, new_rows):
+    """`rows` followed by `new_rows`, as (buffer, view of all of them)"""
+    if buffer is None or not buffer.holds(rows):
+        size = len(rows) + len(new_rows)
+        buffer = AppendBuffer(rows, size + size // 4)
+    return buffer, buffer.push(new_rows)
+
+
+class RevisableRows:
+    """Rows that only ever change at the end: a shared append-only head plus a small private tail"""
+
+    def __init__(self, head, tail=None, buffer=None):
+        self.head = head
+        self.tail = head[:0] if tail is None else tail
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self.head) + len(self.tail)
+
+    @property
+    def shape(self):
+        return (len(self),) + self.head.shape[1:]
+
+    def __array__(self, dtype=None, copy=None):
+        rows = np.concatenate([self.head, self.tail]) if len(self.tail) else np.asarray(self.head)
+        return rows if dtype is None else rows.astype(dtype)
+
+    def __getitem__(self, key):
+        if not len(self.tail):
+            return self.head[key]
+        n_head = len(self.head)
+        if isinstance(key, (int, np.integer)):
+            key = key + len(self) if key < 0 else key
+            return self.head[key] if key < n_head else self.tail[key - n_head]
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(len(self)))
+        key = np.asarray(key)
+        if key.dtype == bool:
+            return np.concatenate([self.head[key[:n_head]], self.tail[key[n_head:]]])
+        key = np.where(key < 0, key + len(self), key)
+        in_head = key < n_head
+        if in_head.all():
+            return self.head[key]
+        rows = np.empty((len(key),) + self.head.shape[1:], dtype=self.head.dtype)
+        rows[in_head] = self.head[key[in_head]]
+        rows[~in_head] = self.tail[key[~in_head] - n_head]
+        return rows
+
+    def replace(self, start, rows):
+        """New rows: the first `start` of these followed by `rows`; this object is left unchanged"""
+        n_head = len(self.head)
+        if start >= n_head:
+            buffer, head = append(self._buffer, self.head, self.tail[:start - n_head])
+        else:
+            buffer, head = append(None, self.head[:start], self.head[:0])
+        return RevisableRows(head, np.array(rows, dtype=self.head.dtype), buffer)
+
+
+def revise(rows, start, new_rows):
+    """`rows` (an ndarray or RevisableRows) with the rows from `start` on replaced by `new_rows`"""
+    if not isinstance(rows, RevisableRows):
+        rows = RevisableRows(rows)
+    return rows.replace(start, new_rows)
@@ -0,0 +1,154 @@
+"""Demand segmentation of days or hours into Low/Medium/High demand clusters
+
+    thresholds:3000,6000   fixed rental-count edges (the default for days)
+    quantiles              equally populated bins of the rental count (the default for hours)
+    kmeans                 mini-batch k-means over count, temperature and casual share
+"""
+import numpy as np
+import pandas as pd
+
+DEMAND_CLUSTERS = ['Low Demand', 'Medium Demand', 'High Demand']
+METHODS = ['thresholds', 'quantiles', 'kmeans']
+DEMAND_THRESHOLDS = (3000, 6000)
+# Default spec per granularity
+CLUSTERING = {'day': 'thresholds:3000,6000', 'hour': 'quantiles'}
+N_CLUSTERS = len(DEMAND_CLUSTERS)
+# Quantiles whose values separate the `quantiles` bins
+QUANTILES = np.arange(1, N_CLUSTERS) / N_CLUSTERS
+
+
+def features(frame):
+    """Rental count, temperature and casual share (%) of every row, as a float matrix"""
+    total = np.asarray(frame['total_count'], dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        casual_ratio = np.where(total > 0, np.asarray(frame['casual_users'], dtype=float) / total * 100, 0.0)
+    return np.column_stack([total, np.asarray(frame['temperature'], dtype=float), casual_ratio])
+
+
+def _sq_distances(points, centers):
+    # Expanded as |p|² - 2p·c + |c|², so only the points x centers matrix is allocated
+    distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)
+    return np.maximum(distances, 0)
+
+
+class Segmenter:
+    """Assigns demand clusters with fixed thresholds, quantile bins or mini-batch k-means"""
+
+    def __init__(self, method='thresholds', thresholds=DEMAND_THRESHOLDS, batch_size=256, n_iter=100, seed=0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown clustering method: {method}")
+        if method == 'thresholds' and len(thresholds) != N_CLUSTERS - 1:
+            raise ValueError(f"Expected {N_CLUSTERS - 1} thresholds, got {len(thresholds)}")
+        self.method = method
+        self.edges = np.sort(np.asarray(thresholds, dtype=float)) if method == 'thresholds' else None
+        self.batch_size = batch_size
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centers = None
+        self.scale = None
+
+    @classmethod
+    def parse(cls, spec):
+        """Segmenter for a spec string such as 'thresholds:3000,6000', 'quantiles' or 'kmeans'"""
+        method, _, argument = spec.partition(':')
+        if method == 'thresholds' and argument:
+            return cls(method, [float(value) for value in argument.split(',')])
+        return cls(method)
+
+    @property
+    def spec(self):
+        if self.method == 'thresholds':
+            return 'thresholds:' + ','.join(f'{edge:g}' for edge in self.edges)
+        return self.method
+
+    def fit(self, frame):
+        """Learn quantile edges or k-means centers from the rows of `frame`; returns self"""
+        if self.method == 'quantiles':
+            counts = np.asarray(frame['total_count'], dtype=float)
+            self.edges = np.nanquantile(counts, QUANTILES) if len(counts) else np.zeros(N_CLUSTERS - 1)
+        elif self.method == 'kmeans':
+            self._fit_kmeans(features(frame))
+        return self
+
+    def _fit_kmeans(self, points):
+        rng = np.random.default_rng(self.seed)
+        self.scale = (np.nanmean(points, axis=0), np.nanstd(points, axis=0)) if len(points) else (0.0, 1.0)
+        points = self._standardize(points)
+        if len(points) < N_CLUSTERS:
+            self.centers = np.zeros((N_CLUSTERS, points.shape[1]))
+            return
+
+        # k-means++ seeding on a sample, then mini-batch updates where every
+        # center moves to the running mean of the points assigned to it so far
+        sample = points[rng.choice(len(points), min(len(points), 10 * self.batch_size), replace=False)]
+        centers = [sample[rng.integers(len(sample))]]
+        for _ in range(1, N_CLUSTERS):
+            nearest = _sq_distances(sample, np.array(centers)).min(axis=1)
+            total = nearest.sum()
+            weights = nearest / total if total > 0 else None
+            centers.append(sample[rng.choice(len(sample), p=weights)])
+        centers = np.array(centers)
+        seen = np.zeros(N_CLUSTERS)
+        for _ in range(self.n_iter):
+            batch = points[rng.integers(0, len(points), min(len(points), self.batch_size))]
+            nearest = _sq_distances(batch, centers).argmin(axis=1)
+            counts = np.bincount(nearest, minlength=N_CLUSTERS)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, nearest, batch)
+            seen += counts
+            moved = counts > 0
+            centers[moved] += (sums[moved] - counts[moved, None] * centers[moved]) / seen[moved, None]
+
+        # Order the clusters by their rental count so codes read low to high
+        self.centers = centers[np.argsort(centers[:, 0], kind='stable')]
+
+    def _standardize(self, points):
+        mean, std = self.scale
+        points = (points - mean) / np.where(std > 0, std, 1.0)
+        # A missing feature sits at the mean
+        return np.nan_to_num(points, nan=0.0)
+
+    def codes(self, frame):
+        """Cluster code (0 = lowest demand) of every row of `frame`"""
+        if self.method == 'kmeans':
+            if self.centers is None:
+                raise ValueError("Segmenter has not been fitted")
+            return _sq_distances(self._standardize(features(frame)), self.centers).argmin(axis=1).astype(np.int8)
+        if self.edges is None:
+            raise ValueError("Segmenter has not been fitted")
+        return np.searchsorted(self.edges, np.asarray(frame['total_count'], dtype=float), side='right').astype(np.int8)
+
+    def assign(self, frame):
+        """Demand clusters of every row of `frame` as an ordered categorical"""
+        return pd.Categorical.from_codes(self.codes(frame), categories=DEMAND_CLUSTERS, ordered=True)
+
+
+def fit_segmenters(day_df, records, clustering=None):
+    """Fitted day and hour segmenters for a spec per granularity, defaults from CLUSTERING"""
+    clustering = {**CLUSTERING, **(clustering or {})}
+    return {
+        'day': Segmenter.parse(clustering['day']).fit(day_df),
+        'hour': Segmenter.parse(clustering['hour']).fit(records)
+    }
+
+
+def cluster_summary(counts, means, count_label):
+    """Cluster table from the row count and the mean features of every cluster; empty clusters are left out"""
+    table = pd.DataFrame({
+        'Avg Rentals': means[:, 0],
+        count_label: counts,
+        'Avg Temp': means[:, 1],
+        'Casual %': means[:, 2]
+    }, index=pd.CategoricalIndex(DEMAND_CLUSTERS, categories=DEMAND_CLUSTERS, ordered=True, name='demand_cluster'))
+    return table[counts > 0].round(2)
+
+
+def cluster_table(frame, codes, count_label):
+    """Average rentals, temperature and casual share per cluster, in one pass over `frame`"""
+    points = features(frame)
+    counts = np.bincount(codes, minlength=N_CLUSTERS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.column_stack([
+            np.bincount(codes, weights=points[:, i], minlength=N_CLUSTERS) / counts for i in range(points.shape[1])
+        ])
+    return cluster_summary(counts, means, count_label)
@@ -1,11 +1,23 @@
+import os
+from collections import deque
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import seaborn as sns
-import matplotlib.pyplot as plt
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import clustering
+import engine
+import figures
+import instrumentation
+import payloads
+import trendlines
+import warmup
+from data_loader import observed_labels
+from day_stats import CORRELATION_METRICS
+from filters import normalize_filters
+from ingest import HourlyFeed
+from refresher import REFRESH_INTERVAL, SnapshotRefresher
+from results_cache import LRUCache
+from tables import WEATHER_CORR_METRICS
 
 # Configure page
 st.set_page_config(
@@ -46,121 +58,107 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load data
-@st.cache_data
-def load_data():
-    """Load bike sharing data from CSV files"""
+# Instrumentation: BIKE_PERF_LOG appends every run to a JSON-lines file,
+# BIKE_DEBUG (or ?debug=1) offers the timing panel in the sidebar
+PERF_LOG = os.environ.get('BIKE_PERF_LOG')
+if PERF_LOG:
+    instrumentation.configure_log(PERF_LOG)
+DEBUG_PANEL = bool(os.environ.get('BIKE_DEBUG')) or st.query_params.get('debug') == '1'
+
+
+def trace_options():
+    """Trace settings for this session's script and fragment runs"""
+    ctx = get_script_run_ctx()
+    return {
+        'session': ctx.session_id if ctx else None,
+        'payloads': bool(PERF_LOG) or st.session_state.get('perf_panel', False),
+        'sink': st.session_state.setdefault('perf_runs', deque(maxlen=20))
+    }
+
+
+trace = instrumentation.start('script', **trace_options())
+
+# BIKE_DATA_DIR points the dashboard at another copy of day.csv/hour.csv;
+# BIKE_BACKEND=sqlite answers the tables with SQL instead of in-memory pandas
+DATA_DIR = os.environ.get('BIKE_DATA_DIR', 'dataset')
+BACKEND = os.environ.get('BIKE_BACKEND', 'pandas')
+# Demand segmenters for days and hours: thresholds:LOW,HIGH, quantiles or kmeans
+CLUSTERING = {
+    'day': os.environ.get('BIKE_DAY_CLUSTERS', clustering.CLUSTERING['day']),
+    'hour': os.environ.get('BIKE_HOUR_CLUSTERS', clustering.CLUSTERING['hour'])
+}
+
+@st.cache_resource
+def get_results_cache():
+    """Per-filter results shared by every session of this process; warm-up fills at most half of it"""
+    return LRUCache(maxsize=256)
+
+@st.cache_resource
+def get_figure_cache():
+    """Compacted figures per (dataset version, filter state, figure kind), shared by every session"""
+    return LRUCache(maxsize=512)
+
+# Load data once per process: with pandas the frames are read-only views of
+# the memory-mapped column cache, shared by every session without copies.
+# A background thread checks the CSVs every BIKE_REFRESH_SECONDS (0 turns
+# it off) and publishes a rebuilt snapshot when they change.
+REFRESH_SECONDS = float(os.environ.get('BIKE_REFRESH_SECONDS', REFRESH_INTERVAL))
+
+@st.cache_resource
+def get_refresher():
+    """Current dataset snapshot, rebuilt and swapped in off the request path when the sources change"""
+    instrumentation.miss()
+    results_cache = get_results_cache()
+
+    def prepare(snapshot):
+        # The default view of a new snapshot is ready before anyone can see it
+        state = engine.make_filters(snapshot)
+        results_cache.put((snapshot.version, state), engine.compute_results(snapshot, state).compute_all())
+
     try:
-        # Load daily data
-        day_df = pd.read_csv('dataset/day.csv')
-        hour_df = pd.read_csv('dataset/hour.csv')
-        
-        # Rename columns for readability
-        day_df = day_df.rename(columns={
-            'dteday': 'date',
-            'season': 'season',
-            'yr': 'year',
-            'mnth': 'month',
-            'holiday': 'is_holiday',
-            'weekday': 'weekday',
-            'workingday': 'is_workingday',
-            'weathersit': 'weather_situation',
-            'temp': 'temperature',
-            'atemp': 'feels_temperature',
-            'hum': 'humidity',
-            'windspeed': 'wind_speed',
-            'casual': 'casual_users',
-            'registered': 'registered_users',
-            'cnt': 'total_count'
-        })
-
-        hour_df = hour_df.rename(columns={
-            'dteday': 'date',
-            'season': 'season',
-            'yr': 'year',
-            'mnth': 'month',
-            'hr': 'hour',
-            'holiday': 'is_holiday',
-            'weekday': 'weekday',
-            'workingday': 'is_workingday',
-            'weathersit': 'weather_situation',
-            'temp': 'temperature',
-            'atemp': 'feels_temperature',
-            'hum': 'humidity',
-            'windspeed': 'wind_speed',
-            'casual': 'casual_users',
-            'registered': 'registered_users',
-            'cnt': 'total_count'
-        })
-
-        # Convert date to datetime
-        day_df['date'] = pd.to_datetime(day_df['date'])
-        hour_df['date'] = pd.to_datetime(hour_df['date'])
-
-        # Apply mappings
-        season_mapping = {1: 'Spring', 2: 'Summer', 3: 'Fall', 4: 'Winter'}
-        yr_mapping = {0: '2011', 1: '2012'}
-        mnth_mapping = {1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
-                        7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'}
-        weekday_mapping = {0: 'Sunday', 1: 'Monday', 2: 'Tuesday', 3: 'Wednesday', 
-                           4: 'Thursday', 5: 'Friday', 6: 'Saturday'}
-        weathersit_mapping = {
-            1: 'Clear/Partly Cloudy',
-            2: 'Mist/Cloudy',
-            3: 'Light Snow/Light Rain',
-            4: 'Severe Weather'
-        }
-        holiday_mapping = {0: 'No Holiday', 1: 'Holiday'}
-        workingday_mapping = {0: 'No', 1: 'Yes'}
-
-        # Apply mappings to day_df
-        day_df['season'] = day_df['season'].map(season_mapping)
-        day_df['year'] = day_df['year'].map(yr_mapping)
-        day_df['month'] = day_df['month'].map(mnth_mapping)
-        day_df['weekday'] = day_df['weekday'].map(weekday_mapping)
-        day_df['weather_situation'] = day_df['weather_situation'].map(weathersit_mapping)
-        day_df['is_holiday'] = day_df['is_holiday'].map(holiday_mapping)
-        day_df['is_workingday'] = day_df['is_workingday'].map(workingday_mapping)
-
-        # Apply mappings to hour_df  
-        hour_df['season'] = hour_df['season'].map(season_mapping)
-        hour_df['year'] = hour_df['year'].map(yr_mapping)
-        hour_df['month'] = hour_df['month'].map(mnth_mapping)
-        hour_df['weekday'] = hour_df['weekday'].map(weekday_mapping)
-        hour_df['weather_situation'] = hour_df['weather_situation'].map(weathersit_mapping)
-        hour_df['is_holiday'] = hour_df['is_holiday'].map(holiday_mapping)
-        hour_df['is_workingday'] = hour_df['is_workingday'].map(workingday_mapping)
-
-        hourly_avg = hour_df.groupby(['hour', 'is_workingday'])['total_count'].mean().reset_index()
-        workday_avg = hourly_avg[hourly_avg['is_workingday'] == 'Yes'][['hour', 'total_count']].rename(columns={'total_count': 'workday_avg'})
-        weekend_avg = hourly_avg[hourly_avg['is_workingday'] == 'No'][['hour', 'total_count']].rename(columns={'total_count': 'weekend_avg'})
-        hour_df = workday_avg.merge(weekend_avg, on='hour')
-
-
-        # Add demand clusters
-        def categorize_demand(count):
-            if count >= 6000:
-                return 'High Demand'
-            elif count >= 3000:
-                return 'Medium Demand'
-            else:
-                return 'Low Demand'
-        
-        day_df['demand_cluster'] = day_df['total_count'].apply(categorize_demand)
-        day_df['casual_ratio'] = (day_df['casual_users'] / day_df['total_count'] * 100).round(1)
-        day_df['registered_ratio'] = (day_df['registered_users'] / day_df['total_count'] * 100).round(1)
-        
-        return day_df, hour_df
-        
+        snapshots = SnapshotRefresher(DATA_DIR, BACKEND, REFRESH_SECONDS, prepare, CLUSTERING)
     except FileNotFoundError:
         st.error("⚠️ Dataset files not found! Please ensure 'dataset/day.csv' and 'dataset/hour.csv' exist in your directory.")
         st.stop()
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
         st.stop()
-
-# Load data
-day_df, hour_df = load_data()
+    if REFRESH_SECONDS > 0 and not os.environ.get('BIKE_HOURLY_FEED'):
+        snapshots.start()
+    return snapshots
+
+@st.cache_resource
+def get_hourly_feed():
+    """Tail the append-only hourly feed named by BIKE_HOURLY_FEED, if any (pandas backend only)"""
+    path = os.environ.get('BIKE_HOURLY_FEED')
+    return HourlyFeed(path, get_refresher().current) if path and BACKEND == 'pandas' else None
+
+# Warm-up: BIKE_WARMUP=0 disables it, a number warms that many of the most
+# used filters (read from BIKE_PERF_LOG), 'all' every combination the cache
+# has room for. New snapshots are re-warmed at most every BIKE_WARMUP_SECONDS.
+WARMUP = os.environ.get('BIKE_WARMUP', str(warmup.DEFAULT_LIMIT))
+WARMUP_SECONDS = float(os.environ.get('BIKE_WARMUP_SECONDS', warmup.DEFAULT_INTERVAL))
+
+@st.cache_resource
+def get_warmer():
+    """Background warm-up of the most used season/weather combinations into the results cache"""
+    if WARMUP == '0':
+        return None
+    limit = int(WARMUP) if WARMUP.isdigit() else None
+    return warmup.Warmer(get_results_cache(), limit=limit, log_path=PERF_LOG, interval=WARMUP_SECONDS)
+
+# Every rerun reads the latest published snapshot once and sticks to it
+with instrumentation.stage('load', cache='hit') as record:
+    snapshots = get_refresher()
+    hourly_feed = get_hourly_feed()
+    dataset = hourly_feed.poll() if hourly_feed else snapshots.current
+    record['rows'] = dataset.n_days
+options = engine.filter_options(dataset)
+results_cache = get_results_cache()
+figure_cache = get_figure_cache()
+warmer = get_warmer()
+if warmer:
+    warmer.ensure(dataset)
 
 # Header
 st.markdown('<h1 class="main-header">🚴‍♂️ Bike Sharing Analytics Dashboard</h1>', unsafe_allow_html=True)
@@ -172,110 +170,102 @@ st.sidebar.markdown("---")
 # Date range selector
 date_range = st.sidebar.date_input(
     "Select Date Range",
-    value=(day_df['date'].min(), day_df['date'].max()),
-    min_value=day_df['date'].min(),
-    max_value=day_df['date'].max()
+    value=(options['start'], options['end']),
+    min_value=options['start'],
+    max_value=options['end']
 )
 
 # Season filter
 selected_seasons = st.sidebar.multiselect(
     "Select Seasons",
-    options=day_df['season'].unique(),
-    default=day_df['season'].unique()
+    options=options['seasons'],
+    default=options['seasons']
 )
 
 # Weather filter
 selected_weather = st.sidebar.multiselect(
     "Select Weather Conditions", 
-    options=day_df['weather_situation'].unique(),
-    default=day_df['weather_situation'].unique()
+    options=options['weathers'],
+    default=options['weathers']
 )
 
-# Filter data
-filtered_df = day_df[
-    (day_df['date'].dt.date >= date_range[0]) & 
-    (day_df['date'].dt.date <= date_range[1]) &
-    (day_df['season'].isin(selected_seasons)) &
-    (day_df['weather_situation'].isin(selected_weather))
-]
+if DEBUG_PANEL:
+    st.sidebar.markdown("---")
+    st.sidebar.checkbox("🛠️ Show performance panel", key="perf_panel")
+
+# Filter data; every derived table is served from the shared per-filter cache
+filter_state = normalize_filters(date_range, selected_seasons, selected_weather)
+cache_key = (dataset.version, filter_state)
+with instrumentation.stage('filter', cache='hit' if cache_key in results_cache else 'miss') as record:
+    results = results_cache.get_or_compute(cache_key, lambda: engine.compute_results(dataset, filter_state))
+    filtered_df = results.filtered_df
+    record['rows'] = len(filtered_df)
 
 if filtered_df.empty:
     st.warning("⚠️ No data available for the selected filters. Please adjust the date range or filters.")
 
 
+def table(results, name):
+    """Fetch a derived table, timing it and noting whether it was already computed"""
+    label = name if isinstance(name, str) else name[0]
+    with instrumentation.stage(label, cache='hit' if results.computed(name) else 'miss') as record:
+        value = results.get(name)
+        if hasattr(value, 'shape'):
+            record['rows'] = value.shape[0]
+    return value
+
+
+def chart(results, builder, *tables):
+    """Render a figure built from the named tables, reusing the compacted figure for a repeat filter"""
+    key = (results.dataset.version, results.state, builder.__name__, tables)
+    with instrumentation.stage(builder.__name__, cache='hit' if key in figure_cache else 'miss') as record:
+        fig = figure_cache.get_or_compute(
+            key, lambda: payloads.compact(builder(*[table(results, name) for name in tables]))
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    instrumentation.figure(record, fig)
+
+
 # Key Metrics Row
 st.markdown("### 📈 Key Performance Metrics")
 col1, col2, col3, col4 = st.columns(4)
 
+kpis = table(results, 'kpis')
+
 with col1:
-    if not filtered_df.empty:
-        avg_daily = int(filtered_df['total_count'].mean())
-        delta_value = avg_daily - 4504
-    else:
-        avg_daily = 0
-        delta_value = 0
-    st.metric("Avg Daily Rentals", f"{avg_daily:,}", delta=f"{delta_value}")
+    st.metric("Avg Daily Rentals", f"{kpis['avg_daily']:,}", delta=f"{kpis['delta_value']}")
 
 with col2:
-    total_days = len(filtered_df)
-    st.metric("Total Days", total_days)
+    st.metric("Total Days", kpis['total_days'])
 
 with col3:
-    peak_day = filtered_df['total_count'].max()
-    st.metric("Peak Day Rentals", f"{peak_day:,}")
+    st.metric("Peak Day Rentals", f"{kpis['peak_day']:,}")
 
 with col4:
-    utilization = (avg_daily / peak_day * 100)
-    st.metric("Utilization Rate", f"{utilization:.1f}%")
+    st.metric("Utilization Rate", f"{kpis['utilization']:.1f}%")
 
 st.markdown("---")
 
 # Main Analysis Section
-tab1, tab2, tab3, tab4 = st.tabs(["🌸 Seasonal Patterns", "🌤️ Weather Impact", "👥 User Behavior", "⏰ Peak Hours"])
+# Each section computes its tables and figures only when it is the one on
+# screen, and runs as a fragment so switching sections reruns only itself.
+ANALYSIS_SECTIONS = ["🌸 Seasonal Patterns", "🌤️ Weather Impact", "👥 User Behavior", "⏰ Peak Hours"]
 
-seasonal_avg = filtered_df.groupby('season')['total_count'].mean().reset_index()
 
-if not seasonal_avg.empty:
-    best_season = seasonal_avg.loc[seasonal_avg['total_count'].idxmax(), 'season']
-    worst_season = seasonal_avg.loc[seasonal_avg['total_count'].idxmin(), 'season']
-else:
-    best_season = "N/A"
-    worst_season = "N/A"
-
-with tab1:
+def seasonal_section(results):
     st.markdown("### Seasonal Rental Patterns")
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Seasonal bar chart
-        seasonal_avg = filtered_df.groupby('season')['total_count'].mean().reset_index()
-        
-        fig = px.bar(
-            seasonal_avg, 
-            x='season', 
-            y='total_count',
-            title="Average Daily Rentals by Season",
-            color='season',
-            color_discrete_map={
-                'Spring': '#90EE90',
-                'Summer': '#FFD700', 
-                'Fall': '#FF8C00',
-                'Winter': '#87CEEB'
-            }
-        )
-        fig.update_layout(
-            showlegend=False,
-            xaxis_title="Season",
-            yaxis_title="Average Daily Rentals",
-            title_x=0.5
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        chart(results, figures.seasonal_bar, 'seasonal_avg')
     
     with col2:
         st.markdown("#### 🔍 Key Insights")
         
-        if not seasonal_avg.empty:
+        if not table(results, 'seasonal_avg').empty:
+            best_season, worst_season = table(results, 'best_worst_season')
             st.markdown(f"""
             <div class="insight-box">
             <strong>Best Season:</strong> {best_season}<br>
@@ -292,247 +282,186 @@ with tab1:
 
     # Seasonal trend over time
     st.markdown("#### Seasonal Trends Over Time")
-    monthly_trend = filtered_df.groupby([filtered_df['date'].dt.to_period('M'), 'season'])['total_count'].mean().reset_index()
-    monthly_trend['date'] = monthly_trend['date'].astype(str)
-    
-    fig = px.line(
-        monthly_trend, 
-        x='date', 
-        y='total_count', 
-        color='season',
-        title="Monthly Rental Trends by Season"
-    )
-    fig.update_layout(
-        xaxis_title="Month",
-        yaxis_title="Average Daily Rentals",
-        title_x=0.5
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    chart(results, figures.seasonal_trend, 'monthly_trend')
 
-with tab2:
+
+def weather_section(results):
     st.markdown("### Weather Impact Analysis")
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Weather condition impact
-        weather_avg = filtered_df.groupby('weather_situation')['total_count'].mean().reset_index()
-        
-        fig = px.bar(
-            weather_avg,
-            x='weather_situation',
-            y='total_count', 
-            title="Average Rentals by Weather Condition",
-            color='total_count',
-            color_continuous_scale='RdYlBu_r'
-        )
-        fig.update_layout(
-            xaxis_title="Weather Condition",
-            yaxis_title="Average Daily Rentals",
-            title_x=0.5,
-            xaxis_tickangle=-45
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        chart(results, figures.weather_bar, 'weather_avg')
     
     with col2:
-        # Temperature vs Rentals scatter
-        fig = px.scatter(
-            filtered_df,
-            x='temperature',
-            y='total_count',
-            color='weather_situation',
-            title="Temperature vs Rentals",
-            opacity=0.7,
-            trendline="ols"
+        # Temperature vs Rentals scatter with the selected trend per weather condition
+        method = st.radio(
+            "Trendline",
+            list(trendlines.TRENDLINES),
+            format_func=trendlines.TRENDLINES.get,
+            horizontal=True,
+            key="trendline"
         )
-        fig.update_layout(
-            xaxis_title="Temperature (Normalized)",
-            yaxis_title="Daily Rentals",
-            title_x=0.5
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        chart(results, figures.temperature_scatter, 'filtered_df', f'temperature_trend_{method}')
     
-    # Weather correlation heatmap
+    # Correlation heatmap over the chosen variables, from prefix-summed cross products
     st.markdown("#### Weather Variables Correlation")
-    weather_corr = filtered_df[['temperature', 'humidity', 'wind_speed', 'total_count']].corr()
-    
-    fig = px.imshow(
-        weather_corr,
-        text_auto=True,
-        aspect="auto",
-        title="Weather Factors Correlation Matrix",
-        color_continuous_scale='RdBu'
+    variables = st.multiselect(
+        "Variables",
+        CORRELATION_METRICS,
+        default=WEATHER_CORR_METRICS,
+        key="corr_variables"
     )
-    fig.update_layout(title_x=0.5)
-    st.plotly_chart(fig, use_container_width=True)
+    if len(variables) < 2:
+        st.info("Select at least two variables to correlate.")
+    elif variables == WEATHER_CORR_METRICS:
+        chart(results, figures.weather_correlation, 'weather_corr')
+    else:
+        chart(results, figures.weather_correlation, ('correlation', tuple(variables)))
+
 
-with tab3:
+def user_behavior_section(results):
     st.markdown("### User Behavior Analysis")
     
     col1, col2 = st.columns(2)
     
     with col1:
         # User type ratio by workday
-        user_ratio = filtered_df.groupby('is_workingday')[['casual_ratio', 'registered_ratio']].mean().reset_index()
-        user_ratio_melted = pd.melt(user_ratio, id_vars=['is_workingday'], 
-                                   value_vars=['casual_ratio', 'registered_ratio'],
-                                   var_name='user_type', value_name='percentage')
-        
-        fig = px.bar(
-            user_ratio_melted,
-            x='is_workingday',
-            y='percentage',
-            color='user_type',
-            title="User Type Distribution: Workday vs Weekend",
-            color_discrete_map={'casual_ratio': '#FF7F50', 'registered_ratio': '#4169E1'}
-        )
-        fig.update_layout(
-            xaxis_title="Working Day",
-            yaxis_title="Percentage (%)",
-            title_x=0.5,
-            legend_title="User Type"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        chart(results, figures.user_ratio_bar, 'user_ratio')
     
     with col2:
         # Demand clusters pie chart
-        cluster_counts = filtered_df['demand_cluster'].value_counts()
-        
-        fig = px.pie(
-            values=cluster_counts.values,
-            names=cluster_counts.index,
-            title="Demand Cluster Distribution",
-            color_discrete_map={
-                'High Demand': '#CD5C5C',
-                'Medium Demand': '#4682B4', 
-                'Low Demand': '#2E8B57'
-            }
-        )
-        fig.update_layout(title_x=0.5)
-        st.plotly_chart(fig, use_container_width=True)
+        chart(results, figures.cluster_pie, 'cluster_counts')
     
     # User comparison by season
     st.markdown("#### User Types by Season")
-    seasonal_users = filtered_df.groupby('season')[['casual_users', 'registered_users']].mean().reset_index()
-    
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        name='Casual Users',
-        x=seasonal_users['season'],
-        y=seasonal_users['casual_users'],
-        marker_color='#FF7F50'
-    ))
-    fig.add_trace(go.Bar(
-        name='Registered Users', 
-        x=seasonal_users['season'],
-        y=seasonal_users['registered_users'],
-        marker_color='#4169E1'
-    ))
-    
-    fig.update_layout(
-        barmode='stack',
-        title="Average Users by Season",
-        xaxis_title="Season",
-        yaxis_title="Average Users",
-        title_x=0.5
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    chart(results, figures.seasonal_users_bar, 'seasonal_users')
 
-with tab4:
+
+def peak_hours_section(results):
     st.markdown("### Peak Hours Analysis")
-    
-    # Peak hours comparison
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=hour_df['hour'],
-        y=hour_df['workday_avg'],
-        mode='lines+markers',
-        name='Workday',
-        line=dict(color='#1f77b4', width=3),
-        marker=dict(size=6)
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=hour_df['hour'], 
-        y=hour_df['weekend_avg'],
-        mode='lines+markers',
-        name='Weekend',
-        line=dict(color='#ff7f0e', width=3),
-        marker=dict(size=6)
-    ))
-    
-    fig.update_layout(
-        title="Hourly Rental Patterns: Workday vs Weekend",
-        xaxis_title="Hour of Day",
-        yaxis_title="Average Rentals",
-        title_x=0.5,
-        hovermode='x unified',
-        xaxis=dict(tickmode='linear', dtick=2)
-    )
-    
-    # Add peak hour annotations
-    workday_peak = hour_df.loc[hour_df['workday_avg'].idxmax()]
-    weekend_peak = hour_df.loc[hour_df['weekend_avg'].idxmax()]
-    
-    fig.add_annotation(
-        x=workday_peak['hour'], y=workday_peak['workday_avg'],
-        text=f"Peak: {workday_peak['hour']}:00",
-        showarrow=True, arrowhead=2, arrowcolor='#1f77b4'
-    )
-    
-    fig.add_annotation(
-        x=weekend_peak['hour'], y=weekend_peak['weekend_avg'],
-        text=f"Peak: {weekend_peak['hour']}:00", 
-        showarrow=True, arrowhead=2, arrowcolor='#ff7f0e'
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+
+    # Hourly profile for the days matching the sidebar filters
+    hour_profile = table(results, 'hour_profile')
+    chart(results, figures.peak_hours, 'hour_profile')
     
     # Peak hours summary
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 🕐 Workday Peaks")
-        workday_peaks = hour_df.nlargest(3, 'workday_avg')[['hour', 'workday_avg']]
+        workday_peaks = hour_profile.dropna(subset=['workday_avg']).nlargest(3, 'workday_avg')
         for _, row in workday_peaks.iterrows():
             st.markdown(f"**{int(row['hour'])}:00** - {int(row['workday_avg'])} rentals")
+        if workday_peaks.empty:
+            st.info("No workdays in the current selection.")
     
     with col2:
         st.markdown("#### 🕐 Weekend Peaks") 
-        weekend_peaks = hour_df.nlargest(3, 'weekend_avg')[['hour', 'weekend_avg']]
+        weekend_peaks = hour_profile.dropna(subset=['weekend_avg']).nlargest(3, 'weekend_avg')
         for _, row in weekend_peaks.iterrows():
             st.markdown(f"**{int(row['hour'])}:00** - {int(row['weekend_avg'])} rentals")
+        if weekend_peaks.empty:
+            st.info("No weekends or holidays in the current selection.")
+
+    # Drill-down into the hourly curves of one date or a set of days
+    st.markdown("#### 🔎 Daily Drill-Down")
+    filtered_df = table(results, 'filtered_df')
+    if filtered_df.empty:
+        st.info("No days in the current selection.")
+        return
+
+    mode = st.radio("Days", ["Single Date", "Peak Days", "Demand Cluster"], horizontal=True, key="drilldown_mode")
+    if mode == "Single Date":
+        date = st.date_input("Date", value=filtered_df['date'].max().date(), key="drilldown_date")
+        days = filtered_df.index[filtered_df['date'].dt.date == date]
+    elif mode == "Peak Days":
+        n_days = st.number_input(
+            "Number of peak days", min_value=1, max_value=len(filtered_df), value=min(10, len(filtered_df)),
+            key="drilldown_peaks"
+        )
+        days = filtered_df.nlargest(int(n_days), 'total_count').index.sort_values()
+    else:
+        cluster = st.selectbox("Demand cluster", observed_labels(filtered_df['demand_cluster']), key="drilldown_cluster")
+        days = filtered_df.index[filtered_df['demand_cluster'] == cluster]
 
-# Advanced Analytics Section
-st.markdown("---")
-st.markdown("### 🎯 Advanced Analytics")
+    if days.empty:
+        st.info("The chosen date is not part of the current selection.")
+    else:
+        # Rows of the filtered frame keep their position in the daily frame
+        chart(results, figures.hourly_curves, ('drilldown', tuple(days.tolist())))
+        st.caption(f"Averaged over {len(days)} day(s).")
 
-col1, col2 = st.columns(2)
 
-with col1:
-    # Demand cluster characteristics
-    st.markdown("#### Demand Cluster Characteristics")
-    cluster_stats = filtered_df.groupby('demand_cluster').agg({
-        'total_count': ['mean', 'count'],
-        'temperature': 'mean',
-        'casual_ratio': 'mean'
-    }).round(2)
-    
-    cluster_stats.columns = ['Avg Rentals', 'Days Count', 'Avg Temp', 'Casual %']
-    st.dataframe(cluster_stats, use_container_width=True)
+SECTION_RENDERERS = dict(zip(ANALYSIS_SECTIONS, [
+    seasonal_section, weather_section, user_behavior_section, peak_hours_section
+]))
 
-with col2:
-    # Weather impact summary
-    st.markdown("#### Weather Impact Summary")
-    weather_impact = filtered_df.groupby('weather_situation').agg({
-        'total_count': 'mean',
-        'temperature': 'mean', 
-        'humidity': 'mean'
-    }).round(2)
-    
-    weather_impact.columns = ['Avg Rentals', 'Avg Temp', 'Avg Humidity']
-    st.dataframe(weather_impact, use_container_width=True)
+
+@st.fragment
+def analysis_sections(results):
+    section = st.radio(
+        "Analysis Section",
+        ANALYSIS_SECTIONS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="analysis_section"
+    )
+    renderer = SECTION_RENDERERS[section]
+    with instrumentation.fragment(renderer.__name__, **trace_options()):
+        renderer(results)
+
+
+@st.fragment
+def advanced_analytics(results):
+    with instrumentation.fragment('advanced_analytics', **trace_options()):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # Demand cluster characteristics, per day or per hourly record
+            st.markdown("#### Demand Cluster Characteristics")
+            granularity = st.radio("Granularity", ["Days", "Hours"], horizontal=True, key="cluster_granularity")
+            name = 'cluster_stats' if granularity == "Days" else 'hour_cluster_stats'
+            st.dataframe(table(results, name), use_container_width=True)
+
+        with col2:
+            # Weather impact summary
+            st.markdown("#### Weather Impact Summary")
+            st.dataframe(table(results, 'weather_impact'), use_container_width=True)
+
+
+@st.fragment
+def interactive_analysis(results):
+    analysis_option = st.selectbox(
+        "Choose Analysis Type:",
+        ["Temperature vs Demand", "Seasonal Weather Patterns", "User Type Trends"]
+    )
+
+    with instrumentation.fragment('interactive_analysis', **trace_options()):
+        if analysis_option == "Temperature vs Demand":
+            # Temperature analysis
+            temp_analysis = table(results, 'temp_analysis')
+            if temp_analysis is not None:
+                chart(results, figures.temperature_bins_bar, 'temp_analysis')
+            else:
+                st.warning("⚠️ No data available for Temperature vs Demand analysis.")
+
+        elif analysis_option == "Seasonal Weather Patterns":
+            # Seasonal weather analysis
+            chart(results, figures.season_weather_heatmap, 'season_weather')
+
+        else:  # User Type Trends
+            # Monthly user trends
+            chart(results, figures.monthly_users_lines, 'monthly_users')
+
+
+analysis_sections(results)
+
+# Advanced Analytics Section
+st.markdown("---")
+st.markdown("### 🎯 Advanced Analytics")
+advanced_analytics(results)
 
 # Business Insights Section
 st.markdown("---")
@@ -571,76 +500,7 @@ with insights_col2:
 # Interactive Analysis Section
 st.markdown("---")
 st.markdown("### 🔍 Interactive Analysis")
-
-analysis_option = st.selectbox(
-    "Choose Analysis Type:",
-    ["Temperature vs Demand", "Seasonal Weather Patterns", "User Type Trends"]
-)
-
-if analysis_option == "Temperature vs Demand":
-    if not filtered_df.empty:
-        # Temperature analysis
-        temp_bins = pd.cut(
-            filtered_df['temperature'], 
-            bins=5, 
-            labels=['Very Cold', 'Cold', 'Moderate', 'Warm', 'Hot']
-        )
-        temp_analysis = filtered_df.groupby(temp_bins)['total_count'].mean().reset_index()
-        
-        fig = px.bar(
-            temp_analysis,
-            x='temperature',
-            y='total_count',
-            title="Rentals by Temperature Range",
-            color='total_count',
-            color_continuous_scale='thermal'
-        )
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.warning("⚠️ No data available for Temperature vs Demand analysis.")
-
-
-elif analysis_option == "Seasonal Weather Patterns":
-    # Seasonal weather analysis
-    season_weather = pd.crosstab(filtered_df['season'], filtered_df['weather_situation'], normalize='index') * 100
-    
-    fig = px.imshow(
-        season_weather,
-        text_auto=True,
-        aspect="auto", 
-        title="Weather Patterns by Season (%)",
-        color_continuous_scale='Blues'
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-else:  # User Type Trends
-    # Monthly user trends
-    monthly_users = filtered_df.groupby(filtered_df['date'].dt.to_period('M'))[['casual_users', 'registered_users']].mean().reset_index()
-    monthly_users['date'] = monthly_users['date'].astype(str)
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=monthly_users['date'],
-        y=monthly_users['casual_users'],
-        mode='lines+markers',
-        name='Casual Users',
-        line=dict(color='#FF7F50', width=2)
-    ))
-    fig.add_trace(go.Scatter(
-        x=monthly_users['date'],
-        y=monthly_users['registered_users'], 
-        mode='lines+markers',
-        name='Registered Users',
-        line=dict(color='#4169E1', width=2)
-    ))
-    
-    fig.update_layout(
-        title="Monthly User Type Trends",
-        xaxis_title="Month",
-        yaxis_title="Average Daily Users",
-        title_x=0.5
-    )
-    st.plotly_chart(fig, use_container_width=True)
+interactive_analysis(results)
 
 # Footer
 st.markdown("---")
@@ -649,4 +509,25 @@ st.markdown("""
     <strong>🚴‍♂️ Bike Sharing Analytics Dashboard</strong><br>
     Muhammad Irfan Abidin | Dicoding | 2025
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Close this run's trace; the panel shows it alongside the fragment runs since
+trace.info['filters'] = engine.filters_to_json(filter_state)
+trace.info['results_cache'] = results_cache.stats()
+trace.info['figure_cache'] = figure_cache.stats()
+trace.finish()
+
+if DEBUG_PANEL and st.session_state.get('perf_panel'):
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        runs = list(st.session_state['perf_runs'])
+        st.caption(f"Last full run: {runs[-1]['wall_ms']:.0f} ms · dataset v{dataset.version}")
+        stages = instrumentation.stages_frame(reversed(runs[-5:]))
+        stages['stage'] = ['  ' * depth + name for depth, name in zip(stages['depth'], stages['stage'])]
+        columns = [c for c in ['run', 'stage', 'wall_ms', 'rows', 'cache', 'payload_bytes'] if c in stages]
+        st.dataframe(stages[columns].round(1), hide_index=True, use_container_width=True)
+        st.json({
+            'results_cache': results_cache.stats(),
+            'figure_cache': figure_cache.stats(),
+            'warmup': warmer.stats() if warmer else None,
+            'refresher': snapshots.stats()
+        }, expanded=False)
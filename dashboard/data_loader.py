@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from clustering import CLUSTERING, Segmenter
+from hour_cube import HourCube
+
+# Bump whenever the cleaning below changes so stale caches are rebuilt
+CACHE_VERSION = 9
+CACHE_DIR_NAME = '.cache'
+SOURCE_FILES = {'day': 'day.csv', 'hour': 'hour.csv'}
+
+COLUMN_NAMES = {
+    'dteday': 'date',
+    'season': 'season',
+    'yr': 'year',
+    'mnth': 'month',
+    'hr': 'hour',
+    'holiday': 'is_holiday',
+    'weekday': 'weekday',
+    'workingday': 'is_workingday',
+    'weathersit': 'weather_situation',
+    'temp': 'temperature',
+    'atemp': 'feels_temperature',
+    'hum': 'humidity',
+    'windspeed': 'wind_speed',
+    'casual': 'casual_users',
+    'registered': 'registered_users',
+    'cnt': 'total_count'
+}
+
+SEASON_MAPPING = {1: 'Spring', 2: 'Summer', 3: 'Fall', 4: 'Winter'}
+YEAR_MAPPING = {0: '2011', 1: '2012'}
+MONTH_MAPPING = {1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
+                 7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'}
+WEEKDAY_MAPPING = {0: 'Sunday', 1: 'Monday', 2: 'Tuesday', 3: 'Wednesday',
+                   4: 'Thursday', 5: 'Friday', 6: 'Saturday'}
+WEATHER_MAPPING = {
+    1: 'Clear/Partly Cloudy',
+    2: 'Mist/Cloudy',
+    3: 'Light Snow/Light Rain',
+    4: 'Severe Weather'
+}
+HOLIDAY_MAPPING = {0: 'No Holiday', 1: 'Holiday'}
+WORKINGDAY_MAPPING = {0: 'No', 1: 'Yes'}
+
+LABEL_MAPPINGS = {
+    'season': SEASON_MAPPING,
+    'year': YEAR_MAPPING,
+    'month': MONTH_MAPPING,
+    'weekday': WEEKDAY_MAPPING,
+    'weather_situation': WEATHER_MAPPING,
+    'is_holiday': HOLIDAY_MAPPING,
+    'is_workingday': WORKINGDAY_MAPPING
+}
+
+# Narrow dtypes for streaming hour.csv; dates stay categorical so each chunk
+# only parses its handful of distinct days
+HOUR_DTYPES = {
+    'instant': 'int64', 'dteday': 'category', 'season': 'int8', 'yr': 'int8',
+    'mnth': 'int8', 'hr': 'int8', 'holiday': 'int8', 'weekday': 'int8',
+    'workingday': 'int8', 'weathersit': 'int8', 'temp': 'float32',
+    'atemp': 'float32', 'hum': 'float32', 'windspeed': 'float32',
+    'casual': 'int32', 'registered': 'int32', 'cnt': 'int32'
+}
+HOUR_CHUNK_ROWS = 250_000
+
+
+def to_category(codes, mapping):
+    """Encode raw integer codes as an ordered categorical; labels live only in the dictionary"""
+    keys = sorted(mapping)
+    codes = np.asarray(codes) - keys[0]
+    codes = np.where((codes >= 0) & (codes < len(keys)), codes, -1)
+    return pd.Categorical.from_codes(codes, categories=[mapping[k] for k in keys], ordered=True)
+
+
+def observed_labels(series):
+    """Labels of a categorical column that actually occur, in category order"""
+    return series.cat.remove_unused_categories().cat.categories.tolist()
+
+
+def clean_frame(df):
+    """Rename raw columns, parse dates and encode the label columns as categoricals"""
+    df = df.rename(columns=COLUMN_NAMES)
+    df['date'] = pd.to_datetime(df['date'])
+    for column, mapping in LABEL_MAPPINGS.items():
+        df[column] = to_category(df[column], mapping)
+    return df
+
+
+def prepare_day_data(day_df, clusters=CLUSTERING['day']):
+    """Clean the daily frame, sort it by date and add demand clusters (segmenter spec `clusters`) and user ratios"""
+    day_df = clean_frame(day_df).sort_values('date', kind='stable').reset_index(drop=True)
+    day_df['demand_cluster'] = Segmenter.parse(clusters).fit(day_df).assign(day_df)
+    day_df['casual_ratio'] = (day_df['casual_users'] / day_df['total_count'] * 100).round(1)
+    day_df['registered_ratio'] = (day_df['registered_users'] / day_df['total_count'] * 100).round(1)
+    return day_df
+
+
+def prepare_hour_data(hour_df):
+    """Clean the hourly frame, keeping every hourly row"""
+    return clean_frame(hour_df)
+
+
+def read_hour_chunks(path, columns=('dteday', 'hr', 'temp', 'casual', 'registered', 'cnt'), chunksize=HOUR_CHUNK_ROWS):
+    """Stream hour.csv in fixed-size chunks of narrowly typed columns"""
+    columns = list(columns)
+    return pd.read_csv(path, usecols=columns, dtype={c: HOUR_DTYPES[c] for c in columns}, chunksize=chunksize)
+
+
+def file_fingerprint(path, use_hash=False):
+    """Describe a source file by size and mtime, optionally by content hash"""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if use_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha1'] = digest.hexdigest()
+    return fingerprint
+
+
+def source_fingerprints(data_dir, use_hash=False):
+    """Fingerprint every source CSV in the data directory"""
+    return {
+        name: file_fingerprint(os.path.join(data_dir, filename), use_hash)
+        for name, filename in SOURCE_FILES.items()
+    }
+
+
+def save_array(path, values):
+    """np.save through a temporary file and a rename"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp.npy', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_columns(directory, frame):
+    """Save every column of `frame` as its own .npy file; returns the schema needed to read them back"""
+    os.makedirs(directory, exist_ok=True)
+    schema = []
+    for column in frame.columns:
+        series = frame[column]
+        entry = {'name': column}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy()
+            entry['categories'] = series.cat.categories.tolist()
+            entry['ordered'] = bool(series.cat.ordered)
+        else:
+            values = series.to_numpy()
+        save_array(os.path.join(directory, f'{column}.npy'), values)
+        schema.append(entry)
+    return schema
+
+
+def read_columns(directory, schema):
+    """Frame over memory-mapped, read-only column files written by write_columns()"""
+    columns = {}
+    for entry in schema:
+        values = np.load(os.path.join(directory, f"{entry['name']}.npy"), mmap_mode='r')
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, categories=entry['categories'], ordered=entry['ordered'])
+        columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_cache(cache_dir, fingerprints, clusters=CLUSTERING['day']):
+    """Return the cached daily frame and hour cube if the manifest matches the sources and clustering, else None"""
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (manifest.get('version') != CACHE_VERSION or manifest.get('sources') != fingerprints
+            or manifest.get('clusters') != Segmenter.parse(clusters).spec):
+        return None
+
+    try:
+        day_df = read_columns(os.path.join(cache_dir, 'day'), manifest['day'])
+        return day_df, HourCube.load(os.path.join(cache_dir, 'hour_cube'), day_df)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_cache(cache_dir, fingerprints, day_df, hour_cube, clusters=CLUSTERING['day']):
+    """Persist the cleaned daily frame and hour cube; failures only cost the next cold start"""
+    try:
+        # Drop the manifest first so a half-rewritten cache is never trusted
+        manifest_path = os.path.join(cache_dir, 'manifest.json')
+        try:
+            os.remove(manifest_path)
+        except FileNotFoundError:
+            pass
+
+        schema = write_columns(os.path.join(cache_dir, 'day'), day_df)
+        hour_cube.save(os.path.join(cache_dir, 'hour_cube'))
+
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'sources': fingerprints,
+                'clusters': Segmenter.parse(clusters).spec,
+                'day': schema
+            }, f)
+        os.replace(tmp_path, manifest_path)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def load_data(data_dir='dataset', use_cache=True, verify_hash=False, chunksize=HOUR_CHUNK_ROWS,
+              clusters=CLUSTERING['day']):
+    """Load the cleaned daily frame and the hour cube, skipping CSV parsing when the cache is fresh"""
+    cache_dir = os.path.join(data_dir, CACHE_DIR_NAME)
+    fingerprints = source_fingerprints(data_dir, verify_hash)
+
+    if use_cache:
+        cached = read_cache(cache_dir, fingerprints, clusters)
+        if cached is not None:
+            return cached
+
+    day_df = prepare_day_data(pd.read_csv(os.path.join(data_dir, SOURCE_FILES['day'])), clusters)
+    hour_path = os.path.join(data_dir, SOURCE_FILES['hour'])
+    try:
+        hour_cube = HourCube.from_chunks(
+            read_hour_chunks(hour_path, chunksize=chunksize), day_df,
+            os.path.join(cache_dir, 'hour_cube', 'records') if use_cache else None
+        )
+    except OSError:
+        # Like a failed write_cache: the records go to a private temporary index instead
+        hour_cube = HourCube.from_chunks(read_hour_chunks(hour_path, chunksize=chunksize), day_df)
+
+    if use_cache and write_cache(cache_dir, fingerprints, day_df, hour_cube, clusters):
+        cached = read_cache(cache_dir, fingerprints, clusters)
+        if cached is not None:
+            return cached
+    return day_df, hour_cube
@@ -0,0 +1,277 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+import buffers
+from filters import date_bounds
+
+# Day-level measures every tab averages over
+METRICS = [
+    'total_count', 'casual_users', 'registered_users',
+    'casual_ratio', 'registered_ratio', 'temperature', 'humidity'
+]
+# Categorical columns the tables are grouped by
+GROUP_KEYS = ['season', 'weather_situation', 'is_workingday', 'demand_cluster']
+# Metric pairs whose cross products are kept, for regressions
+PRODUCTS = [('temperature', 'total_count')]
+# Variables the correlation heatmap can choose from; every pair's cross
+# products are kept, per season/weather group only
+CORRELATION_METRICS = [
+    'temperature', 'feels_temperature', 'humidity', 'wind_speed',
+    'casual_users', 'registered_users', 'total_count'
+]
+CORRELATION_KEYS = ['season', 'weather_situation']
+
+
+def line_fits(index, n, sx, sy, sxx, syy, sxy):
+    """Least-squares fits of y on x per group from its moments: days, slope, intercept and R²"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var_x = n * sxx - sx ** 2
+        var_y = n * syy - sy ** 2
+        cov = n * sxy - sx * sy
+        slope = np.where(var_x > 0, cov / var_x, np.nan)
+        intercept = (sy - slope * sx) / n
+        r2 = np.where((var_x > 0) & (var_y > 0), cov ** 2 / (var_x * var_y), np.nan)
+    return pd.DataFrame({
+        'days': np.round(n).astype(int), 'slope': slope, 'intercept': intercept, 'r2': r2
+    }, index=index)
+
+
+def pearson(metrics, n, sums, gram):
+    """Pearson correlation matrix from the day count, the sums and the Gram matrix of `metrics`"""
+    cov = n * gram - np.outer(sums, sums)
+    # Variances lost to rounding (a constant column, a single day) count as zero, as in pandas
+    varies = np.diag(cov) > 1e-12 * n * np.diag(gram)
+    scale = np.sqrt(np.where(varies, np.diag(cov), np.nan))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.clip(cov / np.outer(scale, scale), -1, 1)
+    np.fill_diagonal(corr, np.where(varies, 1.0, np.nan))
+    return pd.DataFrame(corr, index=list(metrics), columns=list(metrics))
+
+
+class DayStats:
+    """Per-day sufficient statistics (count, sum, sum of squares, cross products) with prefix sums"""
+
+    def __init__(self, day_df, metrics=METRICS, keys=GROUP_KEYS, products=PRODUCTS):
+        self.metrics = list(metrics)
+        self.keys = list(keys)
+        self.products = [tuple(pair) for pair in products]
+        self.categories = {key: day_df[key].cat.categories for key in self.keys}
+
+        # Compact the full key product down to the groups that actually occur
+        flat = self._flat_groups(day_df)
+        self.group_ids = np.unique(flat[flat >= 0])
+        self._accumulate(day_df, flat, 0)
+
+    def _flat_groups(self, day_df):
+        """Flat index of each day's key combination, -1 where a key is missing"""
+        codes = np.stack([day_df[key].cat.codes.to_numpy() for key in self.keys])
+        valid = (codes >= 0).all(axis=0)
+        dims = [len(self.categories[key]) for key in self.keys]
+        return np.where(valid, np.ravel_multi_index(np.where(valid, codes, 0), dims), -1)
+
+    def _accumulate(self, tail_df, flat, start, base=None):
+        """Fill the prefix arrays from `tail_df`, the daily frame from row `start` on, reusing earlier rows from `base`"""
+        dims = [len(self.categories[key]) for key in self.keys]
+        self.group_codes = dict(zip(self.keys, np.unravel_index(self.group_ids, dims)))
+        self._set_dates(tail_df['date'].to_numpy().astype('datetime64[D]'), start, base)
+
+        n_tail, n_groups = len(tail_df), len(self.group_ids)
+        rows = np.flatnonzero(flat >= 0)
+        day_group = np.searchsorted(self.group_ids, flat[rows])
+        values = tail_df[self.metrics].to_numpy(dtype=float)[rows]
+
+        counts = np.zeros((n_tail, n_groups))
+        sums = np.zeros((n_tail, n_groups, len(self.metrics)))
+        sumsq = np.zeros_like(sums)
+        cross = np.zeros((n_tail, n_groups, len(self.products)))
+        counts[rows, day_group] = 1
+        sums[rows, day_group] = values
+        sumsq[rows, day_group] = values ** 2
+        for i, (x, y) in enumerate(self.products):
+            cross[rows, day_group, i] = values[:, self.metrics.index(x)] * values[:, self.metrics.index(y)]
+
+        self.count_prefix = self._prefix(counts, start, None if base is None else base.count_prefix)
+        self.sum_prefix = self._prefix(sums, start, None if base is None else base.sum_prefix)
+        self.sumsq_prefix = self._prefix(sumsq, start, None if base is None else base.sumsq_prefix)
+        self.cross_prefix = self._prefix(cross, start, None if base is None else base.cross_prefix)
+
+    def _set_dates(self, tail_dates, start, base):
+        """Dates and calendar-month starts, appended to those of `base` when its dates from `start` on are kept"""
+        self._dates_buffer = None
+        if base is None:
+            self.dates = tail_dates
+        else:
+            kept = len(base.dates) - start
+            if np.array_equal(base.dates[start:], tail_dates[:kept]):
+                self._dates_buffer, self.dates = buffers.append(base._dates_buffer, base.dates, tail_dates[kept:])
+            else:
+                self.dates = np.concatenate([base.dates[:start], tail_dates])
+
+        # Positions where a new calendar month starts, for the monthly trends
+        first = max(start - 1, 0)
+        months = self.dates[first:].astype('datetime64[M]')
+        month_starts = first + np.flatnonzero(np.r_[start == 0, months[1:] != months[:-1]])
+        month_labels = months[month_starts - first].astype(str)
+        if base is not None:
+            earlier = np.searchsorted(base.month_starts, start)
+            month_starts = np.concatenate([base.month_starts[:earlier], month_starts])
+            month_labels = np.concatenate([base.month_labels[:earlier], month_labels])
+        self.month_starts = month_starts
+        self.month_labels = month_labels
+
+    @staticmethod
+    def _prefix(tail, start, base_prefix):
+        if base_prefix is None:
+            prefix = np.zeros((len(tail) + 1,) + tail.shape[1:])
+            np.cumsum(tail, axis=0, out=prefix[1:])
+            return prefix
+        # Rows up to `start` are shared with the base; only the ones after it are new
+        return buffers.revise(base_prefix, start + 1, np.cumsum(tail, axis=0) + base_prefix[start])
+
+    def extend(self, day_df, start):
+        """Statistics for an updated daily frame whose rows before `start` are unchanged"""
+        start = min(start, len(self.dates))
+        tail_df = day_df.iloc[start:]
+        flat = self._flat_groups(tail_df)
+        if not np.isin(flat[flat >= 0], self.group_ids).all():
+            return DayStats(day_df, self.metrics, self.keys, self.products)
+
+        stats = DayStats.__new__(DayStats)
+        stats.metrics = self.metrics
+        stats.keys = self.keys
+        stats.products = self.products
+        stats.categories = self.categories
+        stats.group_ids = self.group_ids
+        stats._accumulate(tail_df, flat, start, base=self)
+        return stats
+
+    @classmethod
+    def correlations(cls, day_df, metrics=CORRELATION_METRICS):
+        """Statistics keyed by season and weather only, with the cross products of every metric pair"""
+        return cls(day_df, metrics, CORRELATION_KEYS, list(combinations(metrics, 2)))
+
+    def group_mask(self, seasons, weathers):
+        """Groups whose season and weather are among the selected labels"""
+        mask = np.isin(self.group_codes['season'], self.categories['season'].get_indexer(list(seasons)))
+        return mask & np.isin(
+            self.group_codes['weather_situation'],
+            self.categories['weather_situation'].get_indexer(list(weathers))
+        )
+
+    def select(self, start, end, seasons, weathers):
+        """Statistics for a sidebar filter: date range plus season/weather choices"""
+        lo, hi = date_bounds(self.dates, start, end)
+        return StatsSelection(self, lo, hi, self.group_mask(seasons, weathers))
+
+
+class StatsSelection:
+    """Sufficient statistics of one filter, reduced to per-group arrays"""
+
+    def __init__(self, stats, lo, hi, group_mask):
+        self.stats = stats
+        self.lo = lo
+        self.hi = hi
+        self.group_mask = group_mask
+        self.counts = (stats.count_prefix[hi] - stats.count_prefix[lo]) * group_mask
+        self.sums = (stats.sum_prefix[hi] - stats.sum_prefix[lo]) * group_mask[:, None]
+        self.sumsq = (stats.sumsq_prefix[hi] - stats.sumsq_prefix[lo]) * group_mask[:, None]
+        self.cross = (stats.cross_prefix[hi] - stats.cross_prefix[lo]) * group_mask[:, None]
+
+    @property
+    def n_days(self):
+        return int(round(self.counts.sum()))
+
+    def _metric_index(self, metrics):
+        return [self.stats.metrics.index(metric) for metric in metrics]
+
+    def _reduce(self, by, counts, sums):
+        """Fold group statistics onto the categories of `by`, dropping empty ones"""
+        by = [by] if isinstance(by, str) else list(by)
+        dims = [len(self.stats.categories[key]) for key in by]
+        flat = np.ravel_multi_index([self.stats.group_codes[key] for key in by], dims)
+        size = int(np.prod(dims))
+
+        out_counts = np.bincount(flat, weights=counts, minlength=size)
+        out_sums = np.zeros((size, sums.shape[-1]))
+        np.add.at(out_sums, flat, sums)
+
+        present = np.flatnonzero(out_counts > 0)
+        codes = np.unravel_index(present, dims)
+        arrays = [
+            pd.Categorical.from_codes(code, categories=self.stats.categories[key], ordered=True)
+            for key, code in zip(by, codes)
+        ]
+        if len(by) == 1:
+            index = pd.CategoricalIndex(arrays[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(arrays, names=by)
+        return index, out_counts[present], out_sums[present]
+
+    def count(self, by):
+        """Number of days per group, like groupby(by).size()"""
+        index, counts, _ = self._reduce(by, self.counts, self.sums[:, :0])
+        return pd.Series(counts.round().astype(int), index=index, name='count')
+
+    def mean(self, by, metrics):
+        """Per-group means, like groupby(by, observed=True)[metrics].mean()"""
+        cols = self._metric_index(metrics)
+        index, counts, sums = self._reduce(by, self.counts, self.sums[:, cols])
+        return pd.DataFrame(sums / counts[:, None], index=index, columns=metrics)
+
+    def regression(self, x, y, by):
+        """Per-group least-squares fit of `y` on `x`: days, slope, intercept and R²"""
+        cols = self._metric_index([x, y])
+        pair = self.stats.products.index((x, y))
+        moments = np.concatenate([self.sums[:, cols], self.sumsq[:, cols], self.cross[:, [pair]]], axis=1)
+        index, n, moments = self._reduce(by, self.counts, moments)
+        return line_fits(index, n, *moments.T)
+
+    def correlation(self, metrics):
+        """Pearson correlation matrix of `metrics` over every selected day, like DataFrame.corr()"""
+        cols = self._metric_index(metrics)
+        gram = np.diag(self.sumsq[:, cols].sum(axis=0))
+        products = self.stats.products
+        for i, j in combinations(range(len(metrics)), 2):
+            pair = (metrics[i], metrics[j])
+            k = products.index(pair) if pair in products else products.index(pair[::-1])
+            gram[i, j] = gram[j, i] = self.cross[:, k].sum()
+        return pearson(metrics, self.counts.sum(), self.sums[:, cols].sum(axis=0), gram)
+
+    def overall_mean(self, metric):
+        """Mean of one metric over every selected day"""
+        n = self.counts.sum()
+        return self.sums[:, self.stats.metrics.index(metric)].sum() / n if n else np.nan
+
+    def monthly_mean(self, metrics, by=None):
+        """Calendar-month means, optionally split by a group key, with 'date' as YYYY-MM"""
+        stats = self.stats
+        inner = stats.month_starts[(stats.month_starts > self.lo) & (stats.month_starts < self.hi)]
+        bounds = np.r_[self.lo, inner, self.hi] if self.hi > self.lo else np.array([self.lo])
+        first = np.searchsorted(stats.month_starts, self.lo, side='right') - 1
+        labels = stats.month_labels[first:first + len(bounds) - 1]
+
+        cols = self._metric_index(metrics)
+        counts = np.diff(stats.count_prefix[bounds], axis=0) * self.group_mask
+        sums = np.diff(stats.sum_prefix[bounds][:, :, cols], axis=0) * self.group_mask[:, None]
+
+        if by is None:
+            month_counts = counts.sum(axis=1)
+            present = month_counts > 0
+            frame = pd.DataFrame(sums.sum(axis=1)[present] / month_counts[present, None], columns=metrics)
+            frame.insert(0, 'date', labels[present])
+            return frame
+
+        # Fold groups onto the categories of `by` for every month at once
+        categories = stats.categories[by]
+        onehot = np.zeros((len(self.group_mask), len(categories)))
+        onehot[np.arange(len(self.group_mask)), stats.group_codes[by]] = 1
+        by_counts = counts @ onehot
+        by_sums = np.einsum('kgm,gc->kcm', sums, onehot)
+
+        month_pos, code = np.nonzero(by_counts > 0)
+        frame = pd.DataFrame(by_sums[month_pos, code] / by_counts[month_pos, code][:, None], columns=metrics)
+        frame.insert(0, by, pd.Categorical.from_codes(code, categories=categories, ordered=True))
+        frame.insert(0, 'date', labels[month_pos])
+        return frame
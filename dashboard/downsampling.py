@@ -0,0 +1,90 @@
+import numpy as np
+
+# Scatters above this many points render through WebGL (Scattergl)
+WEBGL_THRESHOLD = 1000
+# Point budgets that keep figure payloads bounded however much data is selected
+SCATTER_MAX_POINTS = 5000
+LINE_MAX_POINTS = 500
+DENSITY_GRID = 64
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: positions of `threshold` points that preserve the line's shape"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Interior points fall into threshold - 2 buckets; the end points are always kept
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def decimate(frame, y, by=None, max_points=LINE_MAX_POINTS):
+    """Rows of `frame` that LTTB keeps for each `y` column, per `by` group, in their original order"""
+    y = [y] if isinstance(y, str) else list(y)
+    if by is None:
+        groups = [np.arange(len(frame))]
+    else:
+        codes = frame[by].cat.codes.to_numpy()
+        groups = [np.flatnonzero(codes == code) for code in np.unique(codes)]
+    if all(len(rows) <= max_points for rows in groups):
+        return frame
+
+    keep = np.zeros(len(frame), dtype=bool)
+    for rows in groups:
+        for column in y:
+            values = frame[column].to_numpy(dtype=float)[rows]
+            finite = np.flatnonzero(np.isfinite(values))
+            picked = lttb(finite.astype(float), values[finite], max_points)
+            keep[rows[finite[picked]]] = True
+    return frame[keep]
+
+
+def _water_level(counts, budget):
+    """Largest per-cell cap whose capped total stays within `budget`"""
+    lo, hi = 1, max(int(counts.max()), 1)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if np.minimum(counts, mid).sum() <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def sample_points(frame, x, y, max_points=SCATTER_MAX_POINTS, method='density', seed=0):
+    """At most about `max_points` rows of `frame` for a scatter of `y` against `x`"""
+    n = len(frame)
+    if n <= max_points:
+        return frame
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        return frame.iloc[np.sort(rng.choice(n, max_points, replace=False))]
+
+    cells = np.zeros(n, dtype=np.intp)
+    for column in (x, y):
+        values = frame[column].to_numpy(dtype=float)
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        scaled = (values - lo) / (hi - lo) if hi > lo else np.zeros(n)
+        cells = cells * DENSITY_GRID + np.clip((np.nan_to_num(scaled) * DENSITY_GRID).astype(int), 0, DENSITY_GRID - 1)
+
+    counts = np.bincount(cells, minlength=DENSITY_GRID ** 2)
+    cap = _water_level(counts, max_points)
+
+    # Shuffle, then keep the first `cap` rows of every cell
+    order = rng.permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(n) - starts[cells[order]]
+    return frame.iloc[np.sort(order[rank < cap])]
@@ -0,0 +1,198 @@
+"""Headless bike sharing analytics engine
+
+    python engine.py --season Fall --season Winter --out precomputed/ --format parquet
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import sql_backend
+from clustering import CLUSTERING
+from filters import normalize_filters
+from tables import TABLE_NAMES, Dataset
+
+
+BACKENDS = ['pandas', 'sqlite']
+
+
+def load_dataset(data_dir='dataset', use_cache=True, backend='pandas', clustering=None):
+    """Load the cleaned data and build every index and pre-aggregation"""
+    clustering = {**CLUSTERING, **(clustering or {})}
+    if backend == 'sqlite':
+        return sql_backend.load_dataset(data_dir, use_cache=use_cache, clustering=clustering)
+    day_df, hour_cube = data_loader.load_data(data_dir, use_cache=use_cache, clusters=clustering['day'])
+    return Dataset.build(day_df, hour_cube, clustering=clustering)
+
+
+def build_cache(data_dir='dataset', backend='pandas', clustering=None):
+    """Bring the columnar cache (or the database) up to date, e.g. once before starting worker processes"""
+    clustering = {**CLUSTERING, **(clustering or {})}
+    if backend == 'sqlite':
+        sql_backend.load_dataset(data_dir, clustering=clustering)
+    else:
+        data_loader.load_data(data_dir, clusters=clustering['day'])
+
+
+def filter_options(dataset):
+    """Choices the sidebar offers: the date span and the observed labels"""
+    return dataset.filter_options()
+
+
+def make_filters(dataset, start=None, end=None, seasons=None, weathers=None):
+    """Normalized filter state; anything left out means 'everything'"""
+    options = filter_options(dataset)
+    return normalize_filters(
+        (start or options['start'], end or options['end']),
+        options['seasons'] if seasons is None else seasons,
+        options['weathers'] if weathers is None else weathers
+    )
+
+
+def compute_results(dataset, filters):
+    """Lazily evaluated tables for one filter state"""
+    return dataset.results(filters)
+
+
+def compute_tables(dataset, filters, names=TABLE_NAMES):
+    """Every requested table for one filter state, as a name -> table dict"""
+    return result_tables(compute_results(dataset, filters), names)
+
+
+def result_tables(results, names=TABLE_NAMES):
+    """The requested tables of already computed `results`, as a name -> table dict"""
+    return {name: getattr(results, name) for name in names}
+
+
+def _plain(value):
+    """Convert numpy/pandas scalars to JSON-friendly Python values"""
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return None if math.isnan(value) else value
+    if isinstance(value, (pd.Timestamp, pd.Period)):
+        return str(value)
+    return value
+
+
+def table_to_json(table):
+    """JSON-ready form of a table: records for frames, a mapping for series"""
+    if table is None:
+        return None
+    if isinstance(table, pd.DataFrame):
+        frame = table.reset_index() if not isinstance(table.index, pd.RangeIndex) else table
+        return [
+            {str(column): _plain(value) for column, value in row.items()}
+            for row in frame.astype(object).to_dict(orient='records')
+        ]
+    if isinstance(table, pd.Series):
+        return {str(key): _plain(value) for key, value in table.items()}
+    if isinstance(table, dict):
+        return {key: _plain(value) for key, value in table.items()}
+    if isinstance(table, (tuple, list)):
+        return [_plain(value) for value in table]
+    return _plain(table)
+
+
+def filters_to_json(filters):
+    return {
+        'start': filters.start.isoformat(),
+        'end': filters.end.isoformat(),
+        'seasons': list(filters.seasons),
+        'weathers': list(filters.weathers)
+    }
+
+
+def parquet_available():
+    """Whether pandas has a Parquet engine (pyarrow or fastparquet) to write with"""
+    return any(importlib.util.find_spec(engine) is not None for engine in ('pyarrow', 'fastparquet'))
+
+
+def write_tables(tables, filters, out_dir, fmt='json'):
+    """Write tables as one JSON document, or as Parquet files plus a JSON sidecar"""
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == 'json':
+        document = {'filters': filters_to_json(filters)}
+        document.update({name: table_to_json(table) for name, table in tables.items()})
+        path = os.path.join(out_dir, 'tables.json')
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=1)
+        return [path]
+
+    # Frames and series go to Parquet; small scalar tables go to the sidecar
+    paths = []
+    scalars = {'filters': filters_to_json(filters)}
+    for name, table in tables.items():
+        if isinstance(table, pd.Series):
+            table = table.to_frame()
+        if isinstance(table, pd.DataFrame):
+            frame = table.reset_index() if not isinstance(table.index, pd.RangeIndex) else table
+            frame.columns = [str(column) for column in frame.columns]
+            path = os.path.join(out_dir, f'{name}.parquet')
+            frame.to_parquet(path, index=False)
+            paths.append(path)
+        else:
+            scalars[name] = table_to_json(table)
+    path = os.path.join(out_dir, 'scalars.json')
+    with open(path, 'w') as f:
+        json.dump(scalars, f, indent=1)
+    paths.append(path)
+    return paths
+
+
+def iso_date(value):
+    """argparse type for a YYYY-MM-DD day"""
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a valid YYYY-MM-DD date: {value!r}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Precompute the bike sharing dashboard tables for a filter.")
+    parser.add_argument('--data-dir', default='dataset', help="Directory holding day.csv and hour.csv")
+    parser.add_argument('--start', type=iso_date, help="First day, YYYY-MM-DD (default: first day in the data)")
+    parser.add_argument('--end', type=iso_date, help="Last day, YYYY-MM-DD (default: last day in the data)")
+    parser.add_argument('--season', action='append', dest='seasons', choices=list(data_loader.SEASON_MAPPING.values()),
+                        help="Season to keep; repeat for several (default: all)")
+    parser.add_argument('--weather', action='append', dest='weathers', choices=list(data_loader.WEATHER_MAPPING.values()),
+                        help="Weather condition to keep; repeat for several (default: all)")
+    parser.add_argument('--table', action='append', dest='tables', choices=TABLE_NAMES, help="Table to compute; repeat for several (default: all)")
+    parser.add_argument('--out', required=True, help="Output directory")
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json')
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas', help="Compute in memory with pandas or push down to SQLite")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not write the columnar cache or database")
+    parser.add_argument('--day-clusters', default=CLUSTERING['day'],
+                        help="Daily demand segmenter: thresholds:LOW,HIGH, quantiles or kmeans")
+    parser.add_argument('--hour-clusters', default=CLUSTERING['hour'],
+                        help="Hourly demand segmenter: thresholds:LOW,HIGH, quantiles or kmeans")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # Fail before the data is loaded rather than after every table is computed
+    if args.start and args.end and args.start > args.end:
+        parser.error(f"--start {args.start} is after --end {args.end}")
+    if args.format == 'parquet' and not parquet_available():
+        parser.error("--format parquet needs pyarrow or fastparquet (pip install pyarrow); use --format json without them")
+    clustering = {'day': args.day_clusters, 'hour': args.hour_clusters}
+    dataset = load_dataset(args.data_dir, use_cache=not args.no_cache, backend=args.backend, clustering=clustering)
+    filters = make_filters(dataset, args.start, args.end, args.seasons, args.weathers)
+    tables = compute_tables(dataset, filters, args.tables or TABLE_NAMES)
+    for path in write_tables(tables, filters, args.out, args.format):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import plotly.graph_objects as go
+
+import downsampling
+
+# plotly.express is imported by the builders that need it, so startup and
+# unrelated charts never pay for it
+
+SEASON_COLORS = {
+    'Spring': '#90EE90',
+    'Summer': '#FFD700',
+    'Fall': '#FF8C00',
+    'Winter': '#87CEEB'
+}
+CLUSTER_COLORS = {
+    'High Demand': '#CD5C5C',
+    'Medium Demand': '#4682B4',
+    'Low Demand': '#2E8B57'
+}
+USER_COLORS = {'casual': '#FF7F50', 'registered': '#4169E1'}
+
+
+def seasonal_bar(seasonal_avg):
+    """Average daily rentals per season"""
+    import plotly.express as px
+
+    fig = px.bar(
+        seasonal_avg,
+        x='season',
+        y='total_count',
+        title="Average Daily Rentals by Season",
+        color='season',
+        color_discrete_map=SEASON_COLORS
+    )
+    fig.update_layout(
+        showlegend=False,
+        xaxis_title="Season",
+        yaxis_title="Average Daily Rentals",
+        title_x=0.5
+    )
+    return fig
+
+
+def seasonal_trend(monthly_trend):
+    """Monthly average rentals, one line per season"""
+    import plotly.express as px
+
+    fig = px.line(
+        downsampling.decimate(monthly_trend, 'total_count', by='season'),
+        x='date',
+        y='total_count',
+        color='season',
+        title="Monthly Rental Trends by Season"
+    )
+    fig.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Average Daily Rentals",
+        title_x=0.5
+    )
+    return fig
+
+
+def weather_bar(weather_avg):
+    """Average daily rentals per weather condition"""
+    import plotly.express as px
+
+    fig = px.bar(
+        weather_avg,
+        x='weather_situation',
+        y='total_count',
+        title="Average Rentals by Weather Condition",
+        color='total_count',
+        color_continuous_scale='RdYlBu_r'
+    )
+    fig.update_layout(
+        xaxis_title="Weather Condition",
+        yaxis_title="Average Daily Rentals",
+        title_x=0.5,
+        xaxis_tickangle=-45
+    )
+    return fig
+
+
+def temperature_scatter(filtered_df, trend=None, sampling='density'):
+    """Daily rentals against temperature, with a trend line per weather condition"""
+    import plotly.express as px
+
+    points = downsampling.sample_points(filtered_df, 'temperature', 'total_count', method=sampling)
+    title = "Temperature vs Rentals"
+    if len(points) < len(filtered_df):
+        title += f" ({len(points):,} of {len(filtered_df):,} days shown)"
+    fig = px.scatter(
+        points,
+        x='temperature',
+        y='total_count',
+        color='weather_situation',
+        title=title,
+        opacity=0.7,
+        render_mode='webgl' if len(filtered_df) > downsampling.WEBGL_THRESHOLD else 'svg'
+    )
+
+    if trend is not None:
+        colors = {trace.name: trace.marker.color for trace in fig.data}
+        for label, line in trend.groupby('weather_situation', observed=True, sort=False):
+            hover = f"<b>{label}</b><br>"
+            if 'r2' in line:
+                hover += f"R²={line['r2'].iloc[0]:.3f}<br>"
+            fig.add_trace(go.Scatter(
+                x=line['temperature'],
+                y=line['total_count'],
+                mode='lines',
+                name=label,
+                legendgroup=label,
+                showlegend=False,
+                line=dict(color=colors.get(label), width=2),
+                hovertemplate=hover + "temperature=%{x}<br>total_count=%{y:.0f}<extra></extra>"
+            ))
+
+    fig.update_layout(
+        xaxis_title="Temperature (Normalized)",
+        yaxis_title="Daily Rentals",
+        title_x=0.5
+    )
+    return fig
+
+
+def weather_correlation(weather_corr):
+    """Correlation heatmap of the weather variables and rentals"""
+    import plotly.express as px
+
+    fig = px.imshow(
+        weather_corr,
+        text_auto=True,
+        aspect="auto",
+        title="Weather Factors Correlation Matrix",
+        color_continuous_scale='RdBu'
+    )
+    fig.update_layout(title_x=0.5)
+    return fig
+
+
+def user_ratio_bar(user_ratio):
+    """Casual vs registered share on workdays and weekends"""
+    import plotly.express as px
+
+    fig = px.bar(
+        user_ratio,
+        x='is_workingday',
+        y='percentage',
+        color='user_type',
+        title="User Type Distribution: Workday vs Weekend",
+        color_discrete_map={'casual_ratio': USER_COLORS['casual'], 'registered_ratio': USER_COLORS['registered']}
+    )
+    fig.update_layout(
+        xaxis_title="Working Day",
+        yaxis_title="Percentage (%)",
+        title_x=0.5,
+        legend_title="User Type"
+    )
+    return fig
+
+
+def cluster_pie(cluster_counts):
+    """Share of days in each demand cluster"""
+    import plotly.express as px
+
+    fig = px.pie(
+        values=cluster_counts.values,
+        names=cluster_counts.index,
+        title="Demand Cluster Distribution",
+        color_discrete_map=CLUSTER_COLORS
+    )
+    fig.update_layout(title_x=0.5)
+    return fig
+
+
+def seasonal_users_bar(seasonal_users):
+    """Stacked casual/registered averages per season"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Casual Users',
+        x=seasonal_users['season'],
+        y=seasonal_users['casual_users'],
+        marker_color=USER_COLORS['casual']
+    ))
+    fig.add_trace(go.Bar(
+        name='Registered Users',
+        x=seasonal_users['season'],
+        y=seasonal_users['registered_users'],
+        marker_color=USER_COLORS['registered']
+    ))
+
+    fig.update_layout(
+        barmode='stack',
+        title="Average Users by Season",
+        xaxis_title="Season",
+        yaxis_title="Average Users",
+        title_x=0.5
+    )
+    return fig
+
+
+def peak_hours(hour_profile):
+    """Workday and weekend hourly profiles with their peaks annotated"""
+    fig = go.Figure()
+    profile = downsampling.decimate(hour_profile, ['workday_avg', 'weekend_avg'])
+
+    fig.add_trace(go.Scatter(
+        x=profile['hour'],
+        y=profile['workday_avg'],
+        mode='lines+markers',
+        name='Workday',
+        line=dict(color='#1f77b4', width=3),
+        marker=dict(size=6)
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=profile['hour'],
+        y=profile['weekend_avg'],
+        mode='lines+markers',
+        name='Weekend',
+        line=dict(color='#ff7f0e', width=3),
+        marker=dict(size=6)
+    ))
+
+    fig.update_layout(
+        title="Hourly Rental Patterns: Workday vs Weekend",
+        xaxis_title="Hour of Day",
+        yaxis_title="Average Rentals",
+        title_x=0.5,
+        hovermode='x unified',
+        xaxis=dict(tickmode='linear', dtick=2)
+    )
+
+    # Add peak hour annotations
+    for column, color in (('workday_avg', '#1f77b4'), ('weekend_avg', '#ff7f0e')):
+        profile = hour_profile.dropna(subset=[column])
+        if profile.empty:
+            continue
+        peak = profile.loc[profile[column].idxmax()]
+        fig.add_annotation(
+            x=peak['hour'], y=peak[column],
+            text=f"Peak: {int(peak['hour'])}:00",
+            showarrow=True, arrowhead=2, arrowcolor=color
+        )
+    return fig
+
+
+def hourly_curves(curves):
+    """Casual, registered and total rentals per hour for drilled-down days"""
+    fig = go.Figure()
+    for column, name, color in (('casual_users', 'Casual Users', USER_COLORS['casual']),
+                                ('registered_users', 'Registered Users', USER_COLORS['registered']),
+                                ('total_count', 'Total', '#2E8B57')):
+        fig.add_trace(go.Scatter(
+            x=curves['hour'],
+            y=curves[column],
+            mode='lines+markers',
+            name=name,
+            line=dict(color=color, width=3 if column == 'total_count' else 2),
+            marker=dict(size=5)
+        ))
+
+    fig.update_layout(
+        title="Hourly Rentals for the Selected Days",
+        xaxis_title="Hour of Day",
+        yaxis_title="Average Rentals",
+        title_x=0.5,
+        hovermode='x unified',
+        xaxis=dict(tickmode='linear', dtick=2)
+    )
+    return fig
+
+
+def temperature_bins_bar(temp_analysis):
+    """Average rentals per temperature band"""
+    import plotly.express as px
+
+    return px.bar(
+        temp_analysis,
+        x='temperature',
+        y='total_count',
+        title="Rentals by Temperature Range",
+        color='total_count',
+        color_continuous_scale='thermal'
+    )
+
+
+def season_weather_heatmap(season_weather):
+    """Weather mix of each season, in percent"""
+    import plotly.express as px
+
+    return px.imshow(
+        season_weather,
+        text_auto=True,
+        aspect="auto",
+        title="Weather Patterns by Season (%)",
+        color_continuous_scale='Blues'
+    )
+
+
+def monthly_users_lines(monthly_users):
+    """Monthly casual and registered averages"""
+    fig = go.Figure()
+    monthly_users = downsampling.decimate(monthly_users, ['casual_users', 'registered_users'])
+    fig.add_trace(go.Scatter(
+        x=monthly_users['date'],
+        y=monthly_users['casual_users'],
+        mode='lines+markers',
+        name='Casual Users',
+        line=dict(color=USER_COLORS['casual'], width=2)
+    ))
+    fig.add_trace(go.Scatter(
+        x=monthly_users['date'],
+        y=monthly_users['registered_users'],
+        mode='lines+markers',
+        name='Registered Users',
+        line=dict(color=USER_COLORS['registered'], width=2)
+    ))
+
+    fig.update_layout(
+        title="Monthly User Type Trends",
+        xaxis_title="Month",
+        yaxis_title="Average Daily Users",
+        title_x=0.5
+    )
+    return fig
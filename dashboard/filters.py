@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import buffers
+
+FilterState = namedtuple('FilterState', ['start', 'end', 'seasons', 'weathers'])
+
+
+def to_day(value):
+    """Coerce a date, datetime or string to a datetime64[D] scalar"""
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def date_bounds(dates, start, end):
+    """Positions [lo, hi) of the sorted datetime64[D] `dates` inside [start, end]"""
+    lo = int(np.searchsorted(dates, to_day(start), side='left'))
+    hi = int(np.searchsorted(dates, to_day(end), side='right'))
+    return lo, max(lo, hi)
+
+
+def normalize_filters(date_range, seasons, weathers):
+    """Canonical, hashable form of the sidebar selections"""
+    date_range = tuple(date_range) if isinstance(date_range, (list, tuple)) else (date_range,)
+    start = pd.Timestamp(date_range[0]).date()
+    end = pd.Timestamp(date_range[-1]).date()
+    return FilterState(start, end, tuple(sorted(set(seasons))), tuple(sorted(set(weathers))))
+
+
+class FilterIndex:
+    """Sidebar filter index over the date-sorted daily frame"""
+
+    def __init__(self, day_df):
+        self.dates = day_df['date'].to_numpy().astype('datetime64[D]')
+        self.n_rows = len(self.dates)
+        self.bitmaps = {
+            column: {
+                label: np.packbits((day_df[column] == label).to_numpy())
+                for label in day_df[column].cat.categories
+            }
+            for column in ('season', 'weather_situation')
+        }
+        # AppendBuffer the dates are a view of, once days have been appended
+        self._dates_buffer = None
+
+    def extend(self, day_df, start):
+        """Index for an updated daily frame that keeps the current dates and rows before `start`"""
+        index = FilterIndex.__new__(FilterIndex)
+        index._dates_buffer, index.dates = buffers.append(
+            self._dates_buffer, self.dates, day_df['date'].iloc[self.n_rows:].to_numpy().astype('datetime64[D]')
+        )
+        index.n_rows = len(day_df)
+        first_byte = min(start, self.n_rows) // 8
+        index.bitmaps = {}
+        for column, bitmaps in self.bitmaps.items():
+            tail = day_df[column].iloc[first_byte * 8:]
+            index.bitmaps[column] = {
+                label: np.concatenate([bitmap[:first_byte], np.packbits((tail == label).to_numpy())])
+                for label, bitmap in bitmaps.items()
+            }
+        return index
+
+    def _selection_bits(self, column, labels, first_byte, last_byte):
+        bits = np.zeros(last_byte - first_byte, dtype=np.uint8)
+        for label in labels:
+            bitmap = self.bitmaps[column].get(label)
+            if bitmap is not None:
+                bits |= bitmap[first_byte:last_byte]
+        return bits
+
+    def positions(self, start, end, seasons, weathers):
+        """Row positions of the days matching the filter, in date order"""
+        lo, hi = date_bounds(self.dates, start, end)
+        if lo == hi:
+            return np.empty(0, dtype=np.intp)
+
+        first_byte, last_byte = lo // 8, (hi + 7) // 8
+        bits = self._selection_bits('season', seasons, first_byte, last_byte)
+        bits &= self._selection_bits('weather_situation', weathers, first_byte, last_byte)
+
+        offset = first_byte * 8
+        rows = np.flatnonzero(np.unpackbits(bits, count=hi - offset)) + offset
+        return rows[rows >= lo]
+
+    def mask(self, start, end, seasons, weathers):
+        """Boolean row mask of the days matching the filter"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.positions(start, end, seasons, weathers)] = True
+        return mask
+
+    def apply(self, day_df, start, end, seasons, weathers):
+        """Rows of `day_df` matching the filter"""
+        return day_df.take(self.positions(start, end, seasons, weathers))
@@ -0,0 +1,153 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import buffers
+from hourly_index import HOURS_PER_DAY, HourlyIndex, HourlyIndexWriter
+
+
+class HourCube:
+    """Hourly rental sums and counts pre-aggregated on a dense day x hour grid"""
+
+    def __init__(self, dates, sums, counts, is_workingday, records=None):
+        self.dates = dates
+        self.sums = sums
+        self.counts = counts
+        self.is_workingday = is_workingday
+        self.records = records if records is not None else HourlyIndex.empty(len(dates))
+        # AppendBuffers the dates and day types are views of, once the feed has appended days
+        self._buffers = {}
+
+    @classmethod
+    def empty(cls, day_df):
+        """Zeroed cube over the days of the daily frame"""
+        dates = day_df['date'].to_numpy()
+        sums = np.zeros((len(dates), HOURS_PER_DAY))
+        counts = np.zeros((len(dates), HOURS_PER_DAY), dtype=np.int64)
+        return cls(dates, sums, counts, (day_df['is_workingday'] == 'Yes').to_numpy())
+
+    @classmethod
+    def from_frames(cls, hour_df, day_df):
+        """Fold cleaned hourly rows onto the days of the daily frame"""
+        cube = cls.empty(day_df)
+        day_pos = cube._fold(hour_df)
+        cube.records = HourlyIndex.from_rows(len(cube.dates), day_pos, hour_df)
+        return cube
+
+    @classmethod
+    def from_chunks(cls, chunks, day_df, directory=None):
+        """Fold raw hour.csv chunks (dteday, hr, temp, casual, registered, cnt) onto the days of the daily frame"""
+        cube = cls.empty(day_df)
+        day_index = pd.Index(cube.dates)
+        writer = HourlyIndexWriter(len(cube.dates), directory)
+        for chunk in chunks:
+            # Dates arrive as a categorical, so only the distinct days are parsed
+            dates = chunk['dteday'].astype('category')
+            positions = day_index.get_indexer(pd.to_datetime(dates.cat.categories))
+            day_pos = np.append(positions, -1)[dates.cat.codes.to_numpy()]
+            cube._accumulate(day_pos, chunk['hr'].to_numpy(), chunk['cnt'].to_numpy())
+            writer.add(day_pos, {
+                'hour': chunk['hr'].to_numpy(),
+                'temperature': chunk['temp'].to_numpy(),
+                'casual_users': chunk['casual'].to_numpy(),
+                'registered_users': chunk['registered'].to_numpy(),
+                'total_count': chunk['cnt'].to_numpy()
+            })
+        cube.records = writer.close()
+        return cube
+
+    def _fold(self, hour_df):
+        """Add cleaned hourly rows onto the grid in place; returns their day positions"""
+        day_pos = pd.Index(self.dates).get_indexer(hour_df['date'])
+        self._accumulate(day_pos, hour_df['hour'].to_numpy(), hour_df['total_count'].to_numpy())
+        return day_pos
+
+    def _accumulate(self, day_pos, hours, totals):
+        valid = (day_pos >= 0) & (hours >= 0) & (hours < HOURS_PER_DAY)
+        cells = day_pos[valid].astype(np.int64) * HOURS_PER_DAY + hours[valid]
+        size = self.sums.size
+        self.sums += np.bincount(cells, weights=totals[valid], minlength=size).reshape(self.sums.shape)
+        self.counts += np.bincount(cells, minlength=size).reshape(self.counts.shape)
+
+    def save(self, directory):
+        """Write the grid as .npy files in `directory`"""
+        # Imported here because data_loader imports this module
+        from data_loader import save_array
+
+        os.makedirs(directory, exist_ok=True)
+        for name in ('dates', 'sums', 'counts'):
+            save_array(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        self.records.save(os.path.join(directory, 'records'))
+
+    @classmethod
+    def load(cls, directory, day_df):
+        """Memory-map a grid written by save(), read-only; its days must match the daily frame"""
+        dates, sums, counts = (
+            np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in ('dates', 'sums', 'counts')
+        )
+        if not np.array_equal(dates, day_df['date'].to_numpy()):
+            raise ValueError('Cached hour cube does not match the daily frame')
+        records = HourlyIndex.load(os.path.join(directory, 'records'), len(dates))
+        return cls(dates, sums, counts, (day_df['is_workingday'] == 'Yes').to_numpy(), records)
+
+    def extend(self, day_df, hour_df):
+        """New cube for an updated daily frame plus freshly arrived hourly rows"""
+        dates = day_df['date'].to_numpy()
+        old_pos = pd.Index(dates).get_indexer(self.dates)
+        kept = old_pos >= 0
+
+        sums = np.zeros((len(dates), HOURS_PER_DAY))
+        counts = np.zeros((len(dates), HOURS_PER_DAY), dtype=np.int64)
+        sums[old_pos[kept]] = self.sums[kept]
+        counts[old_pos[kept]] = self.counts[kept]
+
+        cube = HourCube(dates, sums, counts, (day_df['is_workingday'] == 'Yes').to_numpy())
+        day_pos = cube._fold(hour_df)
+        cube.records = self.records.extend(old_pos, len(dates), day_pos, hour_df)
+        return cube
+
+    def append(self, day_df, hour_df):
+        """New cube for a daily frame that keeps the current days and only adds later ones"""
+        n_old = len(self.dates)
+        first = max(n_old - 1, 0)
+        dates = day_df['date'].to_numpy()
+        if len(dates) and hour_df['date'].min() < dates[first]:
+            raise ValueError('Rows before the last day cannot be appended')
+        found = pd.Index(dates[first:]).get_indexer(hour_df['date'])
+        day_pos = np.where(found >= 0, found + first, -1)
+        start = int(day_pos[day_pos >= 0].min()) if (day_pos >= 0).any() else n_old
+
+        # Grid rows of the days from `start` on: their current sums plus the new hours
+        tail = HourCube.empty(day_df.iloc[start:])
+        tail.sums[:n_old - start] = self.sums[start:n_old]
+        tail.counts[:n_old - start] = self.counts[start:n_old]
+        tail._accumulate(
+            np.where(day_pos >= 0, day_pos - start, -1), hour_df['hour'].to_numpy(), hour_df['total_count'].to_numpy()
+        )
+
+        appendable = {}
+        appendable['dates'], dates = buffers.append(self._buffers.get('dates'), self.dates, dates[n_old:])
+        appendable['is_workingday'], is_workingday = buffers.append(
+            self._buffers.get('is_workingday'), self.is_workingday, tail.is_workingday[n_old - start:]
+        )
+        cube = HourCube(
+            dates, buffers.revise(self.sums, start, tail.sums), buffers.revise(self.counts, start, tail.counts),
+            is_workingday, self.records.append(len(dates), day_pos, hour_df)
+        )
+        cube._buffers = appendable
+        return cube
+
+    def profile(self, day_mask=None):
+        """Average rentals per hour on workdays and weekends over the selected days"""
+        if day_mask is None:
+            day_mask = np.ones(len(self.dates), dtype=bool)
+
+        columns = {'hour': np.arange(HOURS_PER_DAY)}
+        for name, rows in (('workday_avg', day_mask & self.is_workingday),
+                           ('weekend_avg', day_mask & ~self.is_workingday)):
+            totals = self.sums[rows].sum(axis=0)
+            counts = self.counts[rows].sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[name] = np.where(counts > 0, totals / counts, np.nan)
+        return pd.DataFrame(columns)
@@ -0,0 +1,301 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import buffers
+
+HOURS_PER_DAY = 24
+# Hourly record columns and their stored dtypes
+COLUMNS = {
+    'hour': np.int8, 'temperature': np.float32,
+    'casual_users': np.int32, 'registered_users': np.int32, 'total_count': np.int32
+}
+COUNT_COLUMNS = ['casual_users', 'registered_users', 'total_count']
+# Records regrouped per pass when a streamed file arrives out of day order
+REGROUP_ROWS = 1 << 20
+
+
+def _valid_rows(day_pos, columns):
+    """Day positions and typed columns of the rows with a known day (not -1) and a valid hour"""
+    day_pos = np.asarray(day_pos, dtype=np.int64)
+    hours = np.asarray(columns['hour'])
+    valid = (day_pos >= 0) & (hours >= 0) & (hours < HOURS_PER_DAY)
+    return day_pos[valid], {name: np.asarray(columns[name])[valid].astype(dtype) for name, dtype in COLUMNS.items()}
+
+
+def _by_day(day_pos):
+    """Stable order of a batch of records by day, and each record's rank among its day's records"""
+    order = np.argsort(day_pos, kind='stable')
+    day_pos = day_pos[order]
+    return order, np.arange(len(day_pos)) - np.searchsorted(day_pos, day_pos, side='left')
+
+
+class HourlyIndex:
+    """Hourly records grouped by day: contiguous column arrays plus a CSR offset index"""
+
+    def __init__(self, offsets, columns, directory=None, appendable=None):
+        self.offsets = offsets
+        self.columns = columns
+        # Where the arrays are memory-mapped from, if they are
+        self.directory = directory
+        # AppendBuffers the arrays are views of, once the feed has extended them
+        self._buffers = appendable or {}
+
+    @classmethod
+    def empty(cls, n_days):
+        """Index over `n_days` days without records"""
+        return cls(np.zeros(n_days, dtype=np.int64), {name: np.zeros(0, dtype) for name, dtype in COLUMNS.items()})
+
+    @classmethod
+    def from_rows(cls, n_days, day_pos, columns):
+        """Group hourly rows by their day position; rows of unknown days (-1) are dropped"""
+        day_pos, columns = _valid_rows(day_pos, columns)
+        if (np.diff(day_pos) < 0).any():
+            order = np.argsort(day_pos, kind='stable')
+            day_pos = day_pos[order]
+            columns = {name: values[order] for name, values in columns.items()}
+        return cls(np.searchsorted(day_pos, np.arange(n_days)), columns)
+
+    @property
+    def n_days(self):
+        return len(self.offsets)
+
+    @property
+    def n_records(self):
+        return len(self.columns['hour'])
+
+    def _bounds(self, positions):
+        """First record and end of the records of the days at `positions`"""
+        starts = self.offsets[positions]
+        following = positions + 1
+        ends = np.where(
+            following < self.n_days, self.offsets[np.minimum(following, self.n_days - 1)], self.n_records
+        )
+        return starts, ends
+
+    def day(self, pos):
+        """Hourly records of one day as a frame of views on the column arrays"""
+        start = self.offsets[pos]
+        stop = self.offsets[pos + 1] if pos + 1 < self.n_days else self.n_records
+        return pd.DataFrame({name: values[start:stop] for name, values in self.columns.items()}, copy=False)
+
+    def rows(self, positions):
+        """Record rows of the days at `positions`: a slice for a run of consecutive days, else an index array"""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, ends = self._bounds(positions)
+        if len(positions) and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions))):
+            return slice(starts[0], ends[-1])
+        lengths = ends - starts
+        # Each day's range start, repeated over its records, plus a running offset within the day
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return shifts + np.arange(lengths.sum())
+
+    def days(self, positions):
+        """Hourly records of a set of days, with the day position of each record"""
+        positions = np.asarray(positions, dtype=np.int64)
+        rows = self.rows(positions)
+        frame = pd.DataFrame({name: values[rows] for name, values in self.columns.items()}, copy=False)
+        starts, ends = self._bounds(positions)
+        frame.insert(0, 'day', np.repeat(positions, ends - starts))
+        return frame
+
+    def profile(self, positions):
+        """Average casual, registered and total rentals per hour over the days at `positions`"""
+        rows = self.rows(positions)
+        hours = self.columns['hour'][rows]
+        counts = np.bincount(hours, minlength=HOURS_PER_DAY)
+        columns = {'hour': np.arange(HOURS_PER_DAY)}
+        for name in COUNT_COLUMNS:
+            sums = np.bincount(hours, weights=self.columns[name][rows], minlength=HOURS_PER_DAY)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[name] = np.where(counts > 0, sums / counts, np.nan)
+        columns['days'] = counts
+        return pd.DataFrame(columns)
+
+    def append(self, n_days, day_pos, columns):
+        """New index over `n_days` days with rows of the last day or of days after it appended"""
+        day_pos, columns = _valid_rows(day_pos, columns)
+        if len(day_pos) and day_pos.min() < self.n_days - 1:
+            raise ValueError('Rows before the last day cannot be appended')
+        order, _ = _by_day(day_pos)
+        day_pos = day_pos[order]
+
+        appendable, arrays = {}, {}
+        for name in COLUMNS:
+            appendable[name], arrays[name] = buffers.append(
+                self._buffers.get(name), self.columns[name], columns[name][order]
+            )
+        starts = self.n_records + np.searchsorted(day_pos, np.arange(self.n_days, n_days))
+        appendable['offsets'], offsets = buffers.append(self._buffers.get('offsets'), self.offsets, starts)
+        return HourlyIndex(offsets, arrays, appendable=appendable)
+
+    def extend(self, old_pos, n_days, day_pos, columns):
+        """New index with the existing days moved to `old_pos` plus freshly arrived rows"""
+        old_pos = np.asarray(old_pos, dtype=np.int64)
+        valid_pos, columns = _valid_rows(day_pos, columns)
+        if np.array_equal(old_pos, np.arange(self.n_days)) and (
+                not len(valid_pos) or valid_pos.min() >= self.n_days - 1):
+            return self.append(n_days, valid_pos, columns)
+
+        starts, ends = self._bounds(np.arange(self.n_days))
+        lengths = ends - starts
+        kept = old_pos >= 0
+        old_counts = np.bincount(old_pos[kept], weights=lengths[kept], minlength=n_days).astype(np.int64)
+        counts = old_counts + np.bincount(valid_pos, minlength=n_days)
+        offsets = np.zeros(n_days, dtype=np.int64)
+        np.cumsum(counts[:-1], out=offsets[1:])
+
+        # Existing records keep their place within the day and the new ones follow them
+        record_day = np.repeat(old_pos, lengths)
+        moved = record_day >= 0
+        within = np.arange(self.n_records) - np.repeat(starts, lengths)
+        old_rows = offsets[record_day[moved]] + within[moved]
+        order, rank = _by_day(valid_pos)
+        new_days = valid_pos[order]
+        new_rows = offsets[new_days] + old_counts[new_days] + rank
+
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            values = np.empty(counts.sum(), dtype=dtype)
+            values[old_rows] = self.columns[name][moved]
+            values[new_rows] = columns[name][order]
+            arrays[name] = values
+        return HourlyIndex(offsets, arrays)
+
+    def save(self, directory):
+        """Write the offsets and the column arrays as .npy files in `directory`"""
+        if self.directory == os.path.abspath(directory):
+            # Streamed there by HourlyIndexWriter, or loaded from there
+            return
+        # Imported here because data_loader imports this module through hour_cube
+        from data_loader import save_array
+
+        os.makedirs(directory, exist_ok=True)
+        save_array(os.path.join(directory, 'offsets.npy'), self.offsets)
+        for name, values in self.columns.items():
+            save_array(os.path.join(directory, f'{name}.npy'), values)
+
+    @classmethod
+    def load(cls, directory, n_days):
+        """Memory-map an index written by save(), read-only"""
+        offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        if len(offsets) != n_days:
+            raise ValueError('Cached hourly index does not match the daily frame')
+        columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in COLUMNS}
+        return cls(offsets, columns, os.path.abspath(directory))
+
+
+class HourlyIndexWriter:
+    """Stream hourly records into the .npy column files of an HourlyIndex as they arrive"""
+
+    def __init__(self, n_days, directory=None):
+        self.n_days = n_days
+        self.counts = np.zeros(n_days, dtype=np.int64)
+        self.n_records = 0
+        self.grouped = True
+        self._last_day = -1
+        self.directory = os.path.abspath(directory) if directory else None
+        try:
+            self._open()
+        except OSError:
+            self.directory = None
+            self._open()
+
+    def _open(self):
+        # Files are built in a private directory, so concurrent writers never share a name
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._staging = tempfile.mkdtemp(prefix='building-' if self.directory else 'hourly-index-', dir=self.directory)
+        self._files = {}
+        self._header_size = {}
+        for name, dtype in COLUMNS.items():
+            f = self._files[name] = open(self._path(name, 'tmp'), 'wb')
+            self._write_header(f, dtype, 0)
+            self._header_size[name] = f.tell()
+        # Day position of every record, only read back when the files need regrouping
+        self._files['day'] = open(self._path('day', 'tmp'), 'wb')
+
+    def _path(self, name, stage=None):
+        return os.path.join(self._staging, f'{name}.{stage}.npy' if stage else f'{name}.npy')
+
+    @staticmethod
+    def _write_header(f, dtype, length):
+        # numpy pads the header so the length can be rewritten in place once known
+        np.lib.format.write_array_header_1_0(f, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (length,)
+        })
+
+    def add(self, day_pos, columns):
+        """Append a batch of hourly rows; rows of unknown days (-1) are dropped"""
+        day_pos, columns = _valid_rows(day_pos, columns)
+        if not len(day_pos):
+            return
+        if day_pos[0] < self._last_day or (np.diff(day_pos) < 0).any():
+            self.grouped = False
+        self._last_day = max(self._last_day, int(day_pos.max()))
+        self.counts += np.bincount(day_pos, minlength=self.n_days)
+        self.n_records += len(day_pos)
+        for name, values in columns.items():
+            self._files[name].write(values.tobytes())
+        self._files['day'].write(day_pos.astype(np.int32).tobytes())
+
+    def close(self):
+        """Finish the files, move them into the directory and return the index, memory-mapped from them"""
+        offsets = np.zeros(self.n_days, dtype=np.int64)
+        np.cumsum(self.counts[:-1], out=offsets[1:])
+        for name, dtype in COLUMNS.items():
+            f = self._files[name]
+            f.seek(0)
+            self._write_header(f, dtype, self.n_records)
+            f.close()
+        self._files['day'].close()
+        if not self.grouped:
+            self._regroup(offsets)
+        os.remove(self._path('day', 'tmp'))
+        np.save(self._path('offsets', 'tmp'), offsets)
+
+        if self.directory:
+            # Each file is swapped in whole, so readers see the old or the new one
+            try:
+                for name in [*COLUMNS, 'offsets']:
+                    os.replace(self._path(name, 'tmp'), os.path.join(self.directory, f'{name}.npy'))
+            finally:
+                shutil.rmtree(self._staging, ignore_errors=True)
+            return HourlyIndex.load(self.directory, self.n_days)
+
+        for name in [*COLUMNS, 'offsets']:
+            os.replace(self._path(name, 'tmp'), self._path(name))
+        index = HourlyIndex.load(self._staging, self.n_days)
+        # The mappings keep the data alive once the names are gone
+        index.directory = None
+        shutil.rmtree(self._staging, ignore_errors=True)
+        return index
+
+    def _regroup(self, offsets):
+        """Rewrite the streamed files in day order, one bounded window of records at a time"""
+        for name, dtype in COLUMNS.items():
+            np.lib.format.open_memmap(self._path(name, 'grouped'), mode='w+', dtype=dtype, shape=(self.n_records,))
+        filled = np.zeros(self.n_days, dtype=np.int64)
+        for start in range(0, self.n_records, REGROUP_ROWS):
+            count = min(REGROUP_ROWS, self.n_records - start)
+            day_pos = np.fromfile(self._path('day', 'tmp'), dtype=np.int32, count=count, offset=4 * start)
+            order, rank = _by_day(day_pos)
+            days = day_pos[order]
+            rows = offsets[days] + filled[days] + rank
+            filled += np.bincount(day_pos, minlength=self.n_days)
+            for name, dtype in COLUMNS.items():
+                itemsize = np.dtype(dtype).itemsize
+                values = np.fromfile(
+                    self._path(name, 'tmp'), dtype=dtype, count=count,
+                    offset=self._header_size[name] + itemsize * start
+                )
+                # Mapped per window so the written pages are released in between
+                grouped = np.lib.format.open_memmap(self._path(name, 'grouped'), mode='r+')
+                grouped[rows] = values[order]
+                grouped.flush()
+                del grouped
+        for name in COLUMNS:
+            os.replace(self._path(name, 'grouped'), self._path(name, 'tmp'))
@@ -0,0 +1,115 @@
+"""Import-time report for the dashboard's cold start
+
+    python import_report.py --budget-ms 1500
+    python import_report.py --json
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Heavy modules the dashboard must only import on first use
+DEFERRED_MODULES = ['seaborn', 'matplotlib', 'statsmodels', 'plotly.express']
+
+
+def startup_modules(script=os.path.join(HERE, 'dashboard.py')):
+    """Modules imported at the top level of `script`, in order"""
+    with open(script) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def parse_importtime(stderr):
+    """Records of `-X importtime` output: module, nesting depth, self and cumulative microseconds"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        records.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+    return records
+
+
+def measure(modules, python=sys.executable):
+    """Import `modules` in a fresh interpreter; returns the wall time and the importtime records"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [python, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+        cwd=HERE, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return wall_ms, parse_importtime(completed.stderr)
+
+
+def report(modules, repeat=3, top=15):
+    """Fastest of `repeat` cold imports, summarized by top-level package"""
+    runs = [measure(modules) for _ in range(repeat)]
+    wall_ms, records = min(runs, key=lambda run: run[0])
+    loaded = {record['module'] for record in records}
+
+    packages = {}
+    for record in records:
+        package = record['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + record['self_us']
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        'modules': modules,
+        'wall_ms': wall_ms,
+        'import_ms': sum(r['cumulative_us'] for r in records if r['depth'] == 0) / 1000,
+        'modules_loaded': len(loaded),
+        'packages': [{'package': name, 'self_ms': us / 1000} for name, us in heaviest],
+        'deferred_loaded': [
+            name for name in DEFERRED_MODULES
+            if name in loaded or any(m.startswith(name + '.') for m in loaded)
+        ]
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Report the dashboard's startup import time against a budget.")
+    parser.add_argument('--budget-ms', type=float, default=1500, help="Allowed total import time in milliseconds")
+    parser.add_argument('--repeat', type=int, default=3, help="Cold imports to run; the fastest is reported")
+    parser.add_argument('--top', type=int, default=15, help="Packages to list")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = report(startup_modules(), args.repeat, args.top)
+    result['budget_ms'] = args.budget_ms
+    result['within_budget'] = result['import_ms'] <= args.budget_ms and not result['deferred_loaded']
+
+    if args.json:
+        print(json.dumps(result, indent=1))
+    else:
+        print(f"Startup imports: {result['import_ms']:.0f} ms of {args.budget_ms:.0f} ms budget "
+              f"({result['modules_loaded']} modules, {result['wall_ms']:.0f} ms interpreter wall time)")
+        for package in result['packages']:
+            print(f"  {package['package']:<24}{package['self_ms']:>9.1f} ms")
+        if result['deferred_loaded']:
+            print("Loaded at startup but should be deferred: " + ', '.join(result['deferred_loaded']))
+    return 0 if result['within_budget'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from filters import FilterIndex
+from tables import Dataset
+
+# Hourly columns that add up to the day total and those that average over the day
+SUM_COLUMNS = ['casual_users', 'registered_users', 'total_count']
+MEAN_COLUMNS = ['temperature', 'feels_temperature', 'humidity', 'wind_speed']
+# Calendar attributes that are the same for every hour of a day
+CONSTANT_COLUMNS = ['season', 'year', 'month', 'is_holiday', 'weekday', 'is_workingday']
+N_WEATHER = len(data_loader.WEATHER_MAPPING)
+
+
+class DayAccumulator:
+    """Running per-day totals for the days touched by the hourly feed"""
+
+    def __init__(self):
+        self.days = {}
+
+    def seed(self, day_row, n_hours):
+        """Start a day from its published row, e.g. when the feed continues it"""
+        weather = np.zeros(N_WEATHER)
+        code = day_row['weather_situation'].cat.codes.iloc[0]
+        if code >= 0:
+            weather[code] = n_hours
+        self.days[day_row['date'].iloc[0]] = {
+            'hours': n_hours,
+            'sums': day_row[SUM_COLUMNS].to_numpy(dtype=float)[0],
+            'mean_sums': day_row[MEAN_COLUMNS].to_numpy(dtype=float)[0] * n_hours,
+            'weather': weather,
+            'constants': {column: day_row[column].cat.codes.iloc[0] for column in CONSTANT_COLUMNS}
+        }
+
+    def add(self, hour_df):
+        """Fold cleaned hourly rows into the running totals; returns the touched dates"""
+        dates, day_index = np.unique(hour_df['date'].to_numpy(), return_inverse=True)
+        n_days = len(dates)
+
+        hours = np.bincount(day_index, minlength=n_days)
+        sums = np.zeros((n_days, len(SUM_COLUMNS)))
+        mean_sums = np.zeros((n_days, len(MEAN_COLUMNS)))
+        np.add.at(sums, day_index, hour_df[SUM_COLUMNS].to_numpy(dtype=float))
+        np.add.at(mean_sums, day_index, hour_df[MEAN_COLUMNS].to_numpy(dtype=float))
+
+        weather_codes = hour_df['weather_situation'].cat.codes.to_numpy()
+        known = weather_codes >= 0
+        weather = np.zeros((n_days, N_WEATHER))
+        np.add.at(weather, (day_index[known], weather_codes[known]), 1)
+
+        first_row = np.unique(day_index, return_index=True)[1]
+        constants = {column: hour_df[column].cat.codes.to_numpy()[first_row] for column in CONSTANT_COLUMNS}
+
+        touched = []
+        for i, date in enumerate(pd.to_datetime(dates)):
+            day = self.days.get(date)
+            if day is None:
+                day = self.days[date] = {
+                    'hours': 0,
+                    'sums': np.zeros(len(SUM_COLUMNS)),
+                    'mean_sums': np.zeros(len(MEAN_COLUMNS)),
+                    'weather': np.zeros(N_WEATHER),
+                    'constants': {column: constants[column][i] for column in CONSTANT_COLUMNS}
+                }
+            day['hours'] += hours[i]
+            day['sums'] += sums[i]
+            day['mean_sums'] += mean_sums[i]
+            day['weather'] += weather[i]
+            touched.append(date)
+        return touched
+
+    def day_rows(self, dates, template, segmenter):
+        """Daily rows for `dates`, typed like the `template` daily frame and clustered by `segmenter`"""
+        days = [self.days[date] for date in dates]
+        rows = pd.DataFrame({'date': pd.to_datetime(list(dates))})
+        for column in CONSTANT_COLUMNS:
+            codes = [day['constants'][column] for day in days]
+            rows[column] = pd.Categorical.from_codes(codes, dtype=template[column].dtype)
+
+        # The prevailing hourly weather stands for the day; ties go to the worse condition
+        weather = np.array([day['weather'] for day in days])
+        prevailing = N_WEATHER - 1 - np.argmax(weather[:, ::-1], axis=1)
+        prevailing = np.where(weather.sum(axis=1) > 0, prevailing, -1)
+        rows['weather_situation'] = pd.Categorical.from_codes(prevailing, dtype=template['weather_situation'].dtype)
+
+        hours = np.array([day['hours'] for day in days], dtype=float)
+        means = np.array([day['mean_sums'] for day in days]) / hours[:, None]
+        for i, column in enumerate(MEAN_COLUMNS):
+            rows[column] = means[:, i]
+        sums = np.array([day['sums'] for day in days])
+        for i, column in enumerate(SUM_COLUMNS):
+            rows[column] = sums[:, i].astype(template[column].dtype)
+
+        rows['demand_cluster'] = pd.Categorical.from_codes(
+            segmenter.codes(rows), dtype=template['demand_cluster'].dtype
+        )
+        rows['casual_ratio'] = (rows['casual_users'] / rows['total_count'] * 100).round(1)
+        rows['registered_ratio'] = (rows['registered_users'] / rows['total_count'] * 100).round(1)
+        return rows
+
+
+class HourlyFeed:
+    """Tail an append-only hourly CSV and publish incrementally updated snapshots"""
+
+    def __init__(self, path, dataset):
+        self.path = path
+        self.base = dataset
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.snapshot = self.base
+        self.rows_ingested = 0
+        self._offset = 0
+        self._header = None
+        self._accumulator = DayAccumulator()
+
+    def _read_new_rows(self):
+        """Parse the complete lines appended since the last poll"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None
+        if size < self._offset:
+            # The feed was truncated or rotated: replay it from the start
+            self._reset()
+        if size == self._offset:
+            return None
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return None
+        data = data[:end + 1]
+        self._offset += end + 1
+
+        if self._header is None:
+            header, _, data = data.partition(b'\n')
+            self._header = header.decode().strip().split(',')
+        if not data.strip():
+            return None
+        raw = pd.read_csv(io.BytesIO(data), header=None, names=self._header)
+        return data_loader.prepare_hour_data(raw)
+
+    def poll(self):
+        """Ingest whatever was appended to the feed and return the current snapshot"""
+        with self._lock:
+            hour_df = self._read_new_rows()
+            if hour_df is not None and not hour_df.empty:
+                self.snapshot = self._apply(self.snapshot, hour_df)
+                self.rows_ingested += len(hour_df)
+            return self.snapshot
+
+    def _apply(self, dataset, hour_df):
+        day_df = dataset.day_df
+        dates = pd.to_datetime(hour_df['date'].unique())
+        # The usual case: the feed continues the last published day or adds
+        # later ones, so no published day moves and everything is appended
+        appending = day_df.empty or dates.min() >= day_df['date'].iloc[-1]
+
+        # Days the feed continues start from their published totals
+        known = pd.Index(day_df['date'].iloc[-1:] if appending else day_df['date'])
+        for date in dates:
+            if date not in self._accumulator.days and date in known:
+                pos = len(day_df) - len(known) + known.get_loc(date)
+                n_hours = int(dataset.hour_cube.counts[pos].sum())
+                self._accumulator.seed(day_df.iloc[[pos]], n_hours)
+
+        touched = self._accumulator.add(hour_df)
+        rows = self._accumulator.day_rows(touched, day_df, dataset.segmenters['day'])
+        if appending:
+            return self._append(dataset, rows, hour_df)
+
+        replaced = day_df['date'].isin(rows['date'])
+        new_days = ~rows['date'].isin(day_df['date'])
+        next_instant = int(day_df['instant'].max()) + 1 if len(day_df) else 1
+        rows['instant'] = 0
+        rows.loc[~new_days, 'instant'] = day_df.loc[replaced, 'instant'].to_numpy()
+        rows.loc[new_days, 'instant'] = np.arange(next_instant, next_instant + new_days.sum())
+
+        day_df = pd.concat([day_df[~replaced], rows[day_df.columns]], ignore_index=True)
+        day_df = day_df.sort_values('date', kind='stable').reset_index(drop=True)
+        first_changed = int(np.searchsorted(day_df['date'].to_numpy(), rows['date'].min().to_datetime64()))
+
+        return Dataset(
+            day_df,
+            FilterIndex(day_df),
+            dataset.day_stats.extend(day_df, first_changed),
+            dataset.corr_stats.extend(day_df, first_changed),
+            dataset.hour_cube.extend(day_df, hour_df),
+            dataset.segmenters,
+            dataset.version + 1
+        )
+
+    def _append(self, dataset, rows, hour_df):
+        """Snapshot with `rows` replacing the last published day (if they continue it) and appended after it"""
+        day_df = dataset.day_df
+        revised = not day_df.empty and rows['date'].iloc[0] == day_df['date'].iloc[-1]
+        first_changed = len(day_df) - revised
+        next_instant = int(day_df['instant'].max()) + 1 if len(day_df) else 1
+        instants = np.arange(next_instant - revised, next_instant + len(rows) - revised)
+        if revised:
+            instants[0] = day_df['instant'].iloc[-1]
+        rows['instant'] = instants
+
+        day_df = pd.concat([day_df.iloc[:first_changed], rows[day_df.columns]], ignore_index=True)
+        return Dataset(
+            day_df,
+            dataset.filter_index.extend(day_df, first_changed),
+            dataset.day_stats.extend(day_df, first_changed),
+            dataset.corr_stats.extend(day_df, first_changed),
+            dataset.hour_cube.append(day_df, hour_df),
+            dataset.segmenters,
+            dataset.version + 1
+        )
@@ -0,0 +1,201 @@
+"""Per-run timing of the dashboard's hot path
+
+    python instrumentation.py perf.log
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+logger = logging.getLogger('bike_dashboard.perf')
+logger.propagate = False
+
+_local = threading.local()
+_log_paths = set()
+_log_lock = threading.Lock()
+
+
+def configure_log(path):
+    """Append finished traces to `path` as JSON lines; repeated calls are no-ops"""
+    with _log_lock:
+        if path in _log_paths:
+            return
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        _log_paths.add(path)
+
+
+class Trace:
+    """Stages of one script or fragment run, in the order they started"""
+
+    def __init__(self, run, session=None, payloads=False, sink=None):
+        self.run = run
+        self.session = session
+        self.payloads = payloads
+        self.sink = sink
+        self.stages = []
+        self.info = {}
+        self.finished = False
+        self._open = []
+        self._started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows=None, cache=None):
+        """Time the enclosed block; the yielded record can be filled in as it runs"""
+        record = {'stage': name, 'depth': len(self._open), 'wall_ms': None, 'rows': rows, 'cache': cache}
+        self.stages.append(record)
+        self._open.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_ms'] = (time.perf_counter() - started) * 1000
+            self._open.pop()
+
+    def miss(self):
+        """Mark the innermost open stage as a cache miss, e.g. from inside a cached function"""
+        if self._open:
+            self._open[-1]['cache'] = 'miss'
+
+    def figure(self, record, fig):
+        """Add the serialized size (and serialization time) of `fig` to `record`"""
+        if not self.payloads:
+            return
+        started = time.perf_counter()
+        payload = fig.to_json()
+        record['serialize_ms'] = (time.perf_counter() - started) * 1000
+        record['payload_bytes'] = len(payload.encode())
+
+    def summary(self):
+        return {
+            'ts': self._started_at.isoformat(),
+            'run': self.run,
+            'session': self.session,
+            'wall_ms': (time.perf_counter() - self._started) * 1000,
+            'stages': self.stages,
+            **self.info
+        }
+
+    def finish(self):
+        """Close the run, log it and hand it to the sink; returns the summary"""
+        summary = self.summary()
+        self.finished = True
+        if getattr(_local, 'trace', None) is self:
+            _local.trace = None
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(summary, default=str))
+        if self.sink is not None:
+            self.sink.append(summary)
+        return summary
+
+
+def start(run, session=None, payloads=False, sink=None):
+    """Begin a trace for the current thread's run, replacing any earlier one"""
+    _local.trace = Trace(run, session, payloads, sink)
+    return _local.trace
+
+
+def current():
+    """The active trace of this thread, if any"""
+    trace = getattr(_local, 'trace', None)
+    return trace if trace is not None and not trace.finished else None
+
+
+@contextmanager
+def stage(name, rows=None, cache=None):
+    """Time a stage of the active trace; a no-op record when nothing is being traced"""
+    trace = current()
+    if trace is None:
+        yield {'stage': name, 'rows': rows, 'cache': cache}
+        return
+    with trace.stage(name, rows, cache) as record:
+        yield record
+
+
+def miss():
+    """Mark the active trace's innermost stage as a cache miss"""
+    trace = current()
+    if trace is not None:
+        trace.miss()
+
+
+def figure(record, fig):
+    """Record the payload size of `fig` on `record` if the active trace measures payloads"""
+    trace = current()
+    if trace is not None:
+        trace.figure(record, fig)
+
+
+@contextmanager
+def fragment(name, **start_kwargs):
+    """Stage of the enclosing run, or a trace of its own when a fragment reruns alone"""
+    trace = current()
+    if trace is not None:
+        with trace.stage(name) as record:
+            yield record
+        return
+    trace = start(f'fragment:{name}', **start_kwargs)
+    try:
+        with trace.stage(name) as record:
+            yield record
+    finally:
+        trace.finish()
+
+
+def stages_frame(summaries):
+    """One row per stage of the given run summaries"""
+    rows = [
+        {'ts': summary['ts'], 'run': summary['run'], 'session': summary['session'], **record}
+        for summary in summaries
+        for record in summary['stages']
+    ]
+    return pd.DataFrame(rows)
+
+
+def aggregate(summaries):
+    """Per-stage wall time percentiles, rows, cache hit rate and payload sizes"""
+    stages = stages_frame(summaries)
+    if stages.empty:
+        return stages
+    if 'payload_bytes' not in stages:
+        stages['payload_bytes'] = float('nan')
+    stages['hit'] = stages['cache'].map({'hit': 1.0, 'miss': 0.0})
+    grouped = stages.groupby('stage', sort=False)
+    return pd.DataFrame({
+        'runs': grouped.size(),
+        'sessions': grouped['session'].nunique(),
+        'p50_ms': grouped['wall_ms'].median(),
+        'p95_ms': grouped['wall_ms'].quantile(0.95),
+        'max_ms': grouped['wall_ms'].max(),
+        'avg_rows': grouped['rows'].mean(),
+        'hit_rate': grouped['hit'].mean(),
+        'avg_payload_bytes': grouped['payload_bytes'].mean()
+    }).sort_values('p95_ms', ascending=False)
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate dashboard performance logs across runs and sessions.")
+    parser.add_argument('logs', nargs='+', help="JSON-lines files written via BIKE_PERF_LOG")
+    args = parser.parse_args(argv)
+    summaries = [summary for path in args.logs for summary in read_log(path)]
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None):
+        print(aggregate(summaries).round(2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
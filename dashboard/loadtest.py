@@ -0,0 +1,478 @@
+"""Concurrent-session load test for the dashboard
+
+    python loadtest.py --sessions 8 --workers 2 --steps 20 --out load.json
+    python loadtest.py --sessions 8 --workers 2 --steps 20 --baseline load.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'dashboard.py')
+
+# Relative frequency of each interaction in a session
+ACTION_WEIGHTS = {
+    'date_range': 2,
+    'seasons': 2,
+    'weathers': 1.5,
+    'section': 2.5,
+    'analysis_type': 1.5,
+    'trendline': 0.5
+}
+
+
+# Widgets a server session tracks, and the largest message a rerun may send
+WIDGET_KINDS = ('date_input', 'multiselect', 'radio', 'selectbox')
+MAX_MESSAGE_BYTES = 200 * 2 ** 20
+SERVER_START_TIMEOUT = 120
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of process `pid` (this process's peak RSS where /proc is unavailable)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if pid == 'self' else 0
+
+
+def _random_subset(rng, options):
+    """Usually a proper non-empty subset, sometimes everything"""
+    if rng.random() < 0.2:
+        return list(options)
+    return rng.sample(list(options), rng.randint(1, len(options)))
+
+
+def _pick_other(rng, options, current):
+    choices = [option for option in options if option != current]
+    return rng.choice(choices) if choices else current
+
+
+def apply_action(at, action, rng, bounds):
+    """Set one widget on the session's last render; returns False if the widget is not on screen"""
+    if action == 'date_range':
+        first, last = bounds
+        span = (last - first).days
+        start = first + datetime.timedelta(days=rng.randint(0, span))
+        end = start + datetime.timedelta(days=rng.randint(0, (last - start).days))
+        at.sidebar.date_input[0].set_value((start, end))
+    elif action == 'seasons':
+        widget = at.sidebar.multiselect[0]
+        widget.set_value(_random_subset(rng, widget.options))
+    elif action == 'weathers':
+        widget = at.sidebar.multiselect[1]
+        widget.set_value(_random_subset(rng, widget.options))
+    elif action == 'section':
+        widget = at.radio(key='analysis_section')
+        widget.set_value(_pick_other(rng, widget.options, widget.value))
+    elif action == 'analysis_type':
+        widget = at.selectbox[0]
+        widget.select(_pick_other(rng, widget.options, widget.value))
+    elif action == 'trendline':
+        try:
+            widget = at.radio(key='trendline')
+        except KeyError:
+            return False
+        widget.set_value(_pick_other(rng, widget.options, widget.value))
+    return True
+
+
+def timed_run(at, timeout):
+    started = time.perf_counter()
+    error = None
+    try:
+        at.run(timeout=timeout)
+        if at.exception:
+            error = at.exception[0].message
+    except Exception as e:
+        error = repr(e)
+    return (time.perf_counter() - started) * 1000, error
+
+
+def run_worker(worker, sessions, steps, seed, timeout):
+    """Open `sessions` sessions in this process and interleave `steps` interactions each"""
+    from streamlit.testing.v1 import AppTest
+
+    # One untimed run loads the data and fills the process caches, like a warm server
+    warm = AppTest.from_file(SCRIPT, default_timeout=timeout)
+    timed_run(warm, timeout)
+    del warm
+    rss_before = rss_bytes()
+
+    rngs = [random.Random(f'{seed}-{worker}-{i}') for i in range(sessions)]
+    apps = [AppTest.from_file(SCRIPT, default_timeout=timeout) for _ in range(sessions)]
+    records = []
+    started = time.perf_counter()
+    for i, at in enumerate(apps):
+        latency_ms, error = timed_run(at, timeout)
+        records.append({'worker': worker, 'session': i, 'step': 0, 'action': 'open',
+                        'latency_ms': latency_ms, 'error': error})
+    bounds = [tuple(at.sidebar.date_input[0].value) if not at.exception else None for at in apps]
+
+    actions, weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+    for step in range(1, steps + 1):
+        for i, (at, rng) in enumerate(zip(apps, rngs)):
+            action = rng.choices(actions, weights)[0]
+            if bounds[i] is None or not apply_action(at, action, rng, bounds[i]):
+                continue
+            latency_ms, error = timed_run(at, timeout)
+            records.append({'worker': worker, 'session': i, 'step': step, 'action': action,
+                            'latency_ms': latency_ms, 'error': error})
+
+    return {
+        'worker': worker,
+        'sessions': sessions,
+        'wall_s': time.perf_counter() - started,
+        'rss_before': rss_before,
+        'rss_after': rss_bytes(),
+        'records': records
+    }
+
+
+class ServerSession:
+    """One browser-like client of a running dashboard server, over its websocket"""
+
+    def __init__(self, connection, timeout):
+        self.connection = connection
+        self.timeout = timeout
+        self.widgets = []
+        self.states = {}
+        self.fragment_id = ''
+
+    @classmethod
+    async def connect(cls, url, timeout):
+        from tornado.websocket import websocket_connect
+
+        connection = await asyncio.wait_for(
+            websocket_connect(url, subprotocols=['streamlit'], max_message_size=MAX_MESSAGE_BYTES), timeout
+        )
+        return cls(connection, timeout)
+
+    def close(self):
+        self.connection.close()
+
+    def find(self, kind, key=None, sidebar=False, index=0):
+        """Proto of the `index`-th `kind` widget (the one with `key`, if given) of the last render"""
+        matches = [widget for widget in self.widgets if widget['kind'] == kind and (
+            widget['key'] == key if key is not None else widget['sidebar'] == sidebar)]
+        return matches[index]['proto'] if index < len(matches) else None
+
+    def value(self, proto):
+        """The widget's current value: what this client sent, else what the server rendered"""
+        state = self.states.get(proto.id)
+        if state is not None:
+            value = getattr(state, state.WhichOneof('value'))
+            return list(value.data) if hasattr(value, 'data') else value
+        value = proto.value if proto.set_value else proto.default
+        return value if isinstance(value, int) else list(value)
+
+    def set_value(self, proto, field, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState(id=proto.id)
+        if field.endswith('_array_value'):
+            getattr(state, field).data.extend(value)
+        else:
+            setattr(state, field, value)
+        self.states[proto.id] = state
+        self.fragment_id = next(widget['fragment_id'] for widget in self.widgets if widget['id'] == proto.id)
+
+    def apply(self, action, rng, bounds):
+        """Server-side counterpart of apply_action, drawing the same random choices"""
+        if action == 'date_range':
+            first, last = bounds
+            span = (last - first).days
+            start = first + datetime.timedelta(days=rng.randint(0, span))
+            end = start + datetime.timedelta(days=rng.randint(0, (last - start).days))
+            self.set_value(self.find('date_input', sidebar=True), 'string_array_value',
+                           [start.strftime('%Y/%m/%d'), end.strftime('%Y/%m/%d')])
+        elif action in ('seasons', 'weathers'):
+            proto = self.find('multiselect', sidebar=True, index=int(action == 'weathers'))
+            options = list(proto.options)
+            self.set_value(proto, 'int_array_value', [options.index(o) for o in _random_subset(rng, options)])
+        else:
+            kind, key = {'section': ('radio', 'analysis_section'), 'analysis_type': ('selectbox', None),
+                         'trendline': ('radio', 'trendline')}[action]
+            proto = self.find(kind, key)
+            if proto is None:
+                return False
+            options = list(proto.options)
+            choice = _pick_other(rng, options, options[self.value(proto)])
+            self.set_value(proto, 'int_value', options.index(choice))
+        return True
+
+    def bounds(self):
+        proto = self.find('date_input', sidebar=True)
+        return tuple(datetime.datetime.strptime(day, '%Y/%m/%d').date() for day in self.value(proto))
+
+    async def run(self):
+        """Send a rerun and wait until the script (or fragment) finished; returns (latency_ms, error)"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.page_script_hash = ''
+        message.rerun_script.fragment_id = self.fragment_id
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        started = time.perf_counter()
+        deltas, error = [], None
+        try:
+            await self.connection.write_message(message.SerializeToString(), binary=True)
+            while True:
+                payload = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+                if payload is None:
+                    raise ConnectionError("The server closed the connection")
+                reply = ForwardMsg()
+                reply.ParseFromString(payload)
+                kind = reply.WhichOneof('type')
+                if kind == 'script_finished':
+                    break
+                if kind == 'delta':
+                    deltas.append(reply)
+                    element = reply.delta.new_element
+                    if element.WhichOneof('type') == 'exception' and error is None:
+                        error = element.exception.message
+        except Exception as e:
+            error = repr(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._track(deltas)
+        self.fragment_id = ''
+        return latency_ms, error
+
+    def _track(self, deltas):
+        """Widgets of the new render; a fragment rerun only replaces the fragment's widgets"""
+        from streamlit.runtime.state.common import user_key_from_widget_id
+
+        widgets = [widget for widget in self.widgets if self.fragment_id and widget['fragment_id'] != self.fragment_id]
+        for reply in deltas:
+            element = reply.delta.new_element
+            kind = element.WhichOneof('type')
+            if kind in WIDGET_KINDS:
+                proto = getattr(element, kind)
+                widgets.append({'kind': kind, 'id': proto.id, 'key': user_key_from_widget_id(proto.id),
+                                'sidebar': reply.metadata.delta_path[0] == 1,
+                                'fragment_id': reply.delta.fragment_id, 'proto': proto})
+        self.widgets = widgets
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port):
+    """Start `streamlit run dashboard.py` on `port` and wait until it answers its health check"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', SCRIPT, '--server.headless', 'true',
+         '--server.address', '127.0.0.1', '--server.port', str(port), '--browser.gatherUsageStats', 'false',
+         # Every client gets whole messages rather than references to fetch over HTTP
+         '--global.storeCachedForwardMessagesInMemory', 'false'],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"streamlit did not start on port {port} within {SERVER_START_TIMEOUT} s")
+
+
+async def drive_session(url, worker, index, steps, seed, timeout):
+    """Open one session on the server at `url` and perform `steps` interactions; returns its records"""
+    rng = random.Random(f'{seed}-{worker}-{index}')
+    session = await ServerSession.connect(url, timeout)
+    try:
+        latency_ms, error = await session.run()
+        records = [{'worker': worker, 'session': index, 'step': 0, 'action': 'open',
+                    'latency_ms': latency_ms, 'error': error}]
+        if error or session.find('date_input', sidebar=True) is None:
+            return records
+        bounds = session.bounds()
+
+        actions, weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+        for step in range(1, steps + 1):
+            action = rng.choices(actions, weights)[0]
+            if not session.apply(action, rng, bounds):
+                continue
+            latency_ms, error = await session.run()
+            records.append({'worker': worker, 'session': index, 'step': step, 'action': action,
+                            'latency_ms': latency_ms, 'error': error})
+        return records
+    finally:
+        session.close()
+
+
+async def drive_servers(urls, shares, steps, seed, timeout):
+    """All sessions of every server at once; returns their records and the wall time"""
+    started = time.perf_counter()
+    sessions = await asyncio.gather(*[
+        drive_session(url, worker, index, steps, seed, timeout)
+        for worker, (url, n) in enumerate(zip(urls, shares)) for index in range(n)
+    ])
+    return [record for records in sessions for record in records], time.perf_counter() - started
+
+
+def run_servers(shares, steps, seed, timeout):
+    """One dashboard server per share of sessions, driven concurrently over websockets"""
+    ports = [free_port() for _ in shares]
+    processes = []
+    try:
+        for port in ports:
+            processes.append(start_server(port))
+        urls = [f'ws://127.0.0.1:{port}/_stcore/stream' for port in ports]
+        # One untimed session per server loads the data and fills its caches, like a warm server
+        asyncio.run(drive_servers(urls, [1] * len(urls), 0, seed, timeout))
+        rss_before = [rss_bytes(process.pid) for process in processes]
+        records, wall_s = asyncio.run(drive_servers(urls, shares, steps, seed, timeout))
+        return [{
+            'worker': worker,
+            'sessions': shares[worker],
+            'wall_s': wall_s,
+            'rss_before': rss_before[worker],
+            'rss_after': rss_bytes(process.pid),
+            'records': [record for record in records if record['worker'] == worker]
+        } for worker, process in enumerate(processes)]
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies, dtype=float)
+    if latencies.size == 0:
+        return {'runs': 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'runs': int(latencies.size), 'p50': p50, 'p95': p95, 'p99': p99,
+            'mean': float(latencies.mean()), 'max': float(latencies.max())}
+
+
+def run(sessions, workers, steps, seed=0, timeout=120, data_dir=None, mode='server'):
+    """Spread `sessions` over `workers` servers (or AppTest processes) and aggregate their timings"""
+    if data_dir:
+        os.environ['BIKE_DATA_DIR'] = os.path.abspath(data_dir)
+    workers = max(1, min(workers, sessions))
+    shares = [sessions // workers + (w < sessions % workers) for w in range(workers)]
+
+    started = time.perf_counter()
+    if mode == 'server':
+        results = run_servers(shares, steps, seed, timeout)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(run_worker, range(workers), shares, [steps] * workers,
+                                    [seed] * workers, [timeout] * workers))
+    wall_s = time.perf_counter() - started
+
+    records = [record for result in results for record in result['records']]
+    reruns = [record for record in records if record['action'] != 'open']
+    errors = [record for record in records if record['error']]
+    busy_s = max(result['wall_s'] for result in results)
+    by_action = {}
+    for record in reruns:
+        by_action.setdefault(record['action'], []).append(record['latency_ms'])
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'mode': mode,
+        'sessions': sessions,
+        'workers': workers,
+        'steps': steps,
+        'seed': seed,
+        'wall_s': wall_s,
+        'runs': len(records),
+        'throughput_rps': len(records) / busy_s if busy_s else None,
+        'latency_ms': percentiles([record['latency_ms'] for record in reruns]),
+        'open_ms': percentiles([record['latency_ms'] for record in records if record['action'] == 'open']),
+        'actions': {action: percentiles(latencies) for action, latencies in by_action.items()},
+        'memory': {
+            'per_session_mb': float(np.mean([
+                (result['rss_after'] - result['rss_before']) / result['sessions'] for result in results
+            ])) / 2 ** 20,
+            'worker_rss_mb': [result['rss_after'] / 2 ** 20 for result in results]
+        },
+        'errors': [
+            {key: record[key] for key in ('worker', 'session', 'step', 'action', 'error')} for record in errors[:20]
+        ],
+        'error_count': len(errors)
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Latency percentiles that grew, or throughput that shrank, by more than `tolerance`"""
+    regressions = []
+    for key in ('p50', 'p95', 'p99'):
+        before, after = baseline.get('latency_ms', {}).get(key), report['latency_ms'].get(key)
+        if before and after and after > before * (1 + tolerance):
+            regressions.append({'metric': f'latency_ms.{key}', 'baseline': before, 'current': after})
+    before, after = baseline.get('throughput_rps'), report.get('throughput_rps')
+    if before and after and after < before / (1 + tolerance):
+        regressions.append({'metric': 'throughput_rps', 'baseline': before, 'current': after})
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent simulated sessions.")
+    parser.add_argument('--sessions', type=int, default=8, help="Simulated sessions in total")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Dashboard servers (or AppTest processes) to spread them over")
+    parser.add_argument('--mode', choices=['server', 'apptest'], default='server',
+                        help="Concurrent websocket clients of real servers, or serial AppTest sessions per worker")
+    parser.add_argument('--steps', type=int, default=20, help="Interactions per session after opening the app")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds allowed for a single rerun")
+    parser.add_argument('--data-dir', help="Directory holding day.csv and hour.csv (default: the dashboard's)")
+    parser.add_argument('--out', help="Write the JSON report here")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before it counts as a regression")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run(args.sessions, args.workers, args.steps, args.seed, args.timeout, args.data_dir, args.mode)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+
+    latency = report['latency_ms']
+    print(f"{report['sessions']} sessions on {report['workers']} {report['mode']} workers: {report['runs']} runs, "
+          f"{report['throughput_rps']:.1f} runs/s, {report['error_count']} errors")
+    if latency['runs']:
+        print(f"Rerun latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+    for action, stats in sorted(report['actions'].items()):
+        print(f"  {action:<16}{stats['runs']:>6} runs  p50 {stats['p50']:>7.0f} ms  p95 {stats['p95']:>7.0f} ms")
+    print(f"Memory: {report['memory']['per_session_mb']:.1f} MB per session")
+    for regression in report.get('regressions', []):
+        print(f"Regression: {regression['metric']} {regression['baseline']:.1f} -> {regression['current']:.1f}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1, default=str)
+    return 1 if report['error_count'] or report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# Floats keep this many significant digits, but never lose integer digits
+SIGNIFICANT_DIGITS = 4
+
+
+def _decimals(magnitude, digits):
+    if not np.isfinite(magnitude) or magnitude == 0:
+        return digits
+    return max(0, digits - 1 - int(np.floor(np.log10(magnitude))))
+
+
+def round_floats(value, digits=SIGNIFICANT_DIGITS):
+    """Copy of a figure spec with every float rounded; arrays share one precision set by their largest value"""
+    if isinstance(value, dict):
+        return {key: round_floats(item, digits) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, float) for item in value):
+            value = np.asarray(value)
+        else:
+            return type(value)(round_floats(item, digits) for item in value)
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind != 'f' or value.size == 0:
+            return value
+        finite = np.abs(value[np.isfinite(value)])
+        return np.round(value, _decimals(finite.max() if finite.size else 0, digits))
+    if isinstance(value, float):
+        return round(value, _decimals(abs(value), digits))
+    return value
+
+
+def compact(fig, digits=SIGNIFICANT_DIGITS):
+    """Smaller equivalent of `fig`: rounded numbers and only the template entries its traces use"""
+    spec = fig.to_dict()
+    template = spec.get('layout', {}).get('template')
+    if template and 'data' in template:
+        used = {trace.get('type', 'scatter') for trace in spec['data']}
+        template['data'] = {kind: traces for kind, traces in template['data'].items() if kind in used}
+    return go.Figure(round_floats(spec, digits))
@@ -0,0 +1,97 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import data_loader
+import engine
+
+# Seconds between checks of the source files
+REFRESH_INTERVAL = 30
+
+
+class SnapshotRefresher:
+    """Rebuilds the dataset in a background thread when the source files change"""
+
+    def __init__(self, data_dir, backend='pandas', interval=REFRESH_INTERVAL, prepare=None, clustering=None):
+        self.data_dir = data_dir
+        self.backend = backend
+        self.clustering = clustering
+        self.interval = interval
+        self.prepare = prepare
+        self.refreshes = 0
+        self.last_check = None
+        self.last_refresh = None
+        self.last_refresh_ms = None
+        self.last_error = None
+        self._fingerprints = data_loader.source_fingerprints(data_dir)
+        self._snapshot = engine.load_dataset(data_dir, backend=backend, clustering=clustering)
+        self._pending = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """The latest published snapshot"""
+        return self._snapshot
+
+    def start(self):
+        """Check for changes every `interval` seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='bike-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """One refresh cycle; returns True when a new snapshot was published"""
+        self.last_check = datetime.now(timezone.utc).isoformat()
+        try:
+            fingerprints = data_loader.source_fingerprints(self.data_dir)
+        except OSError as e:
+            # A source may be missing for a moment while it is being replaced
+            self.last_error = str(e)
+            return False
+
+        if fingerprints == self._fingerprints or fingerprints != self._pending:
+            self._pending = None if fingerprints == self._fingerprints else fingerprints
+            return False
+
+        started = time.perf_counter()
+        try:
+            snapshot = engine.load_dataset(self.data_dir, backend=self.backend, clustering=self.clustering)
+            snapshot.version = self._snapshot.version + 1
+            if self.prepare is not None:
+                self.prepare(snapshot)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._pending = None
+            return False
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._fingerprints = fingerprints
+            self._pending = None
+        self.refreshes += 1
+        self.last_refresh = datetime.now(timezone.utc).isoformat()
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        self.last_error = None
+        return True
+
+    def stats(self):
+        return {
+            'version': self._snapshot.version,
+            'interval_s': self.interval,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'refreshes': self.refreshes,
+            'last_check': self.last_check,
+            'last_refresh': self.last_refresh,
+            'last_refresh_ms': self.last_refresh_ms,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,270 @@
+"""Static report snapshots for filter presets
+
+    python reports.py --per-season --per-month --out reports/
+    python reports.py --preset-file presets.json --out reports/ --workers 4
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import engine
+import figures
+import payloads
+
+# Report sections: heading, then (figure builder, tables it takes) pairs
+REPORT_SECTIONS = [
+    ("Seasonal Patterns", [
+        (figures.seasonal_bar, ['seasonal_avg']),
+        (figures.seasonal_trend, ['monthly_trend'])
+    ]),
+    ("Weather Impact", [
+        (figures.weather_bar, ['weather_avg']),
+        (figures.temperature_scatter, ['filtered_df', 'temperature_trend_ols']),
+        (figures.weather_correlation, ['weather_corr'])
+    ]),
+    ("User Behavior", [
+        (figures.user_ratio_bar, ['user_ratio']),
+        (figures.cluster_pie, ['cluster_counts']),
+        (figures.seasonal_users_bar, ['seasonal_users'])
+    ]),
+    ("Peak Hours", [
+        (figures.peak_hours, ['hour_profile'])
+    ]),
+    ("Interactive Analysis", [
+        (figures.temperature_bins_bar, ['temp_analysis']),
+        (figures.season_weather_heatmap, ['season_weather']),
+        (figures.monthly_users_lines, ['monthly_users'])
+    ])
+]
+# Tables shown as HTML tables under the figures
+REPORT_TABLES = [
+    ("Demand Cluster Characteristics", 'cluster_stats'),
+    ("Hourly Demand Cluster Characteristics", 'hour_cluster_stats'),
+    ("Weather Impact Summary", 'weather_impact')
+]
+PLOTLY_CDN = 'https://cdn.plot.ly/plotly-2.35.2.min.js'
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{plotlyjs}
+<style>
+body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1200px; color: #262730; }}
+h1 {{ color: #1f77b4; text-align: center; border-bottom: 3px solid #1f77b4; padding-bottom: 1rem; }}
+.filters {{ text-align: center; color: #666; }}
+.kpis {{ display: flex; gap: 1rem; justify-content: center; margin: 2rem 0; }}
+.kpi {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 10px; padding: 1rem 2rem; text-align: center; }}
+.kpi strong {{ display: block; font-size: 1.6rem; }}
+table {{ border-collapse: collapse; margin: 1rem 0; }}
+th, td {{ border: 1px solid #ddd; padding: 0.3rem 0.8rem; text-align: right; }}
+</style>
+</head>
+<body>
+<h1>🚴‍♂️ {title}</h1>
+<p class="filters">{filters}</p>
+{body}
+</body>
+</html>
+"""
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'report'
+
+
+def season_presets(dataset):
+    """One preset per observed season over the full date range"""
+    return [{'name': season, 'seasons': [season]} for season in engine.filter_options(dataset)['seasons']]
+
+
+def month_presets(dataset):
+    """One preset per calendar month in the data"""
+    options = engine.filter_options(dataset)
+    months = pd.period_range(options['start'], options['end'], freq='M')
+    return [{
+        'name': month.strftime('%Y-%m'),
+        'start': max(month.start_time.date(), options['start']),
+        'end': min(month.end_time.date(), options['end'])
+    } for month in months]
+
+
+def preset_filters(dataset, preset):
+    return engine.make_filters(
+        dataset, preset.get('start'), preset.get('end'), preset.get('seasons'), preset.get('weathers')
+    )
+
+
+def build_figures(results):
+    """Compacted figures of every report section, skipping those without data"""
+    built = []
+    for heading, charts in REPORT_SECTIONS:
+        section = []
+        for builder, tables in charts:
+            values = [getattr(results, name) for name in tables]
+            if any(value is None for value in values):
+                continue
+            section.append((builder.__name__, payloads.compact(builder(*values))))
+        built.append((heading, section))
+    return built
+
+
+def render_html(name, filters, kpis, sections, tables, plotlyjs='cdn'):
+    """Static page with the KPIs, every figure and the summary tables"""
+    if plotlyjs == 'inline':
+        from plotly.offline import get_plotlyjs
+        script = f'<script type="text/javascript">{get_plotlyjs()}</script>'
+    else:
+        script = f'<script src="{PLOTLY_CDN}"></script>'
+
+    kpi_items = [
+        ("Avg Daily Rentals", f"{kpis['avg_daily']:,}"),
+        ("Total Days", f"{kpis['total_days']}"),
+        ("Peak Day Rentals", f"{kpis['peak_day']:,}" if pd.notna(kpis['peak_day']) else "–"),
+        ("Utilization Rate", f"{kpis['utilization']:.1f}%" if pd.notna(kpis['utilization']) else "–")
+    ]
+    body = ['<div class="kpis">'] + [
+        f'<div class="kpi">{html.escape(label)}<strong>{html.escape(value)}</strong></div>' for label, value in kpi_items
+    ] + ['</div>']
+    for heading, section in sections:
+        body.append(f'<h2>{html.escape(heading)}</h2>')
+        body.extend(fig.to_html(full_html=False, include_plotlyjs=False) for _, fig in section)
+    for heading, table in tables:
+        body.append(f'<h2>{html.escape(heading)}</h2>')
+        body.append(table.to_html(float_format=lambda value: f'{value:,.2f}'))
+
+    description = (f"{filters.start:%d %b %Y} – {filters.end:%d %b %Y} · "
+                   f"{', '.join(filters.seasons) or 'no seasons'} · {', '.join(filters.weathers) or 'no weather'}")
+    return PAGE.format(
+        title=html.escape(f"Bike Sharing Report: {name}"),
+        plotlyjs=script,
+        filters=html.escape(description),
+        body='\n'.join(body)
+    )
+
+
+def render_preset(dataset, preset, out_dir, formats=('html', 'json'), plotlyjs='cdn'):
+    """Compute, render and write one preset; returns a summary of what was written"""
+    started = time.perf_counter()
+    filters = preset_filters(dataset, preset)
+    results = engine.compute_results(dataset, filters)
+    sections = build_figures(results)
+    report_dir = os.path.join(out_dir, slugify(preset['name']))
+    os.makedirs(report_dir, exist_ok=True)
+
+    paths = []
+    if 'json' in formats:
+        paths.extend(engine.write_tables(engine.result_tables(results), filters, report_dir, 'json'))
+        path = os.path.join(report_dir, 'figures.json')
+        with open(path, 'w') as f:
+            json.dump({name: json.loads(fig.to_json()) for _, section in sections for name, fig in section}, f)
+        paths.append(path)
+    if 'html' in formats:
+        tables = [(heading, getattr(results, name)) for heading, name in REPORT_TABLES]
+        page = render_html(preset['name'], filters, results.kpis, sections, tables, plotlyjs)
+        path = os.path.join(report_dir, 'index.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        paths.append(path)
+
+    return {
+        'name': preset['name'],
+        'dir': report_dir,
+        'days': results.kpis['total_days'],
+        'paths': paths,
+        'wall_ms': (time.perf_counter() - started) * 1000
+    }
+
+
+_worker_dataset = None
+
+
+def _init_worker(data_dir, backend):
+    global _worker_dataset
+    _worker_dataset = engine.load_dataset(data_dir, backend=backend)
+
+
+def _render(preset, out_dir, formats, plotlyjs):
+    return render_preset(_worker_dataset, preset, out_dir, formats, plotlyjs)
+
+
+def write_index(reports, out_dir):
+    """Landing page linking every rendered report"""
+    items = '\n'.join(
+        f'<li><a href="{html.escape(os.path.basename(report["dir"]))}/index.html">'
+        f'{html.escape(report["name"])}</a> ({report["days"]} days)</li>'
+        for report in reports
+    )
+    path = os.path.join(out_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(PAGE.format(title="Bike Sharing Reports", plotlyjs='', filters='', body=f'<ul>\n{items}\n</ul>'))
+    return path
+
+
+def render_all(presets, out_dir, data_dir='dataset', backend='pandas', workers=None, formats=('html', 'json'), plotlyjs='cdn'):
+    """Render every preset on a process pool; each worker maps the dataset once"""
+    os.makedirs(out_dir, exist_ok=True)
+    n = len(presets)
+    # Built here, once, so the workers only map a fresh cache instead of each parsing the CSVs
+    engine.build_cache(data_dir, backend)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data_dir, backend)) as pool:
+        reports = list(pool.map(_render, presets, [out_dir] * n, [formats] * n, [plotlyjs] * n))
+    if 'html' in formats:
+        write_index(reports, out_dir)
+    return reports
+
+
+def load_presets(path):
+    with open(path) as f:
+        presets = json.load(f)
+    for preset in presets:
+        if 'name' not in preset:
+            raise ValueError(f"Preset without a name: {preset}")
+    return presets
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Render static dashboard reports for filter presets.")
+    parser.add_argument('--preset-file', help="JSON list of presets")
+    parser.add_argument('--per-season', action='store_true', help="Add one preset per season")
+    parser.add_argument('--per-month', action='store_true', help="Add one preset per calendar month")
+    parser.add_argument('--data-dir', default='dataset', help="Directory holding day.csv and hour.csv")
+    parser.add_argument('--backend', choices=engine.BACKENDS, default='pandas')
+    parser.add_argument('--out', required=True, help="Output directory")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--format', action='append', dest='formats', choices=['html', 'json'],
+                        help="Output format; repeat for both (default: html and json)")
+    parser.add_argument('--plotlyjs', choices=['cdn', 'inline'], default='cdn',
+                        help="Load plotly.js from its CDN or embed it in every page")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    presets = load_presets(args.preset_file) if args.preset_file else []
+    if args.per_season or args.per_month:
+        dataset = engine.load_dataset(args.data_dir, backend=args.backend)
+        presets += season_presets(dataset) if args.per_season else []
+        presets += month_presets(dataset) if args.per_month else []
+    if not presets:
+        presets = [{'name': "All data"}]
+
+    started = time.perf_counter()
+    reports = render_all(presets, args.out, args.data_dir, args.backend, args.workers,
+                         tuple(args.formats or ('html', 'json')), args.plotlyjs)
+    for report in reports:
+        print(f"{report['dir']}: {report['days']} days, {report['wall_ms']:.0f} ms")
+    print(f"Rendered {len(reports)} reports in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
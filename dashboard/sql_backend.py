@@ -0,0 +1,441 @@
+"""Optional SQLite storage backend"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import weakref
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from clustering import CLUSTERING, DEMAND_CLUSTERS, N_CLUSTERS, QUANTILES, Segmenter, cluster_summary
+from day_stats import line_fits, pearson
+from hour_cube import HOURS_PER_DAY
+from hourly_index import COUNT_COLUMNS
+from tables import BASELINE_DAILY_RENTALS, FilterResults
+
+# Bump whenever the schema or the ingested columns change
+SCHEMA_VERSION = 3
+DATABASE_NAME = 'bike.sqlite'
+INDEXED_COLUMNS = ['date', 'season', 'weather_situation', 'is_workingday']
+HOUR_COLUMNS = {'dteday': 'date', 'hr': 'hour', 'temp': 'temperature', 'casual': 'casual_users',
+                'registered': 'registered_users', 'cnt': 'total_count'}
+# Rows a k-means segmenter is fitted on, taken evenly across the table
+FIT_SAMPLE_ROWS = 100_000
+# Clustering features, in the order of clustering.features()
+FEATURES = {
+    'total_count': 'total_count',
+    'temperature': 'temperature',
+    'casual_share': 'CASE WHEN total_count > 0 THEN CAST(casual_users AS REAL) / total_count * 100 ELSE 0.0 END'
+}
+CATEGORIES = {
+    **{column: [mapping[key] for key in sorted(mapping)] for column, mapping in data_loader.LABEL_MAPPINGS.items()},
+    'demand_cluster': DEMAND_CLUSTERS
+}
+
+
+def _day_rows(day_df):
+    """Daily frame as stored: ISO dates and category codes (NULL for missing labels)"""
+    frame = day_df.copy()
+    frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+    for column in CATEGORIES:
+        codes = frame[column].cat.codes
+        frame[column] = codes.where(codes >= 0).astype('Int64')
+    return frame
+
+
+def build_database(data_dir, path, fingerprints, clustering=CLUSTERING, use_cache=True):
+    """Ingest the cleaned daily data and the raw hourly rows into a fresh database at `path`"""
+    day_df, _ = data_loader.load_data(data_dir, use_cache=use_cache, clusters=clustering['day'])
+    # A unique name, so processes building the same database at once do not share the file
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    os.close(fd)
+
+    with sqlite3.connect(tmp_path) as conn:
+        _day_rows(day_df).to_sql('day', conn, index=False)
+        columns = list(HOUR_COLUMNS)
+        for chunk in data_loader.read_hour_chunks(os.path.join(data_dir, data_loader.SOURCE_FILES['hour']), columns):
+            chunk = chunk.rename(columns=HOUR_COLUMNS)
+            chunk['date'] = pd.to_datetime(chunk['date'].astype(str)).dt.strftime('%Y-%m-%d')
+            chunk.to_sql('hour', conn, index=False, if_exists='append')
+
+        for column in INDEXED_COLUMNS:
+            conn.execute(f'CREATE INDEX day_{column} ON day ({column})')
+        conn.execute('CREATE INDEX hour_date ON hour (date, hour)')
+        conn.execute('CREATE INDEX hour_total_count ON hour (total_count)')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('version', str(SCHEMA_VERSION)),
+            ('sources', json.dumps(fingerprints, sort_keys=True)),
+            ('clusters', json.dumps(clustering, sort_keys=True)),
+            ('columns', json.dumps({column: str(dtype) for column, dtype in day_df.dtypes.items()}))
+        ])
+        conn.execute('ANALYZE')
+    os.replace(tmp_path, path)
+
+
+def _is_current(path, fingerprints, clustering):
+    try:
+        with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as conn:
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+    except sqlite3.Error:
+        return False
+    return (meta.get('version') == str(SCHEMA_VERSION)
+            and meta.get('sources') == json.dumps(fingerprints, sort_keys=True)
+            and meta.get('clusters') == json.dumps(clustering, sort_keys=True))
+
+
+def load_dataset(data_dir='dataset', use_cache=True, clustering=None):
+    """Open the database for `data_dir`, (re)building it if missing or stale"""
+    fingerprints = data_loader.source_fingerprints(data_dir)
+    clustering = {**CLUSTERING, **(clustering or {})}
+    if not use_cache:
+        directory = tempfile.mkdtemp(prefix='bike-sqlite-')
+        path = os.path.join(directory, DATABASE_NAME)
+        build_database(data_dir, path, fingerprints, clustering, use_cache=False)
+        dataset = SQLDataset(path)
+        weakref.finalize(dataset, shutil.rmtree, directory, ignore_errors=True)
+        return dataset
+
+    path = os.path.join(data_dir, data_loader.CACHE_DIR_NAME, DATABASE_NAME)
+    if not _is_current(path, fingerprints, clustering):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        build_database(data_dir, path, fingerprints, clustering)
+    return SQLDataset(path)
+
+
+def cluster_expression(segmenter):
+    """SQL expression of the cluster code a fitted `segmenter` gives a row of FEATURES columns"""
+    if segmenter.method != 'kmeans':
+        # Code = number of edges at or below the count, as np.searchsorted(side='right')
+        cases = ' '.join(f'WHEN total_count < {float(edge)!r} THEN {code}' for code, edge in enumerate(segmenter.edges))
+        return f'CASE {cases} ELSE {N_CLUSTERS - 1} END'
+
+    mean, std = segmenter.scale
+    std = np.where(std > 0, std, 1.0)
+    # A missing feature sits at the mean, as in Segmenter._standardize
+    scaled = [f'COALESCE(({name} - {float(m)!r}) / {float(sd)!r}, 0.0)'
+              for name, m, sd in zip(FEATURES, np.broadcast_to(mean, len(FEATURES)), np.broadcast_to(std, len(FEATURES)))]
+    distances = [
+        ' + '.join(f'({x} - {float(c)!r}) * ({x} - {float(c)!r})' for x, c in zip(scaled, center))
+        for center in segmenter.centers
+    ]
+    # The nearest center, the first one on ties
+    cases = ' '.join(
+        'WHEN ' + ' AND '.join(f'({distances[code]}) <= ({distances[other]})' for other in range(code + 1, N_CLUSTERS))
+        + f' THEN {code}'
+        for code in range(N_CLUSTERS - 1)
+    )
+    return f'CASE {cases} ELSE {N_CLUSTERS - 1} END'
+
+
+def _labels(codes, column):
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=int), categories=CATEGORIES[column], ordered=True)
+
+
+class SQLDataset:
+    """Read-only handle on an ingested database; one connection per thread"""
+
+    def __init__(self, path, version=0):
+        self.path = path
+        self.version = version
+        self._local = threading.local()
+        # Column order and the dtypes of the non-label columns of the daily frame
+        self.columns = json.loads(self.query('SELECT value FROM meta WHERE key = ?', ['columns'])[0][0])
+
+    def __getstate__(self):
+        return {'path': self.path, 'version': self.version}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['version'])
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        return conn
+
+    def query(self, sql, params=()):
+        return self.connection.execute(sql, list(params)).fetchall()
+
+    def frame(self, sql, params=()):
+        return pd.read_sql_query(sql, self.connection, params=list(params))
+
+    @property
+    def n_days(self):
+        return self.query('SELECT COUNT(*) FROM day')[0][0]
+
+    def filter_options(self):
+        """Choices the sidebar offers: the date span and the observed labels"""
+        start, end = self.query('SELECT MIN(date), MAX(date) FROM day')[0]
+        observed = {
+            column: [CATEGORIES[column][code] for (code,) in self.query(
+                f'SELECT DISTINCT {column} FROM day WHERE {column} IS NOT NULL ORDER BY {column}')]
+            for column in ('season', 'weather_situation')
+        }
+        return {
+            'start': pd.Timestamp(start).date(),
+            'end': pd.Timestamp(end).date(),
+            'seasons': observed['season'],
+            'weathers': observed['weather_situation']
+        }
+
+    @cached_property
+    def segmenters(self):
+        """Day and hour demand segmenters, fitted on first use without reading the tables into memory"""
+        clustering = json.loads(self.query('SELECT value FROM meta WHERE key = ?', ['clusters'])[0][0])
+        return {granularity: self._fit(Segmenter.parse(clustering[granularity]), granularity)
+                for granularity in ('day', 'hour')}
+
+    def _fit(self, segmenter, table):
+        if segmenter.method == 'quantiles':
+            segmenter.edges = self._quantiles(table, QUANTILES)
+        elif segmenter.method == 'kmeans':
+            n = self.query(f'SELECT MAX(rowid) FROM {table}')[0][0] or 0
+            sample = self.frame(
+                f'SELECT total_count, temperature, casual_users FROM {table} WHERE rowid % ? = 0',
+                [max(1, n // FIT_SAMPLE_ROWS)]
+            )
+            segmenter.fit(sample)
+        return segmenter
+
+    def _quantiles(self, table, quantiles):
+        """Linearly interpolated quantiles of the rental count, as np.nanquantile, two rows read per quantile"""
+        n = self.query(f'SELECT COUNT(total_count) FROM {table}')[0][0]
+        if not n:
+            return np.zeros(len(quantiles))
+        values = []
+        for q in quantiles:
+            position = q * (n - 1)
+            below = int(np.floor(position))
+            rows = self.query(
+                f'SELECT total_count FROM {table} WHERE total_count IS NOT NULL ORDER BY total_count LIMIT 2 OFFSET ?',
+                [below]
+            )
+            low = float(rows[0][0])
+            high = float(rows[-1][0])
+            values.append(low + (high - low) * (position - below))
+        return np.array(values)
+
+    def hourly_records(self, days):
+        """Hourly records of the days at row positions `days`"""
+        return self.frame(
+            'SELECT day.rowid - 1 AS day, hour.hour, hour.temperature, hour.casual_users, hour.registered_users,'
+            ' hour.total_count FROM hour JOIN day ON day.date = hour.date'
+            ' WHERE day.rowid IN (SELECT value + 1 FROM json_each(?))'
+            f' AND hour.hour BETWEEN 0 AND {HOURS_PER_DAY - 1} ORDER BY day.rowid, hour.hour',
+            [json.dumps([int(day) for day in days])]
+        )
+
+    def hourly_clusters(self, where, params):
+        """Row count and mean FEATURES per hourly demand cluster of the days matching `where`, as a GROUP BY"""
+        features = ', '.join(f'{sql} AS {name}' for name, sql in FEATURES.items())
+        records = (f'SELECT {features} FROM (SELECT hour.total_count, hour.temperature, hour.casual_users FROM hour'
+                   f' JOIN day ON day.date = hour.date WHERE {where} AND hour.hour BETWEEN 0 AND {HOURS_PER_DAY - 1})')
+        rows = self.query(
+            f'SELECT {cluster_expression(self.segmenters["hour"])} AS cluster, COUNT(*),'
+            f' {", ".join(f"AVG({name})" for name in FEATURES)} FROM ({records}) GROUP BY cluster',
+            params
+        )
+        counts = np.zeros(N_CLUSTERS, dtype=np.int64)
+        means = np.full((N_CLUSTERS, len(FEATURES)), np.nan)
+        for code, n, *averages in rows:
+            counts[code] = n
+            means[code] = averages
+        return counts, means
+
+    def hourly_curves(self, days):
+        """Average casual, registered and total rentals per hour over the days at row positions `days`"""
+        # Positions travel as one JSON parameter, so any number of days fits in the query
+        rows = self.query(
+            'SELECT hour.hour, COUNT(*), AVG(hour.casual_users), AVG(hour.registered_users), AVG(hour.total_count)'
+            ' FROM hour JOIN day ON day.date = hour.date'
+            ' WHERE day.rowid IN (SELECT value + 1 FROM json_each(?))'
+            f' AND hour.hour BETWEEN 0 AND {HOURS_PER_DAY - 1} GROUP BY hour.hour',
+            [json.dumps([int(day) for day in days])]
+        )
+        columns = {'hour': np.arange(HOURS_PER_DAY)}
+        columns.update({name: np.full(HOURS_PER_DAY, np.nan) for name in COUNT_COLUMNS})
+        columns['days'] = np.zeros(HOURS_PER_DAY, dtype=np.int64)
+        for hour, n, *averages in rows:
+            columns['days'][hour] = n
+            for name, average in zip(COUNT_COLUMNS, averages):
+                columns[name][hour] = average
+        return pd.DataFrame(columns)
+
+    def results(self, state):
+        """Lazily evaluated tables for one filter state, computed in SQL"""
+        return SQLResults(self, state)
+
+
+def filter_clause(state, table='day'):
+    """WHERE clause and parameters selecting the days of a filter state"""
+    seasons = [CATEGORIES['season'].index(label) for label in state.seasons if label in CATEGORIES['season']]
+    weathers = [CATEGORIES['weather_situation'].index(label) for label in state.weathers
+                if label in CATEGORIES['weather_situation']]
+    sql = (f'{table}.date BETWEEN ? AND ?'
+           f' AND {table}.season IN ({", ".join("?" * len(seasons))})'
+           f' AND {table}.weather_situation IN ({", ".join("?" * len(weathers))})')
+    return sql, [state.start.isoformat(), state.end.isoformat(), *seasons, *weathers]
+
+
+class SQLSelection:
+    """StatsSelection counterpart that answers every aggregate with a GROUP BY query"""
+
+    def __init__(self, dataset, state):
+        self.dataset = dataset
+        self.where, self.params = filter_clause(state)
+
+    def _grouped(self, by, aggregates):
+        """Rows of (group codes..., aggregates...) for the non-empty groups of `by`, in category order"""
+        by = [by] if isinstance(by, str) else list(by)
+        keys = ', '.join(by)
+        present = ' AND '.join(f'{key} IS NOT NULL' for key in by)
+        rows = self.dataset.query(
+            f'SELECT {keys}, {", ".join(["COUNT(*)", *aggregates])} FROM day'
+            f' WHERE {self.where} AND {present} GROUP BY {keys} ORDER BY {keys}',
+            self.params
+        )
+        codes = [[row[i] for row in rows] for i in range(len(by))]
+        arrays = [_labels(code, key) for key, code in zip(by, codes)]
+        if len(by) == 1:
+            index = pd.CategoricalIndex(arrays[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(arrays, names=by)
+        values = np.array([row[len(by):] for row in rows], dtype=float).reshape(len(rows), len(aggregates) + 1)
+        return index, values[:, 0], values[:, 1:]
+
+    @cached_property
+    def n_days(self):
+        return self.dataset.query(f'SELECT COUNT(*) FROM day WHERE {self.where}', self.params)[0][0]
+
+    def count(self, by):
+        index, counts, _ = self._grouped(by, [])
+        return pd.Series(counts.astype(int), index=index, name='count')
+
+    def mean(self, by, metrics):
+        index, _, means = self._grouped(by, [f'AVG({metric})' for metric in metrics])
+        return pd.DataFrame(means, index=index, columns=metrics)
+
+    def overall_mean(self, metric):
+        value = self.dataset.query(f'SELECT AVG({metric}) FROM day WHERE {self.where}', self.params)[0][0]
+        return np.nan if value is None else value
+
+    def regression(self, x, y, by):
+        index, n, moments = self._grouped(by, [
+            f'SUM({x})', f'SUM({y})', f'SUM({x} * {x})', f'SUM({y} * {y})', f'SUM({x} * {y})'
+        ])
+        return line_fits(index, n, *moments.T)
+
+    def correlation(self, metrics):
+        pairs = [(i, j) for i in range(len(metrics)) for j in range(i, len(metrics))]
+        row = self.dataset.query(
+            f'SELECT COUNT(*), {", ".join(f"SUM({m})" for m in metrics)}, '
+            f'{", ".join(f"SUM({metrics[i]} * {metrics[j]})" for i, j in pairs)} FROM day WHERE {self.where}',
+            self.params
+        )[0]
+        values = np.array(row, dtype=float)
+        values = np.nan_to_num(values)
+        gram = np.zeros((len(metrics), len(metrics)))
+        for (i, j), value in zip(pairs, values[1 + len(metrics):]):
+            gram[i, j] = gram[j, i] = value
+        return pearson(metrics, values[0], values[1:1 + len(metrics)], gram)
+
+    def monthly_mean(self, metrics, by=None):
+        keys = "substr(date, 1, 7)" + (f', {by}' if by else '')
+        present = f' AND {by} IS NOT NULL' if by else ''
+        frame = self.dataset.frame(
+            f'SELECT {keys}, {", ".join(f"AVG({m}) AS {m}" for m in metrics)} FROM day'
+            f' WHERE {self.where}{present} GROUP BY {keys} ORDER BY {keys}',
+            self.params
+        )
+        frame.columns = ['date'] + ([by] if by else []) + list(metrics)
+        if by:
+            frame[by] = _labels(frame[by], by)
+        frame[list(metrics)] = frame[list(metrics)].astype(float)
+        return frame
+
+
+class SQLResults(FilterResults):
+    """FilterResults whose inputs come from SQL: aggregates through SQLSelection, rows only on demand"""
+
+    @cached_property
+    def selection(self):
+        return SQLSelection(self.dataset, self.state)
+
+    @cached_property
+    def corr_selection(self):
+        return self.selection
+
+    @cached_property
+    def filtered_df(self):
+        # Rows keep their position in the daily frame as the index, as FilterIndex.apply does
+        frame = self.dataset.frame(
+            f'SELECT rowid - 1 AS position, * FROM day WHERE {self.selection.where} ORDER BY date',
+            self.selection.params
+        ).astype({'position': 'int64'}).set_index('position').rename_axis(None)[list(self.dataset.columns)]
+        for column, dtype in self.dataset.columns.items():
+            if column in CATEGORIES:
+                frame[column] = _labels(frame[column].fillna(-1), column)
+            elif column == 'date':
+                frame[column] = pd.to_datetime(frame[column])
+            else:
+                frame[column] = frame[column].astype(dtype)
+        return frame
+
+    def positions(self):
+        return np.array([row[0] for row in self.dataset.query(
+            f'SELECT rowid - 1 FROM day WHERE {self.selection.where} ORDER BY date', self.selection.params
+        )], dtype=np.int64)
+
+    def column(self, name):
+        # Rows only ever come from SQL as a whole, so this is filtered_df's column
+        return self.filtered_df[name]
+
+    @cached_property
+    def kpis(self):
+        n, avg_daily, peak_day = self.dataset.query(
+            f'SELECT COUNT(*), AVG(total_count), MAX(total_count) FROM day WHERE {self.selection.where}',
+            self.selection.params
+        )[0]
+        avg_daily = int(avg_daily) if n else 0
+        peak_day = np.nan if peak_day is None else peak_day
+        with np.errstate(invalid='ignore', divide='ignore'):
+            utilization = np.float64(avg_daily) / peak_day * 100
+        return {
+            'avg_daily': avg_daily,
+            'delta_value': avg_daily - BASELINE_DAILY_RENTALS if n else 0,
+            'total_days': n,
+            'peak_day': peak_day,
+            'utilization': utilization
+        }
+
+    @cached_property
+    def hour_profile(self):
+        where, params = filter_clause(self.state)
+        rows = self.dataset.query(
+            'SELECT hour.hour, day.is_workingday, AVG(hour.total_count) FROM hour'
+            f' JOIN day ON day.date = hour.date WHERE {where} AND hour.hour BETWEEN 0 AND {HOURS_PER_DAY - 1}'
+            ' GROUP BY hour.hour, day.is_workingday',
+            params
+        )
+        workday = CATEGORIES['is_workingday'].index('Yes')
+        columns = {
+            'hour': np.arange(HOURS_PER_DAY),
+            'workday_avg': np.full(HOURS_PER_DAY, np.nan),
+            'weekend_avg': np.full(HOURS_PER_DAY, np.nan)
+        }
+        for hour, is_workingday, average in rows:
+            columns['workday_avg' if is_workingday == workday else 'weekend_avg'][hour] = average
+        return pd.DataFrame(columns)
+
+    @cached_property
+    def hour_cluster_stats(self):
+        where, params = filter_clause(self.state)
+        counts, means = self.dataset.hourly_clusters(where, params)
+        return cluster_summary(counts, means, 'Hours Count')
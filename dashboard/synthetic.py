@@ -0,0 +1,154 @@
+"""Synthetic bike sharing data in the day.csv/hour.csv schema
+
+    python synthetic.py --scale 10 --out /tmp/bike-10x
+"""
+import argparse
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_DAYS = 731
+FIRST_DATE = pd.Timestamp('2011-01-01')
+# Datetime columns are nanosecond based, which bounds the calendar we can span
+EARLIEST_DATE = pd.Timestamp.min.ceil('D')
+LATEST_DATE = pd.Timestamp.max.floor('D')
+MAX_DAYS = (LATEST_DATE.date() - EARLIEST_DATE.date()).days + 1
+
+DAY_COLUMNS = ['instant', 'dteday', 'season', 'yr', 'mnth', 'holiday', 'weekday', 'workingday',
+               'weathersit', 'temp', 'atemp', 'hum', 'windspeed', 'casual', 'registered', 'cnt']
+HOUR_COLUMNS = DAY_COLUMNS[:5] + ['hr'] + DAY_COLUMNS[5:]
+WEATHER_COLUMNS = ['temp', 'atemp', 'hum', 'windspeed']
+
+
+def max_scale():
+    """Largest scale whose calendar still fits the datetime range"""
+    return MAX_DAYS // SAMPLE_DAYS
+
+
+def synthetic_dates(n_days):
+    """Consecutive dates from 2011-01-01, shifted earlier when that would overflow"""
+    if n_days > MAX_DAYS:
+        raise ValueError(f"{n_days} days do not fit the supported date range (scale <= {max_scale()})")
+    # Calendar arithmetic on plain dates: a pd.Timedelta of more than ~292
+    # years overflows long before the Timestamp range does
+    latest_start = LATEST_DATE.date() - datetime.timedelta(days=n_days - 1)
+    start = min(FIRST_DATE, pd.Timestamp(latest_start))
+    return pd.date_range(start, periods=n_days, freq='D')
+
+
+def _calendar(dates, holidays):
+    """Raw calendar columns for `dates`; holidays repeat the sample's (month, day) pairs"""
+    month = dates.month.to_numpy()
+    weekday = (dates.dayofweek.to_numpy() + 1) % 7
+    holiday = pd.Index(list(zip(month, dates.day))).isin(holidays).astype(int)
+    workingday = ((weekday >= 1) & (weekday <= 5) & (holiday == 0)).astype(int)
+    return {
+        'dteday': dates.strftime('%Y-%m-%d'),
+        'yr': dates.year.to_numpy() - FIRST_DATE.year,
+        'mnth': month,
+        'holiday': holiday,
+        'weekday': weekday,
+        'workingday': workingday
+    }
+
+
+def _pick_sources(month, workingday, sample, rng):
+    """For every synthetic day, a random sample day of the same month and day type"""
+    by_type = sample.groupby(['mnth', 'workingday']).groups
+    by_month = sample.groupby('mnth').groups
+    sources = np.empty(len(month), dtype=np.intp)
+    for m in np.unique(month):
+        for w in (0, 1):
+            targets = np.flatnonzero((month == m) & (workingday == w))
+            # Day types the sample never saw in a month fall back to any day of that month
+            pool = by_type.get((m, w), by_month[m]).to_numpy()
+            sources[targets] = rng.choice(pool, size=len(targets))
+    return sources
+
+
+def generate(sample_dir, scale=1, seed=0):
+    """Synthetic (day, hour) raw frames with `scale` times the sample's days"""
+    rng = np.random.default_rng(seed)
+    sample_day = pd.read_csv(os.path.join(sample_dir, 'day.csv'))
+    sample_hour = pd.read_csv(os.path.join(sample_dir, 'hour.csv'))
+
+    dates = synthetic_dates(int(round(SAMPLE_DAYS * scale)))
+    n_days = len(dates)
+    sample_dates = pd.to_datetime(sample_day['dteday'])[sample_day['holiday'] == 1]
+    holidays = pd.Index(list(zip(sample_dates.dt.month, sample_dates.dt.day)))
+    calendar = _calendar(dates, holidays)
+    sources = _pick_sources(calendar['mnth'], calendar['workingday'], sample_day, rng)
+
+    # Hourly rows of every source day, gathered through per-day offsets
+    hour_day = pd.Index(sample_day['dteday']).get_indexer(sample_hour['dteday'])
+    order = np.argsort(hour_day, kind='stable')
+    hours_per_day = np.bincount(hour_day, minlength=len(sample_day))
+    offsets = np.concatenate([[0], np.cumsum(hours_per_day)])
+    lengths = hours_per_day[sources]
+    day_of_row = np.repeat(np.arange(n_days), lengths)
+    row_in_day = np.arange(len(day_of_row)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = order[offsets[sources][day_of_row] + row_in_day]
+
+    # One demand factor per day keeps the hourly curve's shape
+    factor = rng.lognormal(0.0, 0.1, n_days)[day_of_row]
+    casual = np.rint(sample_hour['casual'].to_numpy()[rows] * factor).astype(np.int64)
+    registered = np.rint(sample_hour['registered'].to_numpy()[rows] * factor).astype(np.int64)
+    jitter = rng.normal(0.0, 0.02, (len(rows), len(WEATHER_COLUMNS)))
+    weather = np.clip(sample_hour[WEATHER_COLUMNS].to_numpy()[rows] + jitter, 0, 1).round(4)
+
+    hour_df = pd.DataFrame({
+        'instant': np.arange(1, len(rows) + 1),
+        'season': sample_day['season'].to_numpy()[sources][day_of_row],
+        'hr': sample_hour['hr'].to_numpy()[rows],
+        'weathersit': sample_hour['weathersit'].to_numpy()[rows],
+        'casual': casual,
+        'registered': registered,
+        'cnt': casual + registered
+    })
+    for column, values in calendar.items():
+        hour_df[column] = np.asarray(values)[day_of_row]
+    for i, column in enumerate(WEATHER_COLUMNS):
+        hour_df[column] = weather[:, i]
+
+    # Daily rows aggregate their hours; the source day's weather label stands for the day
+    day_df = pd.DataFrame({'instant': np.arange(1, n_days + 1), **calendar})
+    day_df['season'] = sample_day['season'].to_numpy()[sources]
+    day_df['weathersit'] = sample_day['weathersit'].to_numpy()[sources]
+    for column in WEATHER_COLUMNS:
+        day_df[column] = (np.bincount(day_of_row, hour_df[column], n_days) / lengths).round(6)
+    for column in ['casual', 'registered', 'cnt']:
+        day_df[column] = np.bincount(day_of_row, hour_df[column], n_days).astype(np.int64)
+
+    return day_df[DAY_COLUMNS], hour_df[HOUR_COLUMNS]
+
+
+def write_dataset(out_dir, sample_dir, scale=1, seed=0):
+    """Generate and write day.csv/hour.csv; returns the row counts"""
+    day_df, hour_df = generate(sample_dir, scale, seed)
+    os.makedirs(out_dir, exist_ok=True)
+    day_df.to_csv(os.path.join(out_dir, 'day.csv'), index=False)
+    hour_df.to_csv(os.path.join(out_dir, 'hour.csv'), index=False)
+    return {'days': len(day_df), 'hours': len(hour_df)}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate synthetic bike sharing data in the sample's schema.")
+    parser.add_argument('--sample-dir', default='dataset', help="Directory holding the sample day.csv and hour.csv")
+    parser.add_argument('--scale', type=float, default=1, help="Multiple of the sample's 731 days")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help="Output directory")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    counts = write_dataset(args.out, args.sample_dir, args.scale, args.seed)
+    print(f"{counts['days']} days, {counts['hours']} hours -> {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+from functools import cached_property
+
+import pandas as pd
+
+import trendlines
+from clustering import cluster_table, fit_segmenters
+from data_loader import observed_labels
+from day_stats import DayStats
+from filters import FilterIndex
+from hour_cube import HourCube
+
+# Baseline average used for the KPI delta
+BASELINE_DAILY_RENTALS = 4504
+# Variables of the default weather correlation heatmap
+WEATHER_CORR_METRICS = ['temperature', 'humidity', 'wind_speed', 'total_count']
+
+
+class Dataset:
+    """Immutable snapshot of the daily frame plus the indexes and pre-aggregations built from it"""
+
+    def __init__(self, day_df, filter_index, day_stats, corr_stats, hour_cube, segmenters, version=0):
+        self.day_df = day_df
+        self.filter_index = filter_index
+        self.day_stats = day_stats
+        self.corr_stats = corr_stats
+        self.hour_cube = hour_cube
+        self.segmenters = segmenters
+        self.version = version
+
+    @classmethod
+    def build(cls, day_df, hour_cube, version=0, clustering=None):
+        """Index and aggregate a cleaned daily frame alongside its hour cube"""
+        return cls(
+            day_df, FilterIndex(day_df), DayStats(day_df), DayStats.correlations(day_df), hour_cube,
+            fit_segmenters(day_df, hour_cube.records.columns, clustering), version
+        )
+
+    @classmethod
+    def from_frames(cls, day_df, hour_df, version=0, clustering=None):
+        """Build every index and aggregate from the cleaned day/hour frames"""
+        return cls.build(day_df, HourCube.from_frames(hour_df, day_df), version, clustering)
+
+    @property
+    def n_days(self):
+        return len(self.day_df)
+
+    def filter_options(self):
+        """Choices the sidebar offers: the date span and the observed labels"""
+        day_df = self.day_df
+        return {
+            'start': day_df['date'].min().date(),
+            'end': day_df['date'].max().date(),
+            'seasons': observed_labels(day_df['season']),
+            'weathers': observed_labels(day_df['weather_situation'])
+        }
+
+    def hourly_records(self, days):
+        """Hourly records of the days at row positions `days`"""
+        return self.hour_cube.records.days(days)
+
+    def hourly_curves(self, days):
+        """Average casual, registered and total rentals per hour over the days at row positions `days`"""
+        return self.hour_cube.records.profile(days)
+
+    def results(self, state):
+        """Lazily evaluated tables for one filter state"""
+        return FilterResults(self, state)
+
+
+class FilterResults:
+    """Every derived dashboard table for one normalized filter state"""
+
+    def __init__(self, dataset, state):
+        self.dataset = dataset
+        self.state = state
+        # Memo of the tables that take an argument, keyed by (method, argument)
+        self.parameterized = {}
+
+    @cached_property
+    def filtered_df(self):
+        return self.dataset.day_df.take(self.positions())
+
+    def positions(self):
+        """Row positions of the filter's days; answered from the filter bitmaps, so not memoized"""
+        state = self.state
+        return self.dataset.filter_index.positions(state.start, state.end, state.seasons, state.weathers)
+
+    def column(self, name):
+        """One daily column over the filter's days, without materializing filtered_df"""
+        if 'filtered_df' in vars(self):
+            return self.filtered_df[name]
+        return self.dataset.day_df[name].take(self.positions())
+
+    @cached_property
+    def selection(self):
+        state = self.state
+        return self.dataset.day_stats.select(state.start, state.end, state.seasons, state.weathers)
+
+    @cached_property
+    def corr_selection(self):
+        state = self.state
+        return self.dataset.corr_stats.select(state.start, state.end, state.seasons, state.weathers)
+
+    def _memoized(self, method, argument, compute):
+        key = (method, tuple(argument))
+        if key not in self.parameterized:
+            self.parameterized[key] = compute(key[1])
+        return self.parameterized[key]
+
+    def correlation(self, metrics):
+        """Pearson matrix of any CORRELATION_METRICS for this filter, memoized per variable list"""
+        return self._memoized('correlation', metrics, self.corr_selection.correlation)
+
+    def drilldown(self, days):
+        """Hourly casual, registered and total curves averaged over the days at row positions `days`"""
+        return self._memoized('drilldown', days, self.dataset.hourly_curves)
+
+    def get(self, name):
+        """Table by name, or by a (method, argument) pair such as ('correlation', metrics)"""
+        if isinstance(name, tuple):
+            method, argument = name
+            return getattr(self, method)(argument)
+        return getattr(self, name)
+
+    def computed(self, name):
+        """Whether `get(name)` would be served without computing anything"""
+        if isinstance(name, tuple):
+            method, argument = name
+            return (method, tuple(argument)) in self.parameterized
+        return name in vars(self)
+
+    @cached_property
+    def kpis(self):
+        totals = self.column('total_count')
+        if not totals.empty:
+            avg_daily = int(self.selection.overall_mean('total_count'))
+            delta_value = avg_daily - BASELINE_DAILY_RENTALS
+        else:
+            avg_daily = 0
+            delta_value = 0
+        peak_day = totals.max()
+        return {
+            'avg_daily': avg_daily,
+            'delta_value': delta_value,
+            'total_days': self.selection.n_days,
+            'peak_day': peak_day,
+            'utilization': avg_daily / peak_day * 100
+        }
+
+    @cached_property
+    def seasonal_avg(self):
+        return self.selection.mean('season', ['total_count']).reset_index()
+
+    @cached_property
+    def best_worst_season(self):
+        seasonal_avg = self.seasonal_avg
+        if seasonal_avg.empty:
+            return 'N/A', 'N/A'
+        return (seasonal_avg.loc[seasonal_avg['total_count'].idxmax(), 'season'],
+                seasonal_avg.loc[seasonal_avg['total_count'].idxmin(), 'season'])
+
+    @cached_property
+    def monthly_trend(self):
+        return self.selection.monthly_mean(['total_count'], by='season')
+
+    @cached_property
+    def weather_avg(self):
+        return self.selection.mean('weather_situation', ['total_count']).reset_index()
+
+    @cached_property
+    def weather_corr(self):
+        return self.correlation(WEATHER_CORR_METRICS)
+
+    @cached_property
+    def temperature_fits(self):
+        """Least-squares fit of daily rentals on temperature per weather condition"""
+        return self.selection.regression('temperature', 'total_count', 'weather_situation')
+
+    @cached_property
+    def temperature_trend_ols(self):
+        return trendlines.ols_lines(self.temperature_fits, self.filtered_df, 'temperature', 'total_count', 'weather_situation')
+
+    @cached_property
+    def temperature_trend_lowess(self):
+        return trendlines.lowess_lines(self.filtered_df, 'temperature', 'total_count', 'weather_situation')
+
+    @cached_property
+    def temperature_trend_binned(self):
+        return trendlines.binned_lines(self.filtered_df, 'temperature', 'total_count', 'weather_situation')
+
+    @cached_property
+    def user_ratio(self):
+        user_ratio = self.selection.mean('is_workingday', ['casual_ratio', 'registered_ratio']).reset_index()
+        return pd.melt(user_ratio, id_vars=['is_workingday'],
+                       value_vars=['casual_ratio', 'registered_ratio'],
+                       var_name='user_type', value_name='percentage')
+
+    @cached_property
+    def cluster_counts(self):
+        return self.selection.count('demand_cluster')
+
+    @cached_property
+    def seasonal_users(self):
+        return self.selection.mean('season', ['casual_users', 'registered_users']).reset_index()
+
+    @cached_property
+    def hour_profile(self):
+        state = self.state
+        day_mask = self.dataset.filter_index.mask(state.start, state.end, state.seasons, state.weathers)
+        return self.dataset.hour_cube.profile(day_mask)
+
+    @cached_property
+    def cluster_stats(self):
+        cluster_stats = self.selection.mean('demand_cluster', ['total_count', 'temperature', 'casual_ratio'])
+        cluster_stats.insert(1, 'count', self.selection.count('demand_cluster'))
+        cluster_stats = cluster_stats.round(2)
+        cluster_stats.columns = ['Avg Rentals', 'Days Count', 'Avg Temp', 'Casual %']
+        return cluster_stats
+
+    @cached_property
+    def hour_cluster_stats(self):
+        records = self.dataset.hourly_records(self.positions())
+        return cluster_table(records, self.dataset.segmenters['hour'].codes(records), 'Hours Count')
+
+    @cached_property
+    def weather_impact(self):
+        weather_impact = self.selection.mean('weather_situation', ['total_count', 'temperature', 'humidity']).round(2)
+        weather_impact.columns = ['Avg Rentals', 'Avg Temp', 'Avg Humidity']
+        return weather_impact
+
+    @cached_property
+    def temp_analysis(self):
+        temperature = self.column('temperature')
+        if temperature.empty:
+            return None
+        temp_bins = pd.cut(
+            temperature,
+            bins=5,
+            labels=['Very Cold', 'Cold', 'Moderate', 'Warm', 'Hot']
+        )
+        return self.column('total_count').groupby(temp_bins, observed=False).mean().reset_index()
+
+    @cached_property
+    def season_weather(self):
+        season_weather = self.selection.count(['season', 'weather_situation']).unstack(fill_value=0)
+        return season_weather.div(season_weather.sum(axis=1), axis=0) * 100
+
+    @cached_property
+    def monthly_users(self):
+        return self.selection.monthly_mean(['casual_users', 'registered_users'])
+
+    def compute_all(self, names=None):
+        """Materialize every table (or those in `names`), e.g. before handing the results to the cache"""
+        for name in TABLE_NAMES if names is None else names:
+            getattr(self, name)
+        return self
+
+
+TABLE_NAMES = [
+    'kpis', 'seasonal_avg', 'best_worst_season', 'monthly_trend', 'weather_avg',
+    'weather_corr', 'temperature_fits', 'user_ratio', 'cluster_counts', 'seasonal_users', 'hour_profile',
+    'cluster_stats', 'hour_cluster_stats', 'weather_impact', 'temp_analysis', 'season_weather', 'monthly_users'
+]
+# Tables read from the hourly data rather than the day statistics
+HOURLY_TABLES = ['hour_profile', 'hour_cluster_stats']
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from day_stats import DayStats
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+METRICS = ['temperature', 'humidity', 'total_count']
+FILTERS = [
+    ('2011-01-01', '2012-12-31', ['Spring', 'Summer', 'Fall', 'Winter'], ['Clear/Partly Cloudy', 'Mist/Cloudy', 'Light Snow/Rain']),
+    ('2011-03-05', '2011-03-05', ['Spring'], ['Mist/Cloudy']),
+    ('2011-02-14', '2012-07-01', ['Summer', 'Winter'], ['Clear/Partly Cloudy', 'Light Snow/Rain']),
+    ('2012-05-03', '2012-06-20', ['Summer'], []),
+]
+
+
+@pytest.fixture(scope='module')
+def day_df():
+    return data_loader.load_data(DATA_DIR, use_cache=False)[0]
+
+
+def selected(day_df, start, end, seasons, weathers):
+    mask = (
+        day_df['date'].between(start, end)
+        & day_df['season'].isin(seasons)
+        & day_df['weather_situation'].isin(weathers)
+    )
+    return day_df[mask]
+
+
+@pytest.mark.parametrize('start, end, seasons, weathers', FILTERS)
+def test_selection_equals_groupby_over_the_mask(day_df, start, end, seasons, weathers):
+    selection = DayStats(day_df).select(start, end, seasons, weathers)
+    rows = selected(day_df, start, end, seasons, weathers)
+
+    assert selection.n_days == len(rows)
+    for by in ['season', ['season', 'is_workingday'], ['weather_situation', 'demand_cluster']]:
+        grouped = rows.groupby(by, observed=True)
+        expected = grouped.size()
+        count = selection.count(by)
+        np.testing.assert_array_equal(count.index, expected.index)
+        np.testing.assert_array_equal(count, expected)
+        mean = selection.mean(by, METRICS)
+        np.testing.assert_array_equal(mean.index, expected.index)
+        np.testing.assert_allclose(mean, grouped[METRICS].mean())
+    if len(rows):
+        assert selection.overall_mean('total_count') == pytest.approx(rows['total_count'].mean())
+        month = rows['date'].dt.strftime('%Y-%m')
+        monthly = selection.monthly_mean(METRICS)
+        np.testing.assert_allclose(monthly[METRICS], rows.groupby(month)[METRICS].mean())
+
+
+def test_correlation_equals_dataframe_corr(day_df):
+    start, end, seasons, weathers = FILTERS[2]
+    rows = selected(day_df, start, end, seasons, weathers)
+    correlation = DayStats.correlations(day_df).select(start, end, seasons, weathers).correlation(METRICS)
+    np.testing.assert_allclose(correlation, rows[METRICS].corr())
+
+
+def test_extend_equals_stats_built_from_scratch(day_df):
+    cut = 500
+    extended = DayStats(day_df.iloc[:cut]).extend(day_df, cut - 1)
+    stats = DayStats(day_df)
+    np.testing.assert_allclose(extended.count_prefix, stats.count_prefix)
+    np.testing.assert_allclose(extended.sum_prefix, stats.sum_prefix)
+    np.testing.assert_allclose(extended.sumsq_prefix, stats.sumsq_prefix)
+    for filters in FILTERS:
+        pd.testing.assert_frame_equal(
+            extended.select(*filters).mean('season', METRICS), stats.select(*filters).mean('season', METRICS)
+        )
@@ -0,0 +1,52 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+import data_loader
+from filters import FilterIndex, normalize_filters
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+FILTERS = [
+    ('2011-01-01', '2012-12-31', ['Spring', 'Summer', 'Fall', 'Winter'], ['Clear/Partly Cloudy', 'Mist/Cloudy', 'Light Snow/Rain']),
+    ('2011-01-03', '2011-01-03', ['Spring'], ['Clear/Partly Cloudy', 'Mist/Cloudy']),
+    ('2011-02-14', '2012-07-01', ['Summer', 'Winter'], ['Light Snow/Rain', 'Heavy Rain/Snow']),
+    ('2012-05-03', '2012-06-20', ['Summer'], []),
+    ('2013-01-01', '2013-02-01', ['Winter'], ['Clear/Partly Cloudy']),
+]
+
+
+@pytest.fixture(scope='module')
+def day_df():
+    return data_loader.load_data(DATA_DIR, use_cache=False)[0]
+
+
+def expected_positions(day_df, start, end, seasons, weathers):
+    mask = (
+        day_df['date'].between(start, end)
+        & day_df['season'].isin(seasons)
+        & day_df['weather_situation'].isin(weathers)
+    )
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize('start, end, seasons, weathers', FILTERS)
+def test_positions_equal_isin_masks(day_df, start, end, seasons, weathers):
+    index = FilterIndex(day_df)
+    expected = expected_positions(day_df, start, end, seasons, weathers)
+    np.testing.assert_array_equal(index.positions(start, end, seasons, weathers), expected)
+    np.testing.assert_array_equal(np.flatnonzero(index.mask(start, end, seasons, weathers)), expected)
+
+
+@pytest.mark.parametrize('cut', [1, 8, 531, 730])
+def test_extended_index_equals_a_fresh_one(day_df, cut):
+    index = FilterIndex(day_df.iloc[:cut]).extend(day_df, cut - 1)
+    for filters in FILTERS:
+        np.testing.assert_array_equal(index.positions(*filters), expected_positions(day_df, *filters))
+
+
+def test_half_picked_range_is_a_single_day():
+    state = normalize_filters((datetime.date(2011, 5, 1),), ['Winter', 'Fall', 'Fall'], [])
+    assert (state.start, state.end) == (datetime.date(2011, 5, 1), datetime.date(2011, 5, 1))
+    assert state.seasons == ('Fall', 'Winter')
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from day_stats import DayStats
+from filters import FilterIndex
+from ingest import HourlyFeed
+from tables import Dataset
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+COUNTS = ['casual_users', 'registered_users', 'total_count']
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(os.path.join(DATA_DIR, 'day.csv')), pd.read_csv(os.path.join(DATA_DIR, 'hour.csv'))
+
+
+@pytest.fixture(scope='module')
+def full():
+    return Dataset.build(*data_loader.load_data(DATA_DIR, use_cache=False))
+
+
+def published(raw, keep_day, keep_hour):
+    """Dataset over the sample days and hours selected by the two row masks"""
+    raw_day, raw_hour = raw
+    return Dataset.from_frames(
+        data_loader.prepare_day_data(raw_day[keep_day(raw_day)].copy()),
+        data_loader.prepare_hour_data(raw_hour[keep_hour(raw_hour)].copy())
+    )
+
+
+def assert_matches_rebuild(snapshot, full):
+    day_df = snapshot.day_df
+    np.testing.assert_array_equal(day_df['date'], full.day_df['date'])
+    np.testing.assert_array_equal(day_df[COUNTS], full.day_df[COUNTS])
+    np.testing.assert_array_equal(day_df['demand_cluster'], full.day_df['demand_cluster'])
+    np.testing.assert_allclose(snapshot.hour_cube.sums, full.hour_cube.sums)
+    np.testing.assert_array_equal(snapshot.hour_cube.counts, full.hour_cube.counts)
+    records, expected = snapshot.hour_cube.records, full.hour_cube.records
+    np.testing.assert_array_equal(records.offsets, expected.offsets)
+    for name, values in expected.columns.items():
+        np.testing.assert_array_equal(records.columns[name], values)
+
+    # The extended indexes and statistics equal ones built from scratch on the same frame
+    stats = DayStats(day_df)
+    np.testing.assert_allclose(snapshot.day_stats.count_prefix, stats.count_prefix)
+    np.testing.assert_allclose(snapshot.day_stats.sum_prefix, stats.sum_prefix)
+    np.testing.assert_allclose(snapshot.day_stats.cross_prefix, stats.cross_prefix)
+    index = FilterIndex(day_df)
+    for column, bitmaps in index.bitmaps.items():
+        for label, bitmap in bitmaps.items():
+            np.testing.assert_array_equal(snapshot.filter_index.bitmaps[column][label], bitmap)
+
+
+def test_appended_hours_equal_a_full_rebuild(raw, full, tmp_path):
+    cut = '2012-06-15'
+    base = published(raw, lambda day: day['dteday'] < cut, lambda hour: hour['dteday'] < cut)
+    rest = raw[1][raw[1]['dteday'] >= cut]
+    path = tmp_path / 'feed.csv'
+    rest.iloc[:500].to_csv(path, index=False)
+    feed = HourlyFeed(str(path), base)
+    first = feed.poll()
+    rest.iloc[500:].to_csv(path, mode='a', index=False, header=False)
+
+    snapshot = feed.poll()
+
+    assert (first.version, snapshot.version) == (1, 2)
+    assert feed.rows_ingested == len(rest)
+    assert len(base.day_df) == 531
+    assert_matches_rebuild(snapshot, full)
+
+
+def test_hours_for_an_earlier_day_rebuild_in_date_order(raw, full, tmp_path):
+    missing = '2012-03-10'
+    base = published(raw, lambda day: day['dteday'] != missing, lambda hour: hour['dteday'] != missing)
+    path = tmp_path / 'feed.csv'
+    raw[1][raw[1]['dteday'] == missing].to_csv(path, index=False)
+
+    snapshot = HourlyFeed(str(path), base).poll()
+
+    assert snapshot.version == 1
+    assert_matches_rebuild(snapshot, full)
@@ -0,0 +1,35 @@
+import os
+import shutil
+
+import data_loader
+import reports
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+
+
+def test_render_all_builds_a_cold_cache_once(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for name in ('day.csv', 'hour.csv'):
+        shutil.copy(os.path.join(DATA_DIR, name), data_dir / name)
+    # Every cache write leaves a line, whichever process (forked workers included) makes it
+    builds = tmp_path / 'builds'
+    write_cache = data_loader.write_cache
+
+    def counted_write_cache(*args, **kwargs):
+        with open(builds, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        return write_cache(*args, **kwargs)
+
+    monkeypatch.setattr(data_loader, 'write_cache', counted_write_cache)
+    presets = [{'name': "All data"}, {'name': "Fall", 'seasons': ['Fall']},
+               {'name': "Winter", 'seasons': ['Winter']}, {'name': "Clear", 'weathers': ['Clear/Partly Cloudy']}]
+
+    rendered = reports.render_all(presets, str(tmp_path / 'out'), str(data_dir), workers=3, formats=('json',))
+
+    assert builds.read_text().splitlines() == [str(os.getpid())]
+    assert [report['name'] for report in rendered] == [preset['name'] for preset in presets]
+    assert rendered[0]['days'] == 731
+    assert all(0 < report['days'] < 731 for report in rendered[1:])
+    for report in rendered:
+        assert all(os.path.exists(path) for path in report['paths'])
@@ -0,0 +1,54 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+from tables import TABLE_NAMES
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+FILTERS = [
+    {},
+    {'start': datetime.date(2011, 3, 1), 'end': datetime.date(2011, 3, 1)},
+    {'start': datetime.date(2012, 5, 3), 'end': datetime.date(2012, 6, 20), 'seasons': ['Summer'], 'weathers': ['Mist/Cloudy']},
+    {'seasons': ['Fall', 'Winter'], 'weathers': ['Clear/Partly Cloudy']},
+    {'weathers': []},
+]
+
+
+@pytest.fixture(scope='module')
+def datasets():
+    return (
+        engine.load_dataset(DATA_DIR, use_cache=False),
+        engine.load_dataset(DATA_DIR, use_cache=False, backend='sqlite')
+    )
+
+
+def assert_same(expected, actual):
+    # Shares rounded to two decimals may differ in the last digit: SQL sums in another order
+    if isinstance(expected, pd.DataFrame):
+        drop = isinstance(expected.index, pd.RangeIndex)
+        pd.testing.assert_frame_equal(
+            actual.reset_index(drop=drop), expected.reset_index(drop=drop), check_exact=False, rtol=1e-9, atol=0.0101
+        )
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(actual, expected, check_exact=False, rtol=1e-9)
+    elif isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key, value in expected.items():
+            assert (pd.isna(value) and pd.isna(actual[key])) or np.isclose(actual[key], value), key
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_sql_tables_equal_pandas_tables(datasets, filters):
+    frames, database = datasets
+    state = engine.make_filters(frames, **filters)
+    assert engine.make_filters(database, **filters) == state
+    expected, actual = frames.results(state), database.results(state)
+    for name in TABLE_NAMES + ['filtered_df']:
+        assert_same(getattr(expected, name), getattr(actual, name))
+
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import synthetic
+
+
+def test_dates_start_on_first_date_when_they_fit():
+    dates = synthetic.synthetic_dates(synthetic.SAMPLE_DAYS * 10)
+    assert dates[0] == synthetic.FIRST_DATE
+    assert len(dates) == synthetic.SAMPLE_DAYS * 10
+
+
+@pytest.mark.parametrize('scale', [synthetic.max_scale() // 2 + 1, synthetic.max_scale()])
+def test_dates_fit_at_large_scales(scale):
+    n_days = synthetic.SAMPLE_DAYS * scale
+    dates = synthetic.synthetic_dates(n_days)
+    assert len(dates) == n_days
+    assert dates[0] >= synthetic.EARLIEST_DATE
+    assert dates[-1] <= synthetic.LATEST_DATE
+    assert (dates[1:] - dates[:-1] == pd.Timedelta(days=1)).all()
+    calendar = synthetic._calendar(dates, pd.Index([(1, 1)]))
+    assert len(calendar['dteday']) == n_days
+
+
+def test_dates_beyond_the_range_are_rejected():
+    with pytest.raises(ValueError):
+        synthetic.synthetic_dates(synthetic.MAX_DAYS + 1)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+TRENDLINES = {'ols': 'Linear (OLS)', 'lowess': 'LOWESS', 'binned': 'Binned means'}
+LOWESS_FRAC = 0.3
+LOWESS_POINTS = 50
+# Larger groups are smoothed on an evenly spaced sample of their points
+LOWESS_MAX_ROWS = 5000
+N_BINS = 20
+
+
+def _group_codes(df, by):
+    codes = df[by].cat.codes.to_numpy()
+    return codes, df[by].cat.categories
+
+
+def _lines(by, categories, codes, x_name, x, y_name, y, **extra):
+    """Line table with one row per vertex, ordered by group then x"""
+    frame = pd.DataFrame({
+        by: pd.Categorical.from_codes(codes, categories=categories, ordered=True),
+        x_name: x,
+        y_name: y,
+        **extra
+    })
+    return frame.sort_values([by, x_name], kind='stable').reset_index(drop=True)
+
+
+def ols_lines(fits, df, x, y, by):
+    """Straight segments across each group's x range from per-group fits (see StatsSelection.regression)"""
+    codes, categories = _group_codes(df, by)
+    known = codes >= 0
+    size = len(categories)
+    values = df[x].to_numpy(dtype=float)[known]
+    lo = np.full(size, np.inf)
+    hi = np.full(size, -np.inf)
+    np.minimum.at(lo, codes[known], values)
+    np.maximum.at(hi, codes[known], values)
+
+    fits = fits.dropna(subset=['slope'])
+    fit_codes = np.asarray(fits.index.codes)
+    keep = np.isfinite(lo[fit_codes])
+    fits, fit_codes = fits[keep], fit_codes[keep]
+    ends = np.stack([lo[fit_codes], hi[fit_codes]], axis=1)
+    fitted = fits['intercept'].to_numpy()[:, None] + fits['slope'].to_numpy()[:, None] * ends
+    return _lines(
+        by, categories, np.repeat(fit_codes, 2), x, ends.ravel(), y, fitted.ravel(),
+        r2=np.repeat(fits['r2'].to_numpy(), 2)
+    )
+
+
+def binned_lines(df, x, y, by, bins=N_BINS):
+    """Mean of `y` in equal-width `x` bins per group, placed at each bin's mean x"""
+    codes, categories = _group_codes(df, by)
+    known = codes >= 0
+    xs = df[x].to_numpy(dtype=float)[known]
+    ys = df[y].to_numpy(dtype=float)[known]
+    codes = codes[known]
+    if len(xs) == 0:
+        return _lines(by, categories, codes, x, xs, y, ys)
+
+    edges = np.linspace(xs.min(), xs.max(), bins + 1)
+    cell = codes * bins + np.clip(np.searchsorted(edges, xs, side='right') - 1, 0, bins - 1)
+    size = len(categories) * bins
+    n = np.bincount(cell, minlength=size)
+    sum_x = np.bincount(cell, weights=xs, minlength=size)
+    sum_y = np.bincount(cell, weights=ys, minlength=size)
+    present = np.flatnonzero(n)
+    return _lines(by, categories, present // bins, x, sum_x[present] / n[present], y, sum_y[present] / n[present])
+
+
+def _lowess(xs, ys, grid, frac):
+    """Local linear fits with tricube weights, evaluated at every `grid` point at once"""
+    k = max(2, int(np.ceil(frac * len(xs))))
+    distance = np.abs(grid[:, None] - xs[None, :])
+    radius = np.partition(distance, k - 1, axis=1)[:, k - 1]
+    radius = np.where(radius > 0, radius, 1.0) * 1.0001
+    weights = np.clip(1 - (distance / radius[:, None]) ** 3, 0, None) ** 3
+
+    w = weights.sum(axis=1)
+    mean_x = weights @ xs / w
+    mean_y = weights @ ys / w
+    dx = xs[None, :] - mean_x[:, None]
+    var_x = (weights * dx ** 2).sum(axis=1)
+    cov = (weights * dx * (ys[None, :] - mean_y[:, None])).sum(axis=1)
+    slope = np.divide(cov, var_x, out=np.zeros_like(cov), where=var_x > 0)
+    return mean_y + slope * (grid - mean_x)
+
+
+def lowess_lines(df, x, y, by, frac=LOWESS_FRAC, points=LOWESS_POINTS):
+    """Smoothed trend per group, evaluated at up to `points` quantiles of its x values"""
+    codes, categories = _group_codes(df, by)
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    parts = []
+    for code in np.unique(codes[codes >= 0]):
+        rows = np.flatnonzero(codes == code)
+        if len(rows) < 3:
+            continue
+        if len(rows) > LOWESS_MAX_ROWS:
+            rows = rows[np.linspace(0, len(rows) - 1, LOWESS_MAX_ROWS).astype(int)]
+        grid = np.unique(np.quantile(xs[rows], np.linspace(0, 1, points)))
+        parts.append((np.full(len(grid), code), grid, _lowess(xs[rows], ys[rows], grid, frac)))
+    if not parts:
+        return _lines(by, categories, np.empty(0, dtype=int), x, np.empty(0), y, np.empty(0))
+    group, grid, fitted = (np.concatenate(part) for part in zip(*parts))
+    return _lines(by, categories, group, x, grid, y, fitted)
@@ -0,0 +1,169 @@
+"""Warm-up of the shared results cache for season/weather filter combinations
+
+    python warmup.py --workers 4 --executor process --limit 50
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import engine
+import instrumentation
+from filters import normalize_filters
+from results_cache import LRUCache
+from tables import HOURLY_TABLES, TABLE_NAMES
+
+# Tables computed for a warmed state, and shipped back from process workers
+WARM_TABLES = [name for name in TABLE_NAMES if name not in HOURLY_TABLES]
+# States the dashboard warms by default, and the least time between two warm-ups
+DEFAULT_LIMIT = 32
+DEFAULT_INTERVAL = 300
+
+
+def label_subsets(labels):
+    """Every non-empty subset of `labels`, smallest first"""
+    return [combo for size in range(1, len(labels) + 1) for combo in itertools.combinations(labels, size)]
+
+
+def combinations(dataset):
+    """Filter states for every season and weather subset over the full date range"""
+    options = engine.filter_options(dataset)
+    return [
+        engine.make_filters(dataset, seasons=seasons, weathers=weathers)
+        for seasons in label_subsets(options['seasons'])
+        for weathers in label_subsets(options['weathers'])
+    ]
+
+
+def popular_filters(summaries, dataset):
+    """Filter states logged by script runs, most used first, restricted to the dataset's range"""
+    options = engine.filter_options(dataset)
+    counts = Counter(
+        normalize_filters((f['start'], f['end']), f['seasons'], f['weathers'])
+        for f in (summary.get('filters') for summary in summaries)
+        if f
+    )
+    return [
+        state for state, _ in counts.most_common()
+        if options['start'] <= state.start and state.end <= options['end']
+    ]
+
+
+def plan(dataset, popular=(), limit=None):
+    """States to warm: the popular ones first, then every combination, without repeats"""
+    states = list(dict.fromkeys(list(popular) + combinations(dataset)))
+    return states[:limit] if limit is not None else states
+
+
+_worker_dataset = None
+
+
+def _init_worker(dataset):
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _compute_tables(state):
+    results = _worker_dataset.results(state).compute_all(WARM_TABLES)
+    return {name: getattr(results, name) for name in WARM_TABLES}
+
+
+def warm(dataset, cache, states, workers=4, executor='thread'):
+    """Compute the WARM_TABLES for the `states` missing from `cache` and store them"""
+    started = time.perf_counter()
+    todo = [state for state in states if (dataset.version, state) not in cache]
+
+    if executor == 'process':
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(dataset,)) as pool:
+            for state, tables in zip(todo, pool.map(_compute_tables, todo)):
+                results = dataset.results(state)
+                vars(results).update(tables)
+                cache.put((dataset.version, state), results)
+    else:
+        def compute(state):
+            cache.put((dataset.version, state), dataset.results(state).compute_all(WARM_TABLES))
+
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(compute, todo))
+
+    return {
+        'version': dataset.version,
+        'states': len(states),
+        'computed': len(todo),
+        'wall_ms': (time.perf_counter() - started) * 1000
+    }
+
+
+class Warmer:
+    """Warms the shared cache in a background thread, at most once every `interval` seconds"""
+
+    def __init__(self, cache, workers=4, limit=DEFAULT_LIMIT, log_path=None, executor='thread',
+                 interval=DEFAULT_INTERVAL):
+        self.cache = cache
+        self.workers = workers
+        self.limit = limit
+        self.log_path = log_path
+        self.executor = executor
+        self.interval = interval
+        self.runs = []
+        self._versions = set()
+        self._running = False
+        self._last_start = None
+        self._lock = threading.Lock()
+
+    def ensure(self, dataset):
+        now = time.monotonic()
+        with self._lock:
+            if dataset.version in self._versions or self._running:
+                return
+            if self._last_start is not None and now - self._last_start < self.interval:
+                return
+            self._versions.add(dataset.version)
+            self._running = True
+            self._last_start = now
+        threading.Thread(target=self._run, args=(dataset,), name='bike-warmup', daemon=True).start()
+
+    def _run(self, dataset):
+        try:
+            popular = ()
+            if self.log_path and os.path.exists(self.log_path):
+                popular = popular_filters(instrumentation.read_log(self.log_path), dataset)
+            limit = self.cache.maxsize // 2
+            if self.limit is not None:
+                limit = min(limit, self.limit)
+            states = plan(dataset, popular, limit)
+            self.runs.append(warm(dataset, self.cache, states, self.workers, self.executor))
+        finally:
+            self._running = False
+
+    def stats(self):
+        return {'warmed_versions': sorted(self._versions), 'interval_s': self.interval, 'runs': list(self.runs)}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time a warm-up of every season/weather filter combination.")
+    parser.add_argument('--data-dir', default='dataset', help="Directory holding day.csv and hour.csv")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--limit', type=int, help="Warm only this many states (default: all)")
+    parser.add_argument('--log', help="Performance log whose most used filters are warmed first")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    dataset = engine.load_dataset(args.data_dir)
+    popular = popular_filters(instrumentation.read_log(args.log), dataset) if args.log else ()
+    states = plan(dataset, popular, args.limit)
+    result = warm(dataset, LRUCache(maxsize=len(states)), states, args.workers, args.executor)
+    print(f"Warmed {result['computed']} filter states ({len(popular)} from usage) "
+          f"in {result['wall_ms']:.0f} ms with {args.workers} {args.executor} workers")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())